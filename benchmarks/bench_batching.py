@@ -0,0 +1,83 @@
+"""Пропускная способность поиска: пачки по 1 запросу против пачек по 64.
+
+Параллельные клиенты шлют запросы через MatchBatcher в пул потоков,
+каждая пачка векторизуется и ранжируется одним вызовом TopicRanker.rank.
+
+Запуск: python benchmarks/bench_batching.py --topics 1000 --clients 128 --queries 4000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from match_batcher import MatchBatcher  # noqa: E402
+from match_executor import MatchExecutor  # noqa: E402
+from topic_ranker import TopicRanker  # noqa: E402
+
+VOCABULARY = 20000
+WORDS_PER_TOPIC = 40
+WORDS_PER_QUERY = 3
+
+
+def make_ranker(n_topics):
+    """Синтетический каталог тем из общего словаря"""
+    words = [f"w{i}" for i in range(VOCABULARY)]
+    names = [f"Тема {i}" for i in range(n_topics)]
+    texts = [" ".join(random.choices(words, k=WORDS_PER_TOPIC)) for _ in range(n_topics)]
+    return TopicRanker.fit(names, texts, max_features=None), words
+
+
+async def run(ranker, queries, clients, batch_size, max_wait, workers):
+    executor = MatchExecutor(workers=workers, queue_size=clients, deadline=60, kind='thread')
+    batcher = MatchBatcher(executor, ranker.rank, batch_size=batch_size, max_wait=max_wait)
+    executor.start()
+    latencies = []
+    per_client = len(queries) // clients
+
+    async def client(offset):
+        for query in queries[offset:offset + per_client]:
+            started = time.perf_counter()
+            await batcher.submit(query)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i * per_client) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+    executor.shutdown()
+
+    latencies.sort()
+    return {
+        'qps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        'avg_batch': batcher.stats()['avg_batch'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--topics', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=128)
+    parser.add_argument('--queries', type=int, default=4000)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--max-wait', type=float, default=0.005)
+    args = parser.parse_args()
+
+    random.seed(42)
+    ranker, words = make_ranker(args.topics)
+    queries = [" ".join(random.choices(words, k=WORDS_PER_QUERY)) for _ in range(args.queries)]
+
+    print(f"{'пачка':>6}{'запросов/с':>13}{'p50, мс':>10}{'p99, мс':>10}{'ср. пачка':>12}")
+    for batch_size in (1, 64):
+        result = asyncio.run(run(ranker, queries, args.clients, batch_size, args.max_wait, args.workers))
+        print(f"{batch_size:>6}{result['qps']:>13.0f}{result['p50_ms']:>10.1f}"
+              f"{result['p99_ms']:>10.1f}{result['avg_batch']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Микробенчмарк нормализации запросов: прежний preprocess_text против TextNormalizer.
+
+Запуск: python benchmarks/bench_preprocess.py --queries 20000
+Нужны данные NLTK: stopwords и (для прежней версии) punkt.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nltk.corpus import stopwords  # noqa: E402
+from nltk.stem import SnowballStemmer  # noqa: E402
+from nltk.tokenize import word_tokenize  # noqa: E402
+
+from text_pipeline import TextNormalizer  # noqa: E402
+
+# Типичные запросы: короткие и часто повторяющиеся
+QUERIES = [
+    "спорт", "путешествия", "python", "программирование на Python", "путешествия по Азии",
+    "здоровое питание", "книги", "инвестиции в акции", "рецепты выпечки", "футбол и баскетбол",
+    "фотография и дизайн", "machine learning", "travel in Europe", "музыка 80-х", "йога для начинающих",
+    "криптовалюта 2024", "научная фантастика", "бизнес идеи", "психология и саморазвитие", "бег по утрам",
+]
+
+
+def legacy_preprocess(text, language, stop_words, stemmers):
+    """Прежняя реализация preprocess_text (без определения языка)"""
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\d+', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    tokens = word_tokenize(text)
+    lang = 'ru' if language.startswith('ru') else 'en'
+    tokens = [stemmers[lang].stem(token) for token in tokens if token not in stop_words[lang] and len(token) > 2]
+    return " ".join(tokens)
+
+
+def bench(fn, workload):
+    started = time.perf_counter()
+    for text, lang in workload:
+        fn(text, lang)
+    return (time.perf_counter() - started) / len(workload) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--queries', type=int, default=20000)
+    args = parser.parse_args()
+
+    stop_words = {'ru': set(stopwords.words('russian')), 'en': set(stopwords.words('english'))}
+    stemmers = {'ru': SnowballStemmer('russian'), 'en': SnowballStemmer('english')}
+
+    random.seed(42)
+    workload = [(q, 'en' if q.isascii() else 'ru') for q in random.choices(QUERIES, k=args.queries)]
+    # Уникальные запросы - худший случай для кэша целых запросов
+    unique = [(f"{q} {i}", lang) for i, (q, lang) in enumerate(workload)]
+
+    # Результаты должны совпадать с прежней реализацией
+    normalizer = TextNormalizer(stop_words, stemmers)
+    for text, lang in set(workload):
+        assert normalizer.normalize(text, lang) == legacy_preprocess(text, lang, stop_words, stemmers), text
+
+    legacy = bench(lambda t, lang: legacy_preprocess(t, lang, stop_words, stemmers), workload)
+    cold = bench(TextNormalizer(stop_words, stemmers, cache_size=0).normalize, unique)
+    warm = bench(TextNormalizer(stop_words, stemmers).normalize, workload)
+
+    print(f"{'вариант':<44}{'мкс/запрос':>12}{'ускорение':>12}")
+    print(f"{'прежний preprocess_text':<44}{legacy:>12.2f}{1:>11.1f}x")
+    print(f"{'TextNormalizer, без кэша запросов':<44}{cold:>12.2f}{legacy / cold:>11.1f}x")
+    print(f"{'TextNormalizer, повторяющиеся запросы':<44}{warm:>12.2f}{legacy / warm:>11.1f}x")
+
+
+if __name__ == '__main__':
+    main()
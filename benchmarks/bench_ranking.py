@@ -0,0 +1,78 @@
+"""Ранжирование тем: cosine_similarity + argmax против TopicRanker на 10, 1k и 10k тем.
+
+Запуск: python benchmarks/bench_ranking.py --queries 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.feature_extraction.text import TfidfVectorizer  # noqa: E402
+from sklearn.metrics.pairwise import cosine_similarity  # noqa: E402
+
+from topic_ranker import TopicRanker  # noqa: E402
+
+VOCABULARY = 20000
+WORDS_PER_TOPIC = 40
+WORDS_PER_QUERY = 3
+BATCH = 64
+
+
+def make_corpus(n_topics, n_queries):
+    """Синтетические темы и запросы из общего словаря"""
+    words = [f"w{i}" for i in range(VOCABULARY)]
+    topics = {f"Тема {i}": " ".join(random.choices(words, k=WORDS_PER_TOPIC)) for i in range(n_topics)}
+    queries = [" ".join(random.choices(words, k=WORDS_PER_QUERY)) for _ in range(n_queries)]
+    return topics, queries
+
+
+def legacy_rank(vectorizer, topic_vectors, topics, query):
+    """Прежний шаг 3 find_best_matching_chat"""
+    query_vector = vectorizer.transform([query])
+    similarities = cosine_similarity(query_vector, topic_vectors)
+    idx = similarities.argmax()
+    return list(topics.keys())[idx], similarities[0, idx]
+
+
+def timed(fn, repeats):
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--queries', type=int, default=512)
+    args = parser.parse_args()
+    n_queries = args.queries - args.queries % BATCH or BATCH
+
+    print(f"{'тем':>7}{'прежний, мкс':>16}{'ranker, мкс':>14}{'ranker x64, мкс':>18}{'ускорение':>12}")
+    for n_topics in (10, 1000, 10000):
+        random.seed(42)
+        topics, queries = make_corpus(n_topics, n_queries)
+        # Без ограничения словаря: на тысячах тем max_features=1000 отрезал бы почти все слова
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2))
+        topic_vectors = vectorizer.fit_transform(topics.values())
+        ranker = TopicRanker(vectorizer, topic_vectors, topics.keys())
+
+        # Оба способа выбирают одну и ту же тему
+        for query in queries[:20]:
+            legacy_topic, legacy_score = legacy_rank(vectorizer, topic_vectors, topics, query)
+            top = ranker.top(query)
+            if legacy_score > 0:
+                assert top[0][0] == legacy_topic and abs(top[0][1] - legacy_score) < 1e-9
+
+        legacy = timed(lambda: [legacy_rank(vectorizer, topic_vectors, topics, q) for q in queries], n_queries)
+        single = timed(lambda: [ranker.top(q) for q in queries], n_queries)
+        batched = timed(
+            lambda: [ranker.rank(queries[i:i + BATCH]) for i in range(0, n_queries, BATCH)],
+            n_queries
+        )
+        print(f"{n_topics:>7}{legacy:>16.1f}{single:>14.1f}{batched:>18.1f}{legacy / batched:>11.1f}x")
+
+
+if __name__ == '__main__':
+    main()
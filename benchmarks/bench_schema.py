@@ -0,0 +1,119 @@
+"""Задержка частых запросов до и после индексов миграции 2.
+
+Запуск: python benchmarks/bench_schema.py --users 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import migrate  # noqa: E402
+
+CHATS = 10
+STATUSES = ['pending', 'matched', 'closed']
+
+# Запросы, которые выполняются на горячем пути или в админских командах
+QUERIES = {
+    'профиль пользователя': (
+        '''SELECT username, first_name, language, last_active,
+                  (SELECT COUNT(*) FROM user_chats WHERE user_id = ?) FROM users WHERE user_id = ?''',
+        lambda users: (random.randrange(users),) * 2
+    ),
+    'группы пользователя': (
+        '''SELECT c.chat_name FROM chats c JOIN user_chats uc ON c.chat_id = uc.chat_id
+           WHERE uc.user_id = ? AND c.is_active = 1''',
+        lambda users: (random.randrange(users),)
+    ),
+    'чат по названию': (
+        'SELECT chat_id FROM chats WHERE chat_name = ?',
+        lambda users: (f'Тема {random.randrange(CHATS)}',)
+    ),
+    'заявки пользователя по статусу': (
+        'SELECT topic_name FROM interest_pool WHERE user_id = ? AND status = ?',
+        lambda users: (random.randrange(users), random.choice(STATUSES))
+    ),
+    'активные за последний час': (
+        "SELECT COUNT(*) FROM users WHERE last_active >= datetime('2026-01-01', '-1 hour')",
+        lambda users: ()
+    ),
+    'участники чата': (
+        'SELECT COUNT(*) FROM user_chats WHERE chat_id = ?',
+        lambda users: (random.randrange(1, CHATS + 1),)
+    ),
+}
+
+
+def populate(conn, users):
+    """Заполнение базы синтетическими данными"""
+    conn.executemany(
+        'INSERT INTO chats (chat_name, telegram_group_id) VALUES (?, ?)',
+        [(f'Тема {i}', str(-1000 - i)) for i in range(CHATS)]
+    )
+    base = time.mktime(time.strptime('2026-01-01', '%Y-%m-%d'))
+    conn.executemany(
+        'INSERT INTO users (user_id, username, first_name, last_active, language) VALUES (?, ?, ?, ?, ?)',
+        (
+            (i, f'user{i}', 'Имя', time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(base - random.randrange(90 * 86400))), 'ru')
+            for i in range(users)
+        )
+    )
+    conn.executemany(
+        'INSERT OR IGNORE INTO user_chats (user_id, chat_id) VALUES (?, ?)',
+        ((random.randrange(users), random.randrange(1, CHATS + 1)) for _ in range(users))
+    )
+    conn.executemany(
+        'INSERT INTO interest_pool (user_id, topic_name, status) VALUES (?, ?, ?)',
+        ((random.randrange(users), f'Тема {random.randrange(CHATS)}', random.choice(STATUSES)) for _ in range(users // 2))
+    )
+    conn.commit()
+
+
+def measure(conn, users, repeats):
+    """Средняя задержка каждого запроса в микросекундах"""
+    results = {}
+    for name, (sql, make_params) in QUERIES.items():
+        params = [make_params(users) for _ in range(repeats)]
+        started = time.perf_counter()
+        for p in params:
+            conn.execute(sql, p).fetchall()
+        results[name] = (time.perf_counter() - started) / repeats * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--repeats', type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+
+        migrate(conn, target=1)
+        started = time.perf_counter()
+        populate(conn, args.users)
+        print(f"Заполнение {args.users} пользователей: {time.perf_counter() - started:.1f} сек")
+
+        before = measure(conn, args.users, args.repeats)
+        started = time.perf_counter()
+        migrate(conn)
+        print(f"Миграция 2 (индексы): {time.perf_counter() - started:.1f} сек\n")
+        conn.execute('ANALYZE')
+        after = measure(conn, args.users, args.repeats)
+
+        print(f"{'запрос':<34}{'до, мкс':>12}{'после, мкс':>14}{'ускорение':>12}")
+        for name in QUERIES:
+            print(f"{name:<34}{before[name]:>12.1f}{after[name]:>14.1f}{before[name] / after[name]:>11.1f}x")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
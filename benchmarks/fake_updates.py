@@ -0,0 +1,90 @@
+"""Отправка фейковых обновлений Telegram в вебхук бота для локальной проверки.
+
+Запуск бота:   BOT_MODE=webhook WEBHOOK_SECRET=test python bot.py
+Отправка:      python benchmarks/fake_updates.py --url http://127.0.0.1:8080/telegram --secret test
+
+Бот при запуске вызывает getMe и отвечает через настоящий Bot API,
+поэтому нужен токен тестового бота; без WEBHOOK_URL вебхук в Telegram не
+регистрируется, и обновления приходят только от этого скрипта.
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import random
+import time
+
+import httpx
+
+TEXTS = [
+    "/start", "🔍 Найти группу по интересам", "инвестиции в акции", "хочу готовить вкусную еду",
+    "программирование на Python", "путешествия по Азии", "/help", "/groups", "/profile",
+]
+
+_update_ids = itertools.count(random.randint(1, 10 ** 6))
+
+
+def make_update(user_id, text):
+    """Обновление с текстовым сообщением в личном чате"""
+    update_id = next(_update_ids)
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private', 'first_name': f"User{user_id}"},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}", 'language_code': 'ru'},
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'update_id': update_id, 'message': message}
+
+
+async def post_updates(url, secret, updates, concurrency):
+    """Отправка с ограниченным числом соединений; счетчик HTTP-статусов"""
+    statuses = collections.Counter()
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    limits = httpx.Limits(max_connections=concurrency)
+    queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+
+    async with httpx.AsyncClient(limits=limits, timeout=10) as client:
+        async def worker():
+            while not queue.empty():
+                update = queue.get_nowait()
+                try:
+                    response = await client.post(url, json=update, headers=headers)
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8080/telegram')
+    parser.add_argument('--secret', default='')
+    parser.add_argument('--updates', type=int, default=200)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=40)
+    args = parser.parse_args()
+
+    random.seed(42)
+    updates = [
+        make_update(100000 + random.randrange(args.users), random.choice(TEXTS))
+        for _ in range(args.updates)
+    ]
+
+    started = time.perf_counter()
+    statuses = asyncio.run(post_updates(args.url, args.secret, updates, args.concurrency))
+    elapsed = time.perf_counter() - started
+
+    print(f"отправлено {args.updates} обновлений за {elapsed:.2f} сек ({args.updates / elapsed:.0f}/сек)")
+    for status, count in sorted(statuses.items(), key=str):
+        print(f"  {status}: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""Нагрузочный тест без Telegram: синтетические обновления через настоящее Application.
+
+Бот собирается той же build_application, что и в продакшене, но HTTP-клиент
+Bot API заменен фейковым: sendMessage отвечает сразу (или через --api-latency),
+createChatInviteLink - через --invite-latency. Обновления пользователей
+(/start, поиск, свободный текст, вступление, /groups, /profile) кладутся в
+update_queue с заданной частотой; порядок внутри пользователя сохраняется.
+
+Отчет: обновлений в секунду, задержка обработки (p50/p95/p99) от постановки
+в очередь и от начала обработки, лаг event loop, задержки по обработчикам.
+Для ловли регрессий: --save base.json на эталонной версии, затем
+--compare base.json (код выхода 1, если p95 или пропускная способность
+хуже более чем на --tolerance).
+
+Запуск: python benchmarks/load_test.py --users 200 --updates 4000 --rate 0 --invite-latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from telegram.request import BaseRequest  # noqa: E402
+
+# Сценарий пользователя: повторяется по кругу, пока не наберется --updates
+SCRIPT = [
+    "/start",
+    "🔍 Найти группу по интересам",
+    "{topic}",
+    "✅ Присоединиться",
+    "/groups",
+    "{topic}",
+    "❌ Отказаться",
+    "/profile",
+]
+TOPICS = [
+    "программирование на Python", "путешествия по Азии", "инвестиции в акции",
+    "хочу готовить вкусную еду", "здоровое питание", "фотография и дизайн",
+    "machine learning", "книги и литература", "бег по утрам", "квантовая физика",
+]
+
+
+class FakeBotApi(BaseRequest):
+    """Фейковый Bot API: ответы без сети, задержки задаются по методам"""
+
+    def __init__(self, api_latency=0.0, invite_latency=0.0):
+        self.api_latency = api_latency
+        self.invite_latency = invite_latency
+        self.calls = {}
+        self._next_id = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _result(self, method, params):
+        self._next_id += 1
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'LoadTest', 'username': 'load_test_bot'}
+        if method == 'sendMessage':
+            return {
+                'message_id': self._next_id, 'date': int(time.time()),
+                'chat': {'id': params.get('chat_id'), 'type': 'private'}, 'text': params.get('text', ''),
+            }
+        if method == 'createChatInviteLink':
+            return {
+                'invite_link': f'https://t.me/+load{self._next_id}',
+                'creator': {'id': 1, 'is_bot': True, 'first_name': 'LoadTest'},
+                'creates_join_request': False, 'is_primary': False, 'is_revoked': False,
+            }
+        return True
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        self.calls[api_method] = self.calls.get(api_method, 0) + 1
+        delay = self.invite_latency if api_method == 'createChatInviteLink' else self.api_latency
+        if delay:
+            await asyncio.sleep(delay)
+        params = request_data.parameters if request_data else {}
+        return 200, json.dumps({'ok': True, 'result': self._result(api_method, params)}).encode()
+
+
+def make_corpus(users, total, seed):
+    """Обновления пользователей вперемешку, но по порядку внутри каждого"""
+    rng = random.Random(seed)
+    user_ids = [100000 + i for i in range(users)]
+    positions = dict.fromkeys(user_ids, 0)
+    corpus = []
+    for update_id in range(1, total + 1):
+        user_id = rng.choice(user_ids)
+        text = SCRIPT[positions[user_id] % len(SCRIPT)].format(topic=rng.choice(TOPICS))
+        positions[user_id] += 1
+        message = {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': f"User{user_id}"},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}", 'language_code': 'ru'},
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+        corpus.append({'update_id': update_id, 'message': message})
+    return corpus
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def monitor_loop_lag(samples, stop, interval=0.01):
+    """Лаг event loop: насколько позже запланированного просыпается sleep"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+async def replay(bot, corpus, api, rate):
+    from telegram import Update
+
+    application = bot.build_application('1:load-test', request=api)
+    processor = application.update_processor
+    enqueued_at = {}
+    queue_latency = []
+    handler_latency = []
+
+    # Замер вокруг обработки: от постановки в очередь и от начала обработки
+    original = processor.do_process_update
+
+    async def timed_process(update, coroutine):
+        started = time.perf_counter()
+        try:
+            await original(update, coroutine)
+        finally:
+            finished = time.perf_counter()
+            handler_latency.append(finished - started)
+            queue_latency.append(finished - enqueued_at.pop(update.update_id, started))
+
+    processor.do_process_update = timed_process
+
+    lag = []
+    stop = asyncio.Event()
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        lag_task = asyncio.create_task(monitor_loop_lag(lag, stop))
+
+        started = time.perf_counter()
+        for i, data in enumerate(corpus):
+            if rate:
+                delay = started + i / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            update = Update.de_json(data, application.bot)
+            enqueued_at[update.update_id] = time.perf_counter()
+            await application.update_queue.put(update)
+        await application.update_queue.join()
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        await lag_task
+        await application.stop()
+        await application.post_stop(application)
+
+    return {
+        'updates': len(corpus),
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_s': round(len(corpus) / elapsed, 1),
+        'latency_ms': {
+            q: round(percentile(queue_latency, p) * 1000, 2) for q, p in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+        },
+        'handler_ms': {
+            q: round(percentile(handler_latency, p) * 1000, 2) for q, p in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+        },
+        'loop_lag_ms': {
+            'p50': round(percentile(lag, 0.5) * 1000, 2),
+            'p99': round(percentile(lag, 0.99) * 1000, 2),
+            'max': round(max(lag, default=0.0) * 1000, 2),
+        },
+        'api_calls': dict(sorted(api.calls.items())),
+    }
+
+
+def compare(result, baseline, tolerance):
+    """Список регрессий относительно эталона"""
+    regressions = []
+    if result['updates_per_s'] < baseline['updates_per_s'] * (1 - tolerance):
+        regressions.append(f"пропускная способность {result['updates_per_s']} < {baseline['updates_per_s']}")
+    for key in ('latency_ms', 'handler_ms'):
+        if result[key]['p95'] > baseline[key]['p95'] * (1 + tolerance):
+            regressions.append(f"{key} p95 {result[key]['p95']} > {baseline[key]['p95']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--updates', type=int, default=4000)
+    parser.add_argument('--rate', type=float, default=0, help='обновлений в секунду; 0 - без ограничения')
+    parser.add_argument('--concurrency', type=int, default=32, help='CONCURRENT_UPDATES')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='задержка sendMessage и прочих методов, сек')
+    parser.add_argument('--invite-latency', type=float, default=0.2, help='задержка createChatInviteLink, сек')
+    parser.add_argument('--rate-limit', action='store_true', help='не отключать лимит частоты запросов')
+    parser.add_argument('--nltk-data', default=os.getenv('NLTK_DATA_DIR', os.path.join(ROOT, 'nltk_data')))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', help='сохранить результат в JSON')
+    parser.add_argument('--compare', help='JSON эталонного прогона')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    save_path = os.path.abspath(args.save) if args.save else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    # База, логи и кэш модели - во временном каталоге, а не рядом с ботом
+    workdir = tempfile.mkdtemp(prefix='bot-load-')
+    os.environ.pop('RAILWAY_ENVIRONMENT', None)
+    os.environ.update({
+        'NLTK_DATA_DIR': os.path.abspath(args.nltk_data),
+        'LOG_LEVEL': 'WARNING',
+        'BOT_MODE': 'polling',
+        'CONCURRENT_UPDATES': str(args.concurrency),
+    })
+    if not args.rate_limit:
+        os.environ.update({'RATE_LIMIT_BURST': '1000000', 'GLOBAL_RATE_BURST': '1000000',
+                           'RATE_LIMIT_RATE': '1000000', 'GLOBAL_RATE_LIMIT': '1000000'})
+    os.chdir(workdir)
+
+    bot = None
+    try:
+        import bot
+        bot.init_database()
+        bot.warm_nlp()
+
+        corpus = make_corpus(args.users, args.updates, args.seed)
+        api = FakeBotApi(api_latency=args.api_latency, invite_latency=args.invite_latency)
+        result = asyncio.run(replay(bot, corpus, api, args.rate))
+        result['handlers'] = {
+            key: value for key, value in bot.METRICS.summary().items() if key.startswith('bot_handler_seconds')
+        }
+    finally:
+        if bot is not None:
+            bot.cleanup()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if save_path:
+        with open(save_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if compare_path:
+        with open(compare_path, encoding='utf-8') as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"❌ Регрессия: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ Регрессий нет")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,136 @@
+import time
+# Отсчет времени запуска - до импорта остальных модулей
+STARTED_AT = time.perf_counter()
+
+import asyncio
 import logging
 import os
-import sqlite3
+import signal
+import subprocess
+import threading
 from datetime import datetime
-import re
-import json
-import emoji
-import numpy as np
-from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from telegram import Bot, Update
+from telegram.request import HTTPXRequest
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
-import requests
 from dotenv import load_dotenv
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import SnowballStemmer
-from sklearn.metrics.pairwise import cosine_similarity
-from langdetect import detect
-from sklearn.feature_extraction.text import TfidfVectorizer
 import sys
 import atexit
+from startup_profiler import StartupProfiler
+from logging_setup import SamplingFilter, parse_module_levels, setup_child_logging, setup_logging
+from webhook_server import WebhookServer
+from sharding import (
+    ShardListener, ShardRouter, ShardedWebhookServer, UserOrderedProcessor, shard_socket_path
+)
+from update_filter import UpdateFilter, derive_allowed_updates
+from sqlite_persistence import SQLitePersistence
+from match_executor import MatchExecutor, MatcherBusyError, MatcherTimeoutError
+from match_batcher import MatchBatcher
+from match_cache import MatchCache, catalog_version, normalize_query
+from rate_limiter import RateLimiter
+from metrics import METRICS, TimedRequest
+from invite_links import InviteLinkService, InviteLinkError
+from invite_pool import InvitePool
+import database
+import migrations
+from database import Database, UserUpsertBuffer, MemberCounter
+from chat_registry import ChatRegistry
+from topics import DETAILED_TOPICS, GROUP_IDS
+from text_pipeline import LanguageDetector, TextNormalizer
+from keyword_index import KeywordIndex
+from templates import TemplateRegistry
 
 # Загружаем переменные окружения
 load_dotenv()
 
 # Импортируем конфигурацию из config.py
 try:
-    from config import BOT_TOKEN, ADMIN_ID, NLTK_DATA_DIR
+    from config import (
+        BOT_TOKEN, ADMIN_ID, NLTK_DATA_DIR,
+        LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT,
+        LOG_SAMPLE_PER_SECOND, LOG_SAMPLE_EVERY,
+        MATCH_EXECUTOR, MATCH_WORKERS, MATCH_QUEUE_SIZE, MATCH_DEADLINE,
+        MATCH_BATCH_SIZE, MATCH_BATCH_WAIT,
+        INVITE_TIMEOUT, INVITE_ATTEMPTS, INVITE_BACKOFF_BASE, INVITE_BACKOFF_MAX,
+        INVITE_POOL_LOW_WATER, INVITE_POOL_TARGET, INVITE_POOL_REFILL_BATCH,
+        INVITE_POOL_REFILL_INTERVAL, INVITE_LINK_TTL,
+        DB_SYNCHRONOUS, DB_CACHE_SIZE_KB,
+        USER_FLUSH_INTERVAL, USER_FLUSH_MAX_PENDING, MEMBER_COUNT_FLUSH_INTERVAL,
+        NORMALIZE_CACHE_SIZE, STEM_CACHE_SIZE, MODEL_CACHE_DIR,
+        MATCH_CACHE_ENABLED, MATCH_CACHE_SIZE, MATCH_CACHE_MAX_ROWS, MATCH_CACHE_FLUSH_INTERVAL,
+        MATCH_CACHE_WARM_LIMIT,
+        PERSISTENCE_FLUSH_INTERVAL, USER_STATE_IDLE_TTL, USER_STATE_MAX_USERS,
+        BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+        WEBHOOK_QUEUE_SIZE, WEBHOOK_MAX_CONNECTIONS,
+        CONCURRENT_UPDATES, USER_LOCK_STRIPES,
+        SHARDS, SHARD_INDEX, SHARD_SOCKET_DIR, SHARD_QUEUE_SIZE,
+        RATE_LIMIT_RATE, RATE_LIMIT_BURST, GLOBAL_RATE_LIMIT, GLOBAL_RATE_BURST,
+        RATE_LIMIT_IDLE_TTL, RATE_LIMIT_NOTICE_INTERVAL, METRICS_ENABLED, METRICS_TOKEN
+    )
 except ImportError:
     # Fallback на переменные окружения
     BOT_TOKEN = os.getenv('BOT_TOKEN')
     ADMIN_ID = int(os.getenv('ADMIN_ID', '6830411048'))
     NLTK_DATA_DIR = os.getenv('NLTK_DATA_DIR', './nltk_data')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '3'))
+    LOG_SAMPLE_PER_SECOND = int(os.getenv('LOG_SAMPLE_PER_SECOND', '20'))
+    LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', '100'))
+    MATCH_EXECUTOR = os.getenv('MATCH_EXECUTOR', 'thread')
+    MATCH_WORKERS = int(os.getenv('MATCH_WORKERS', '2'))
+    MATCH_QUEUE_SIZE = int(os.getenv('MATCH_QUEUE_SIZE', '32'))
+    MATCH_DEADLINE = float(os.getenv('MATCH_DEADLINE', '10'))
+    MATCH_BATCH_SIZE = int(os.getenv('MATCH_BATCH_SIZE', '16'))
+    MATCH_BATCH_WAIT = float(os.getenv('MATCH_BATCH_WAIT', '0.005'))
+    INVITE_TIMEOUT = float(os.getenv('INVITE_TIMEOUT', '8'))
+    INVITE_ATTEMPTS = int(os.getenv('INVITE_ATTEMPTS', '3'))
+    INVITE_BACKOFF_BASE = float(os.getenv('INVITE_BACKOFF_BASE', '0.5'))
+    INVITE_BACKOFF_MAX = float(os.getenv('INVITE_BACKOFF_MAX', '4'))
+    INVITE_POOL_LOW_WATER = int(os.getenv('INVITE_POOL_LOW_WATER', '3'))
+    INVITE_POOL_TARGET = int(os.getenv('INVITE_POOL_TARGET', '6'))
+    INVITE_POOL_REFILL_BATCH = int(os.getenv('INVITE_POOL_REFILL_BATCH', '2'))
+    INVITE_POOL_REFILL_INTERVAL = float(os.getenv('INVITE_POOL_REFILL_INTERVAL', '30'))
+    INVITE_LINK_TTL = int(os.getenv('INVITE_LINK_TTL', '86400'))
+    DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))
+    USER_FLUSH_INTERVAL = float(os.getenv('USER_FLUSH_INTERVAL', '2'))
+    USER_FLUSH_MAX_PENDING = int(os.getenv('USER_FLUSH_MAX_PENDING', '500'))
+    MEMBER_COUNT_FLUSH_INTERVAL = float(os.getenv('MEMBER_COUNT_FLUSH_INTERVAL', '10'))
+    NORMALIZE_CACHE_SIZE = int(os.getenv('NORMALIZE_CACHE_SIZE', '4096'))
+    STEM_CACHE_SIZE = int(os.getenv('STEM_CACHE_SIZE', '16384'))
+    MODEL_CACHE_DIR = os.getenv('MODEL_CACHE_DIR', './data/models')
+    MATCH_CACHE_ENABLED = os.getenv('MATCH_CACHE_ENABLED', 'true').lower() == 'true'
+    MATCH_CACHE_SIZE = int(os.getenv('MATCH_CACHE_SIZE', '4096'))
+    MATCH_CACHE_MAX_ROWS = int(os.getenv('MATCH_CACHE_MAX_ROWS', '50000'))
+    MATCH_CACHE_FLUSH_INTERVAL = float(os.getenv('MATCH_CACHE_FLUSH_INTERVAL', '2'))
+    MATCH_CACHE_WARM_LIMIT = int(os.getenv('MATCH_CACHE_WARM_LIMIT', '500'))
+    PERSISTENCE_FLUSH_INTERVAL = float(os.getenv('PERSISTENCE_FLUSH_INTERVAL', '5'))
+    USER_STATE_IDLE_TTL = float(os.getenv('USER_STATE_IDLE_TTL', '1800'))
+    USER_STATE_MAX_USERS = int(os.getenv('USER_STATE_MAX_USERS', '10000'))
+    BOT_MODE = os.getenv('BOT_MODE', 'polling')
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+    WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8080')))
+    WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+    CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '32'))
+    USER_LOCK_STRIPES = int(os.getenv('USER_LOCK_STRIPES', '1024'))
+    SHARDS = int(os.getenv('SHARDS', '2'))
+    SHARD_INDEX = int(os.getenv('SHARD_INDEX', '0'))
+    SHARD_SOCKET_DIR = os.getenv('SHARD_SOCKET_DIR', './data/shards')
+    SHARD_QUEUE_SIZE = int(os.getenv('SHARD_QUEUE_SIZE', '1000'))
+    RATE_LIMIT_RATE = float(os.getenv('RATE_LIMIT_RATE', '0.5'))
+    RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', '5'))
+    GLOBAL_RATE_LIMIT = float(os.getenv('GLOBAL_RATE_LIMIT', '50'))
+    GLOBAL_RATE_BURST = int(os.getenv('GLOBAL_RATE_BURST', '100'))
+    RATE_LIMIT_IDLE_TTL = float(os.getenv('RATE_LIMIT_IDLE_TTL', '600'))
+    RATE_LIMIT_NOTICE_INTERVAL = float(os.getenv('RATE_LIMIT_NOTICE_INTERVAL', '10'))
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
 
 # === ВАЖНО: Настройка путей для Railway ===
 def setup_railway_paths():
@@ -40,9 +140,6 @@ def setup_railway_paths():
     os.makedirs(NLTK_DATA_DIR, exist_ok=True)
     os.makedirs('data', exist_ok=True)
     
-    # Настраиваем NLTK
-    nltk.data.path.append(NLTK_DATA_DIR)
-    
     # Путь к базе данных
     if os.getenv('RAILWAY_ENVIRONMENT'):
         # На Railway используем путь в /tmp для сохранения данных между рестартами
@@ -58,25 +155,24 @@ def setup_railway_paths():
 # Получаем пути
 DB_PATH, LOG_PATH = setup_railway_paths()
 
-# Скачиваем только ОСНОВНЫЕ данные NLTK
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    print("📥 Скачивание ОСНОВНЫХ данных NLTK...")
-    nltk.download('punkt', quiet=True, download_dir=NLTK_DATA_DIR)
-    nltk.download('stopwords', quiet=True, download_dir=NLTK_DATA_DIR)
-    print("✅ Основные данные NLTK скачаны")
-
-# Настройка логирования для Railway
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.StreamHandler(sys.stdout),  # Важно для просмотра логов в Railway
-        logging.FileHandler(LOG_PATH)
-    ]
+# Настройка логирования для Railway: stdout (логи Railway) и файл с ротацией.
+# Запись идет из отдельного потока, event loop только кладет записи в очередь
+if BOT_MODE == 'worker':
+    # У каждого воркера свой файл: ротация одного файла из нескольких процессов небезопасна
+    LOG_PATH = LOG_PATH.replace('.log', f'-worker-{os.getenv("SHARD_INDEX", "0")}.log')
+setup_logging(
+    LOG_PATH,
+    level=LOG_LEVEL,
+    module_levels=parse_module_levels(LOG_LEVELS),
+    max_bytes=LOG_MAX_BYTES,
+    backup_count=LOG_BACKUP_COUNT,
+    fmt=LOG_FORMAT
 )
 logger = logging.getLogger(__name__)
+# Логи поиска по каждому запросу: под нагрузкой прореживаются
+match_logger = logging.getLogger('bot.match')
+match_log_sampler = SamplingFilter(per_second=LOG_SAMPLE_PER_SECOND, sample_every=LOG_SAMPLE_EVERY)
+match_logger.addFilter(match_log_sampler)
 
 # Логируем информацию о среде
 logger.info("=" * 50)
@@ -87,550 +183,618 @@ logger.info(f"✅ Токен присутствует: {'Да' if BOT_TOKEN else
 logger.info(f"📏 Длина токена: {len(BOT_TOKEN) if BOT_TOKEN else 0}")
 logger.info("=" * 50)
 
-# Инициализация глобальных переменных для NLP
-stop_words_ru = set(stopwords.words("russian"))
-stop_words_en = set(stopwords.words("english"))
-stemmer_ru = SnowballStemmer("russian")
-stemmer_en = SnowballStemmer("english")
-
-# Темы с подробными описаниями и ключевыми словами
-DETAILED_TOPICS = {
-    "Образование и Саморазвитие": {
-        "keywords": ["учеба", "саморазвитие", "книги", "курсы", "образование", "знание", "развитие", "психология", "мышление", "обучение", "университет", "школа", "знания", "самосовершенствование", "мотивация", "цели", "успех"],
-        "description": "Группа для тех, кто стремится к постоянному развитию, изучению нового и личностному росту.",
-        "emoji": "📚"
-    },
-    "Наука и литература": {
-        "keywords": ["наука", "литература", "книги", "авторы", "научные", "исследования", "научная", "фантастика", "классика", "поэзия", "проза", "литературные", "критика", "научпоп", "физика", "химия", "биология", "история"],
-        "description": "Обсуждение научных открытий, литературных произведений и авторов, научной фантастики и классики.",
-        "emoji": "🔬"
-    },
-    "Программирование": {
-        "keywords": ["программирование", "код", "разработка", "python", "javascript", "веб", "мобильные", "приложения", "алгоритмы", "бэкенд", "фронтенд", "дата", "аналитика", "машинное", "обучение", "искусственный", "интеллект", "нейронные", "сети"],
-        "description": "Группа для разработчиков, где обсуждаются языки программирования, фреймворки и технологии.",
-        "emoji": "💻"
-    },
-    "Экономика и Бизнес": {
-        "keywords": ["экономика", "бизнес", "финансы", "инвестиции", "стартап", "предпринимательство", "рынок", "деньги", "заработок", "доход", "прибыль", "капитал", "бизнесмен", "предприниматель", "трейдинг", "акции", "валюта", "криптовалюта", "форекс", "недвижимость"],
-        "description": "Обсуждение экономических новостей, бизнес-идей, инвестиций и финансовых стратегий.",
-        "emoji": "💰"
-    },
-    "Здоровье и медицина": {
-        "keywords": ["здоровье", "медицина", "фитнес", "питание", "спорт", "йога", "лечение", "профилактика", "психическое", "здоровье", "диета", "витамины", "лекарства", "болезни", "врачи", "психология", "стресс", "сон", "релаксация", "оздоровление"],
-        "description": "Группа о здоровье, фитнесе, правильном питании и медицинских аспектах.",
-        "emoji": "💪"
-    },
-    "Искусство и музыка": {
-        "keywords": ["искусство", "музыка", "творчество", "живопись", "рисование", "композиторы", "исполнители", "творческие", "художники", "графика", "скульpture", "архитектура", "классическая", "рок", "джаз", "поп", "эстрада", "инструменты", "гитара", "фортепиано"],
-        "description": "Обсуждение искусства, музыки, творческих проектов и культурных событий.",
-        "emoji": "🎨"
-    },
-    "Кулинария и рецепты": {
-        "keywords": ["кулинария", "рецепты", "готовка", "еда", "блюда", "ингредиенты", "вкусно", "домашняя", "кухни", "выпечка", "кондитерское", "десерты", "салаты", "супы", "вторые", "блюда", "напитки", "кофе", "чай", "вино"],
-        "description": "Группа для любителей готовить и обмениваться рецептами разных кухонь мира.",
-        "emoji": "🍳"
-    },
-    "Путешествие и туризм": {
-        "keywords": ["путешествие", "туризм", "страны", "город", "отдых", "отпуск", "достопримечательности", "экскурсии", "походы", "автомобильные", "туристические", "маршруты", "гостиницы", "отели", "авиабилеты", "визы", "пляж", "море", "горы", "природа", "экзотика", "бюджетные", "дорогие", "туристы"],
-        "description": "Обсуждение путешествий, туристических маршрутов, стран и мест для отдыха.",
-        "emoji": "✈️"
-    },
-    "Спорт": {
-        "keywords": ["спорт", "фитнес", "тренеровка", "чемпионат", "матчи", "здоровье", "физическая", "активность", "командный", "футбол", "баскетбол", "волейбол", "теннис", "плавание", "бег", "велосипед", "единоборства", "бокс", "бои", "тренажерный", "зал", "диета", "питание"],
-        "description": "Группа о спорте, физической активности и здоровом образе жизни.",
-        "emoji": "⚽"
-    },
-    "Иное": {
-        "keywords": ["разное", "другое", "всякое", "разное", "общее", "разные", "темы", "обсуждения", "общение", "флуд", "разговоры", "мемы", "юмор", "анекдоты", "интересное", "важное", "актуальное", "новости"],
-        "description": "Группа для общения на разные темы, которые не вошли в другие категории.",
-        "emoji": "🔄"
-    }
-}
-
-# ID реальных Telegram групп
-GROUP_IDS = {
-    "Образование и Саморазвитие": "-1003433439121",
-    "Наука и литература": "-1002820402117", 
-    "Программирование": "-1003477061325",
-    "Экономика и Бизнес": "-1003382139382",
-    "Здоровье и медицина": "-1003305866632",
-    "Искусство и музыка": "-1003378596165",
-    "Кулинария и рецепты": "-1003210673239",
-    "Путешествие и туризм": "-1003340734939",
-    "Спорт": "-1003300649893",
-    "Иное": "-1003307595772"
-}
+# Фазы запуска (подробный отчет - python bot.py --profile-startup)
+startup = StartupProfiler(STARTED_AT)
+startup.lap("импорт модулей")
+
+# Детерминированное определение языка (ru/en) с кэшем
+language_detector = LanguageDetector(cache_size=NORMALIZE_CACHE_SIZE)
+
+# Конвейер нормализации запросов с кэшами (создается при прогреве NLP)
+text_normalizer = None
+# Прогрев NLP завершен: до этого поиск ждет в потоках пула
+nlp_ready = threading.Event()
 
 # Состояния для разговоров
 MAIN_MENU, ASK_TOPIC, CHOOSE_TOPIC, JOIN_CHAT, SUPPORT = range(5)
 
+# Обрабатываем только новые сообщения: правки и посты каналов не запрашиваются у Telegram
+NEW_MESSAGE = filters.UpdateType.MESSAGE
+TEXT_INPUT = NEW_MESSAGE & filters.TEXT & ~filters.COMMAND
+
 # Глобальные переменные для кэширования
-topic_vectors = None
-vectorizer = None
+# TF-IDF ранжирование тем (None - работа в режиме базового поиска)
+topic_ranker = None
+# Инвертированный индекс ключевых слов тем
+keyword_index = None
+
+# Пул для поиска чатов вне event loop
+match_executor = MatchExecutor(
+    workers=MATCH_WORKERS,
+    queue_size=MATCH_QUEUE_SIZE,
+    deadline=MATCH_DEADLINE,
+    kind=MATCH_EXECUTOR,
+    # Процессы пула пишут логи сами: поток записи из очереди есть только у родителя
+    initializer=setup_child_logging if MATCH_EXECUTOR == 'process' else None
+)
+
+
+# Сервис и пул инвайт-ссылок (создаются после сборки приложения)
+invite_service = None
+invite_pool = None
+# HTTP-сервер вебхука (только в режиме BOT_MODE=webhook)
+webhook_server = None
+# Прием обновлений от маршрутизатора (только в режиме BOT_MODE=worker)
+shard_listener = None
+
+# Номер воркера среди SHARDS процессов; в одиночном режиме - единственный
+IS_WORKER = BOT_MODE == 'worker'
+SHARD = (SHARD_INDEX, SHARDS) if IS_WORKER else None
+
+# Лимит частоты поиска и выдачи ссылок. Пользователь всегда попадает в один
+# воркер, а общий лимит делится между воркерами поровну
+rate_limiter = RateLimiter(
+    rate=RATE_LIMIT_RATE,
+    burst=RATE_LIMIT_BURST,
+    global_rate=GLOBAL_RATE_LIMIT / (SHARDS if IS_WORKER else 1),
+    global_burst=max(1, GLOBAL_RATE_BURST // (SHARDS if IS_WORKER else 1)),
+    idle_ttl=RATE_LIMIT_IDLE_TTL,
+    notice_interval=RATE_LIMIT_NOTICE_INTERVAL
+)
+
+# Задержки стадий поиска, обработчиков, базы и Bot API
+METRICS.enabled = METRICS_ENABLED
+
+# Разные пользователи обрабатываются параллельно, один - строго по порядку
+update_processor = UserOrderedProcessor(CONCURRENT_UPDATES, stripes=USER_LOCK_STRIPES)
+
+# Отсев повторов и нетекстовых обновлений до диспетчеризации
+update_filter = UpdateFilter()
+
+# Долгоживущее соединение с базой в отдельном потоке
+db = Database(DB_PATH, synchronous=DB_SYNCHRONOUS, cache_size_kb=DB_CACHE_SIZE_KB)
+
+# Активность пользователей пишется пачками
+user_buffer = UserUpsertBuffer(db, max_pending=USER_FLUSH_MAX_PENDING, flush_interval=USER_FLUSH_INTERVAL)
 
-def get_db_connection():
-    """Подключение к базе данных"""
-    return sqlite3.connect(DB_PATH)
+# Счетчики участников копятся в памяти и складываются в chats периодически
+member_counter = MemberCounter(db, flush_interval=MEMBER_COUNT_FLUSH_INTERVAL)
+
+# Каталог чатов в памяти: название -> группа, ключевые слова, описание, эмодзи
+chat_registry = ChatRegistry(db)
+
+# Тексты и клавиатуры ответов по языкам: собираются при загрузке каталога
+templates = TemplateRegistry()
+chat_registry.subscribe(lambda registry: templates.rebuild(registry.chats()))
+
+# Состояния диалогов и user_data переживают перезапуск
+persistence = SQLitePersistence(
+    db,
+    update_interval=PERSISTENCE_FLUSH_INTERVAL,
+    idle_ttl=USER_STATE_IDLE_TTL,
+    max_users=USER_STATE_MAX_USERS,
+    shard=SHARD
+)
 
 def init_database():
     """Инициализация базы данных"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Таблица пользователей
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        user_id INTEGER PRIMARY KEY,
-        username TEXT,
-        first_name TEXT,
-        last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        language TEXT DEFAULT 'ru'
-    )
-    ''')
-
-    # Таблица чатов
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS chats (
-        chat_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        chat_name TEXT UNIQUE,
-        telegram_group_id TEXT,
-        member_count INTEGER DEFAULT 0,
-        is_active BOOLEAN DEFAULT TRUE,
-        keywords TEXT DEFAULT '[]'
-    )
-    ''')
-
-    # Таблица участия пользователей в чатах
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS user_chats (
-        user_id INTEGER,
-        chat_id INTEGER,
-        join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (user_id),
-        FOREIGN KEY (chat_id) REFERENCES chats (chat_id),
-        PRIMARY KEY (user_id, chat_id)
-    )
-    ''')
-
-    # Таблица пула интересов
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS interest_pool (
-        user_id INTEGER,
-        topic_name TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        status TEXT DEFAULT 'pending',
-        FOREIGN KEY (user_id) REFERENCES users (user_id)
-    )
-    ''')
-
+    version = db.call(migrations.migrate)
+    logger.info(f"📐 Версия схемы базы: {version}")
+    
     # Добавляем предопределенные темы
-    for topic, group_id in GROUP_IDS.items():
-        cursor.execute('''
-        INSERT OR IGNORE INTO chats (chat_name, telegram_group_id, keywords) 
-        VALUES (?, ?, ?)
-        ''', (topic, group_id, json.dumps(DETAILED_TOPICS[topic]['keywords'])))
-        
-    conn.commit()
-    conn.close()
+    db.call(database.seed_chats, GROUP_IDS, DETAILED_TOPICS)
+    chat_registry.load()
     logger.info("✅ База данных инициализирована")
 
+def load_nlp_resources():
+    """Стоп-слова и стеммеры NLTK: тяжелый импорт, поэтому не при старте модуля"""
+    global text_normalizer
+    
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.stem import SnowballStemmer
+    
+    nltk.data.path.append(NLTK_DATA_DIR)
+    # Данные NLTK ставятся при сборке образа; скачивание - только запасной вариант
+    try:
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        logger.warning("📥 Данных NLTK нет в образе, скачиваем stopwords...")
+        nltk.download('stopwords', quiet=True, download_dir=NLTK_DATA_DIR)
+    
+    text_normalizer = TextNormalizer(
+        {'ru': set(stopwords.words("russian")), 'en': set(stopwords.words("english"))},
+        {'ru': SnowballStemmer("russian"), 'en': SnowballStemmer("english")},
+        cache_size=NORMALIZE_CACHE_SIZE,
+        stem_cache_size=STEM_CACHE_SIZE
+    )
+
+def warm_nlp(profiler=None):
+    """Прогрев NLP: данные NLTK, индекс ключевых слов, TF-IDF и пул поиска"""
+    started_at = time.perf_counter()
+    try:
+        load_nlp_resources()
+        if profiler:
+            profiler.lap("NLTK: стоп-слова и стеммеры")
+        preload_nlp_models()
+        if profiler:
+            profiler.lap("индекс ключевых слов и TF-IDF")
+        # Пул создаем после загрузки моделей: процессы унаследуют их при fork
+        match_executor.start()
+    except Exception as e:
+        logger.error(f"❌ Ошибка прогрева NLP: {e}")
+        if profiler:
+            profiler.lap("прогрев NLP (ошибка)")
+    finally:
+        # Даже при ошибке поиск перестает ждать и уходит в fallback
+        nlp_ready.set()
+    logger.info(f"🔥 NLP прогрет за {time.perf_counter() - started_at:.2f} сек")
+    
+    warm_match_cache()
+    if profiler:
+        profiler.lap("прогрев кэша поиска")
+
+def warm_match_cache():
+    """Пересчет частых запросов под текущий каталог тем.
+    
+    База общая, поэтому при нескольких воркерах прогревает только первый.
+    Возвращает число пересчитанных запросов.
+    """
+    if IS_WORKER and SHARD_INDEX != 0:
+        return 0
+    try:
+        return match_cache.warm(find_best_matching_chats, limit=MATCH_CACHE_WARM_LIMIT, batch_size=MATCH_BATCH_SIZE)
+    except Exception as e:
+        logger.error(f"❌ Ошибка прогрева кэша поиска: {e}")
+        return 0
+
 def preload_nlp_models():
     """Предзагрузка NLP моделей для ускорения работы (облегченная версия)"""
-    global topic_vectors, vectorizer
+    global topic_ranker, keyword_index
+    
+    # sklearn и scipy импортируются только здесь
+    from topic_ranker import TopicRanker
     
     logger.info("🔄 Загрузка NLP моделей (облегченная версия)...")
     
+    # Профили langdetect загружаем сейчас, а не на первом смешанном запросе
+    try:
+        language_detector.warm()
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось загрузить профили langdetect: {e}")
+    
+    # Индекс ключевых слов строим один раз на весь каталог
+    keyword_index = KeywordIndex.build(chat_registry.chats(), text_normalizer)
+    logger.info(f"✅ Индекс ключевых слов: {len(keyword_index)} основ")
+    
     try:
         # Используем TF-IDF вместо тяжелых эмбеддингов
-        vectorizer = TfidfVectorizer(
-            stop_words=list(stop_words_ru) + list(stop_words_en),
-            max_features=1000,
-            ngram_range=(1, 2)
-        )
-        
-        # Подготавливаем тексты для обучения
         topic_texts = []
         topic_names = []
         
-        for topic, data in DETAILED_TOPICS.items():
-            # Объединяем название, ключевые слова и описание
-            keywords = " ".join(data['keywords'])
-            description = data['description']
-            full_text = f"{topic} {keywords} {description}"
+        for chat in chat_registry.chats():
+            # Объединяем название, ключевые слова и описание и нормализуем
+            # тем же конвейером, что и запросы, чтобы основы слов совпадали
+            keywords = " ".join(chat.keywords)
+            full_text = f"{chat.name} {keywords} {chat.description}"
             
-            topic_texts.append(full_text)
-            topic_names.append(topic)
+            topic_texts.append(text_normalizer.normalize(full_text, 'ru'))
+            topic_names.append(chat.name)
         
-        # Обучаем TF-IDF
-        logger.info("🔄 Обучение TF-IDF векторизатора...")
-        topic_vectors = vectorizer.fit_transform(topic_texts)
+        # Обучаем TF-IDF, только если темы изменились с прошлого запуска
+        logger.info("🔄 Загрузка TF-IDF модели...")
+        topic_ranker = TopicRanker.load_or_fit(MODEL_CACHE_DIR, topic_names, topic_texts)
         
-        logger.info(f"✅ TF-IDF модель обучена: {len(topic_names)} тем, {topic_vectors.shape[1]} признаков")
+        logger.info(f"✅ TF-IDF модель готова: {topic_ranker.n_topics} тем, {topic_ranker.n_features} признаков")
         
     except Exception as e:
         logger.error(f"❌ Ошибка загрузки NLP моделей: {e}")
         logger.info("⚠️ Работа в режиме базового поиска")
-        vectorizer = None
-        topic_vectors = None
+        topic_ranker = None
+    
+    # Модели готовы - кэш читает записи нового каталога. Результаты
+    # базового поиска (без TF-IDF) не кэшируются
+    match_cache.set_version(catalog_version(chat_registry.fingerprint) if topic_ranker is not None else None)
 
 def preprocess_text(text, language='ru'):
     """Предобработка текста для анализа"""
     # Определяем язык, если не указан
     if language == 'auto':
-        try:
-            language = detect(text)
-        except:
-            language = 'ru'
+        language = language_detector.detect(text)
     
-    # Приводим к нижнему регистру
-    text = text.lower()
+    # Токенизация, стоп-слова и стемминг (с кэшированием)
+    return text_normalizer.normalize(text, language), language
+
+def match_exact_or_keywords(user_query):
+    """Шаги 1-2 поиска: (результат или None, нормализованный запрос).
     
-    # Удаляем специальные символы и числа
-    text = re.sub(r'[^\w\s]', ' ', text)
-    text = re.sub(r'\d+', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
+    Точное совпадение с названием темы не требует NLP и проверяется первым.
+    Если данные NLTK не загрузились, нормализованного запроса нет (None):
+    ключевые слова и TF-IDF пропускаются, остается fallback.
+    """
+    match_logger.debug("🔍 Поиск чата для запроса: '%s'", user_query)
     
-    # Токенизация
-    tokens = word_tokenize(text)
+    # Шаг 1: Проверяем на точное совпадение с названиями чатов
+    with METRICS.timer('bot_match_stage_seconds', 'exact'):
+        query_lower = user_query.lower()
+        exact_match = next(
+            (chat_name for chat_name in chat_registry.names()
+             if query_lower in chat_name.lower() or chat_name.lower() in query_lower),
+            None
+        )
+    if exact_match:
+        match_logger.debug("✅ Найдено точное совпадение: %s", exact_match)
+        METRICS.inc('bot_match_winner_total', 'exact')
+        return (exact_match, 1.0, "точное совпадение"), None
     
-    # Удаляем стоп-слова и выполняем стемминг
-    if language.startswith('ru'):
-        tokens = [stemmer_ru.stem(token) for token in tokens if token not in stop_words_ru and len(token) > 2]
-    else:
-        tokens = [stemmer_en.stem(token) for token in tokens if token not in stop_words_en and len(token) > 2]
+    if text_normalizer is None:
+        return None, None
     
-    return " ".join(tokens), language
-
-def find_best_matching_chat(user_query):
-    """Интеллектуальный поиск наиболее подходящего чата"""
-    try:
-        logger.info(f"🔍 Поиск чата для запроса: '{user_query}'")
-        
-        # Определяем язык запроса
-        detected_lang = detect(user_query) if len(user_query) > 3 else 'ru'
-        logger.info(f"🗣️ Обнаружен язык: {detected_lang}")
-        
-        # Предобработка запроса
+    # Определяем язык запроса
+    with METRICS.timer('bot_match_stage_seconds', 'language'):
+        detected_lang = language_detector.detect(user_query)
+    match_logger.debug("🗣️ Обнаружен язык: %s", detected_lang)
+    
+    # Предобработка запроса
+    with METRICS.timer('bot_match_stage_seconds', 'preprocess'):
         processed_query, query_lang = preprocess_text(user_query, detected_lang)
-        logger.info(f"⚙️ Обработанный запрос: '{processed_query}'")
-        
-        # Шаг 1: Проверяем на точное совпадение с названиями чатов
-        logger.info("🎯 Поиск точных совпадений...")
-        for chat_name, group_id in GROUP_IDS.items():
-            if (user_query.lower() in chat_name.lower() or 
-                chat_name.lower() in user_query.lower()):
-                logger.info(f"✅ Найдено точное совпадение: {chat_name}")
-                return chat_name, 1.0, "точное совпадение"
-        
-        # Шаг 2: Поиск по ключевым словам
-        logger.info("🔑 Поиск по ключевым словам...")
-        best_match = None
-        best_score = 0.0
-        match_reason = ""
-        
-        query_words = set(processed_query.split())
-        
-        for topic, data in DETAILED_TOPICS.items():
-            topic_keywords_set = set(word.lower() for word in data['keywords'])
-            intersection = query_words.intersection(topic_keywords_set)
-            
-            if intersection:
-                score = len(intersection) / len(topic_keywords_set)
-                if score > best_score:
-                    best_score = score
-                    best_match = topic
-                    match_reason = "ключевые слова: " + ", ".join(intersection)
-                    logger.info(f"🔍 Найдено совпадение по ключевым словам для '{topic}': {intersection}")
-        
-        if best_match and best_score >= 0.3:
-            logger.info(f"✅ Найдено совпадение по ключевым словам: {best_match} (score: {best_score:.2f})")
-            # Упрощаем причину для пользователя
-            return best_match, best_score, "совпадение по теме"
+    match_logger.debug("⚙️ Обработанный запрос: '%s'", processed_query)
+    
+    # Шаг 2: Поиск по ключевым словам
+    with METRICS.timer('bot_match_stage_seconds', 'keywords'):
+        keyword_match = keyword_index.score(processed_query.split()) if keyword_index else None
+    
+    if keyword_match:
+        best_match, best_score, matched_stems = keyword_match
+        match_logger.debug("🔍 Совпадение по ключевым словам для '%s': %s", best_match, matched_stems)
+    
+    if keyword_match and best_score >= 0.3:
+        METRICS.inc('bot_match_winner_total', 'keywords')
+        # Упрощаем причину для пользователя
+        return (best_match, best_score, "совпадение по теме"), processed_query
+    
+    return None, processed_query
+
+# Тема по умолчанию, пока она есть в каталоге
+DEFAULT_TOPIC = "Путешествие и туризм"
+
+def default_topic():
+    """Тема для запросов без совпадений: DEFAULT_TOPIC или первая активная.
+    
+    Каталог правится в базе, поэтому названия сверяются с ним; None -
+    каталог пуст.
+    """
+    if DEFAULT_TOPIC in chat_registry:
+        return DEFAULT_TOPIC
+    names = chat_registry.names()
+    return names[0] if names else None
+
+def match_fallback(user_query):
+    """Шаг 4 поиска: основная тема запроса или самый популярный чат"""
+    
+    # Определяем основную тему запроса
+    main_themes = {
+        "путешествие": ["Путешествие и туризм", "Спорт"],
+        "экономика": ["Экономика и Бизнес", "Образование и Саморазвитие"],
+        "здоровье": ["Здоровье и медицина", "Спорт"],
+        "программирование": ["Программирование", "Наука и литература"],
+        "искусство": ["Искусство и музыка", "Образование и Саморазвитие"],
+        "кулинария": ["Кулинария и рецепты", "Здоровье и медицина"],
+        "спорт": ["Спорт", "Здоровье и медицина"],
+        "наука": ["Наука и литература", "Образование и Саморазвитие"],
+        "образование": ["Образование и Саморазвитие", "Наука и литература"]
+    }
+    
+    for keyword, themes in main_themes.items():
+        if keyword in user_query.lower():
+            # Темы, убранные из каталога, пропускаем
+            theme = next((name for name in themes if name in chat_registry), None)
+            if theme:
+                match_logger.debug("🔄 Найден ключевой термин '%s', предлагаю тему: %s", keyword, theme)
+                return theme, 0.4, f"ключевой термин: {keyword}"
+    
+    # Если ничего не нашли, предлагаем самый популярный чат
+    match_logger.debug("⭐ Предлагаем самый популярный чат")
+    return default_topic(), 0.3, "самый популярный чат"
+
+def find_best_matching_chats(user_queries):
+    """Интеллектуальный поиск чатов для пачки запросов.
+    
+    Точные совпадения и ключевые слова проверяются по каждому запросу,
+    а TF-IDF считается для всех оставшихся запросов одним умножением.
+    """
+    # Первые запросы после старта ждут окончания прогрева NLP
+    nlp_ready.wait()
+    
+    results = [None] * len(user_queries)
+    unresolved = []
+    
+    for i, user_query in enumerate(user_queries):
+        try:
+            results[i], processed_query = match_exact_or_keywords(user_query)
+            if results[i] is None and processed_query is not None:
+                unresolved.append((i, processed_query))
+        except Exception as e:
+            match_logger.error("❌ Ошибка при поиске чата, используем fallback: %s", e)
+            METRICS.inc('bot_match_winner_total', 'error')
+            results[i] = (default_topic(), 0.3, "ошибка поиска")
+    
+    # Шаг 3: TF-IDF поиск (замена семантическому) сразу для всей пачки
+    ranker = topic_ranker
+    if unresolved and ranker is not None:
+        match_logger.debug("🔤 TF-IDF поиск для %d запросов", len(unresolved))
+        try:
+            # Одно наблюдение на пачку: TF-IDF считается для всех запросов сразу
+            with METRICS.timer('bot_match_stage_seconds', 'tfidf'):
+                ranked = ranker.rank([processed_query for _, processed_query in unresolved])
+        except Exception as e:
+            match_logger.error("❌ Ошибка TF-IDF поиска: %s", e)
+            ranked = [[] for _ in unresolved]
         
-        # Шаг 3: TF-IDF поиск (замена семантическому)
-        logger.info("🔤 TF-IDF поиск...")
-        if vectorizer is not None and topic_vectors is not None:
-            # Преобразуем запрос в TF-IDF вектор
-            query_vector = vectorizer.transform([processed_query])
-            
-            # Вычисляем косинусное сходство
-            similarities = cosine_similarity(query_vector, topic_vectors)
-            
-            # Находим максимальное сходство
-            max_similarity_idx = similarities.argmax()
-            max_similarity = similarities[0, max_similarity_idx]
+        for (i, _), top_matches in zip(unresolved, ranked):
+            if not top_matches:
+                continue
+            # Косинусное сходство лучшей темы (векторы нормализованы)
+            best_match, max_similarity = top_matches[0]
             
             if max_similarity > 0.1:  # Порог ниже, так как TF-IDF менее точен
-                best_match = list(DETAILED_TOPICS.keys())[max_similarity_idx]
-                logger.info(f"✅ Найдено TF-IDF совпадение: {best_match} (score: {max_similarity:.2f})")
-                return best_match, float(max_similarity), "похожая тематика"
-        
-        # Шаг 4: Fallback - предлагаем самый популярный чат или чат, наиболее близкий по тематике
-        logger.info("🔄 Fallback поиск...")
-        
-        # Определяем основную тему запроса
-        main_themes = {
-            "путешествие": ["Путешествие и туризм", "Спорт"],
-            "экономика": ["Экономика и Бизнес", "Образование и Саморазвитие"],
-            "здоровье": ["Здоровье и медицина", "Спорт"],
-            "программирование": ["Программирование", "Наука и литература"],
-            "искусство": ["Искусство и музыка", "Образование и Саморазвитие"],
-            "кулинария": ["Кулинария и рецепты", "Здоровье и медицина"],
-            "спорт": ["Спорт", "Здоровье и медицина"],
-            "наука": ["Наука и литература", "Образование и Саморазвитие"],
-            "образование": ["Образование и Саморазвитие", "Наука и литература"]
-        }
-        
-        for keyword, themes in main_themes.items():
-            if keyword in user_query.lower():
-                logger.info(f"🔄 Найден ключевой термин '{keyword}', предлагаю тему: {themes[0]}")
-                return themes[0], 0.4, f"ключевой термин: {keyword}"
-        
-        # Если ничего не нашли, предлагаем самый популярный чат
-        logger.info("⭐ Предлагаем самый популярный чат")
-        return "Путешествие и туризм", 0.3, "самый популярный чат"
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка при поиске чата: {e}")
-        logger.info("🔄 Используем fallback вариант")
-        return "Путешествие и туризм", 0.3, "ошибка поиска"
+                results[i] = (best_match, float(max_similarity), "похожая тематика")
+                METRICS.inc('bot_match_winner_total', 'tfidf')
+    
+    # Шаг 4: Fallback - предлагаем самый популярный чат или чат, наиболее близкий по тематике
+    for i, user_query in enumerate(user_queries):
+        if results[i] is None:
+            with METRICS.timer('bot_match_stage_seconds', 'fallback'):
+                results[i] = match_fallback(user_query)
+            METRICS.inc('bot_match_winner_total', 'fallback')
+    
+    # Одна строка INFO на запрос вместо строки на каждый шаг
+    for user_query, (chat_name, score, reason) in zip(user_queries, results):
+        match_logger.info("🔍 '%s' -> %s (%s, %.2f)", user_query, chat_name, reason, score)
+    
+    return results
+
+def find_best_matching_chat(user_query):
+    """Интеллектуальный поиск наиболее подходящего чата"""
+    return find_best_matching_chats([user_query])[0]
+
+# Запросы, пришедшие почти одновременно, ищутся одной пачкой
+match_batcher = MatchBatcher(
+    match_executor,
+    find_best_matching_chats,
+    batch_size=MATCH_BATCH_SIZE,
+    max_wait=MATCH_BATCH_WAIT
+)
 
-def get_invite_link_simple(group_id, bot_token):
-    """Получение инвайт-ссылки через API запрос"""
+# Повторяющиеся запросы отвечаются из кэша без поиска
+match_cache = MatchCache(
+    db,
+    max_size=MATCH_CACHE_SIZE,
+    max_rows=MATCH_CACHE_MAX_ROWS,
+    flush_interval=MATCH_CACHE_FLUSH_INTERVAL,
+    # Сбой поиска не должен запоминаться
+    skip_reasons=("ошибка поиска",),
+    enabled=MATCH_CACHE_ENABLED
+)
+
+async def submit_match(user_query):
+    """Поиск темы через кэш результатов; промах уходит в пачку поиска.
+    
+    Возвращает future с (тема, оценка, причина). При попадании в кэш он
+    уже выполнен - сообщение о поиске можно не отправлять. Как и
+    MatchBatcher.submit, бросает MatcherBusyError при переполненном пуле.
+    """
+    query = normalize_query(user_query)
+    version = match_cache.version
+    cached = await match_cache.get(query)
+    if cached is not None:
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(cached)
+        return future
+    
+    def remember(done):
+        if not done.cancelled() and done.exception() is None:
+            match_cache.put(query, done.result(), version)
+    
+    pending_match = match_batcher.submit(query)
+    pending_match.add_done_callback(remember)
+    return pending_match
+
+async def over_rate_limit(update):
+    """Проверка лимита перед поиском или выдачей ссылки.
+    
+    Отклоненное сообщение не доходит до NLP и Telegram API; ответ - готовый
+    текст без клавиатуры, и не чаще раза в RATE_LIMIT_NOTICE_INTERVAL.
+    """
+    user_id = update.effective_user.id
+    reason = rate_limiter.acquire(user_id)
+    METRICS.inc('bot_rate_limit_total', reason or 'allowed')
+    if reason is None:
+        return False
+    if rate_limiter.should_notice(user_id):
+        t = texts_for(update)
+        await update.message.reply_text(t.text['rate_limited' if reason == 'user' else 'busy'], parse_mode='Markdown')
+    return True
+
+async def get_invite_link(group_id, user_id):
+    """Получение инвайт-ссылки: из пула, а если он пуст - через HTTP-клиент бота"""
+    invite_link = await invite_pool.issue(group_id, user_id)
+    if invite_link:
+        METRICS.inc('bot_invite_links_total', 'pool')
+        return invite_link
+    
     try:
-        url = f"https://api.telegram.org/bot{bot_token}/createChatInviteLink"
-        params = {
-            'chat_id': group_id,
-            'member_limit': 1,
-            'name': f'Инвайт от бота {datetime.now().strftime("%Y%m%d")}'
-        }
-        
-        response = requests.post(url, data=params, timeout=15)
-        data = response.json()
-        
-        if data.get('ok'):
-            return data['result']['invite_link']
-        else:
-            error_msg = data.get('description', 'Неизвестная ошибка')
-            logger.error(f"❌ Ошибка Telegram API: {error_msg}")
-            return f"❌ Ошибка Telegram: {error_msg}"
-            
-    except Exception as e:
-        logger.error(f"❌ Ошибка при получении ссылки: {e}")
-        return f"❌ Сетевая ошибка: {str(e)}"
-
-def get_main_menu_keyboard():
-    """Получение клавиатуры главного меню"""
-    keyboard = [
-        [KeyboardButton("🔍 Найти группу по интересам")],
-        [KeyboardButton("📋 Мои группы"), KeyboardButton("👤 Профиль")],
-        [KeyboardButton("🎯 Популярные темы"), KeyboardButton("❓ Помощь")],
-        [KeyboardButton("🆘 Поддержка")]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-def get_popular_topics_keyboard():
-    """Получение клавиатуры популярных тем с эмодзи"""
-    keyboard = []
-    
-    # Группируем темы по 2 в строке
-    for i in range(0, len(DETAILED_TOPICS), 2):
-        row = []
-        for j in range(i, min(i+2, len(DETAILED_TOPICS))):
-            topic = list(DETAILED_TOPICS.keys())[j]
-            emoji = DETAILED_TOPICS[topic]['emoji']
-            row.append(KeyboardButton(f"{emoji} {topic}"))
-        keyboard.append(row)
-    
-    keyboard.append([KeyboardButton("🔙 Назад"), KeyboardButton("❌ Отказаться")])
-    
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        invite_link = await invite_service.get_link(group_id, user_id)
+    except InviteLinkError as e:
+        logger.error(f"❌ Ошибка при получении ссылки для {group_id}: {e}")
+        METRICS.inc('bot_invite_links_total', 'error')
+        return f"❌ {e}"
+    METRICS.inc('bot_invite_links_total', 'api')
+    return invite_link
+
+def texts_for(update):
+    """Готовые тексты и клавиатуры на языке пользователя"""
+    return templates.for_user(update.effective_user)
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Приветствие с умным меню"""
     user = update.message.from_user
     
     # Определяем язык пользователя
-    try:
-        user_lang = update.message.from_user.language_code
-    except:
-        user_lang = 'ru'
-    
-    # Сохраняем пользователя в БД
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-    INSERT OR REPLACE INTO users (user_id, username, first_name, language, last_active)
-    VALUES (?, ?, ?, ?, datetime('now'))
-    ''', (user.id, user.username, user.first_name, user_lang[:2]))
-    conn.commit()
-    conn.close()
-    
-    welcome_text = f"""
-🤖 **Привет, {user.first_name}!**
-    
-🌟 **Я - ваш личный гид по миру единомышленников!**
-
-Здесь люди с общими интересами:
-✅ Создают совместные проекты
-✅ Обсуждают идеи и находят решения  
-✅ Развиваются вместе и поддерживают друг друга
-✅ Делятся знаниями и опытом
-
-🎯 **Что вас интересует сегодня?** Выберите действие из меню ниже 👇
-"""
+    user_lang = user.language_code or 'ru'
+    
+    # Сохраняем пользователя в БД (отложенно, пачкой с другими)
+    user_buffer.add(user.id, user.username, user.first_name, user_lang[:2])
     
-    await update.message.reply_text(welcome_text, parse_mode='Markdown', reply_markup=get_main_menu_keyboard())
+    t = templates.get(user_lang)
+    await update.message.reply_text(
+        t.format['welcome'](first_name=user.first_name),
+        parse_mode='Markdown',
+        reply_markup=t.keyboard['main_menu']
+    )
     return MAIN_MENU
 
 async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработка выбора в главном меню"""
     user_input = update.message.text.strip()
-    user_id = update.message.from_user.id
+    t = texts_for(update)
     
     # Обработка естественных запросов
     if user_input.lower() in ["привет", "здравствуй", "hello", "hi", "привет!", "здравствуй!"]:
         return await start_command(update, context)
     
     if user_input.lower() in ["пока", "до свидания", "пока!", "до свидания!"]:
-        goodbye_text = """
-👋 **До свидания!** 
-
-💡 **Не забывайте:** Вы всегда можете вернуться, нажав /start в любое время.
-
-🌟 **Ждем вас снова!**
-"""
-        await update.message.reply_text(goodbye_text, parse_mode='Markdown', reply_markup=get_main_menu_keyboard())
+        await update.message.reply_text(t.text['goodbye'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
         return MAIN_MENU
     
     # Обработка команд меню
-    if user_input == "🔍 Найти группу по интересам":
-        await update.message.reply_text(
-            "🎯 **Что вас интересует?**\n\n"
-            "Напишите тему, например:\n"
-            "• 'путешествия по Азии'\n"
-            "• 'программирование на Python'\n"
-            "• 'здоровое питание'\n"
-            "• 'фотография и дизайн'\n\n"
-            "💡 **Или просто напишите ключевое слово:** 'путешествия', 'спорт', 'книги'",
-            parse_mode='Markdown',
-            reply_markup=ReplyKeyboardRemove()
-        )
+    action = templates.action(user_input)
+    if action == 'find':
+        await update.message.reply_text(t.text['ask_topic'], parse_mode='Markdown', reply_markup=t.keyboard['remove'])
         return ASK_TOPIC
     
-    elif user_input == "📋 Мои группы":
+    elif action == 'groups':
         return await groups_command(update, context)
     
-    elif user_input == "👤 Профиль":
+    elif action == 'profile':
         return await profile_command(update, context)
     
-    elif user_input == "🎯 Популярные темы":
+    elif action == 'popular':
         return await show_popular_topics(update, context)
     
-    elif user_input == "❓ Помощь":
+    elif action == 'help':
         return await help_command(update, context)
     
-    elif user_input == "🆘 Поддержка":
+    elif action == 'support':
         return await support_command(update, context)
     
     else:
         # Проверяем, не является ли это командой
         if user_input.startswith('/'):
             await update.message.reply_text(
-                "❓ **Неизвестная команда.** Используйте меню для выбора действия.",
-                parse_mode='Markdown',
-                reply_markup=get_main_menu_keyboard()
+                t.text['unknown_command'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu']
             )
             return MAIN_MENU
         
         # Умный поиск по любому сообщению
-        await update.message.reply_text(
-            "🔍 **Анализирую вашу тему...**\n\nПожалуйста, подождите немного, я ищу подходящие группы для вас.",
-            parse_mode='Markdown'
-        )
+        if await over_rate_limit(update):
+            return MAIN_MENU
         
-        chat_name, score, reason = find_best_matching_chat(user_input)
+        try:
+            pending_match = await submit_match(user_input)
+        except MatcherBusyError as e:
+            logger.warning(f"⏳ Пул поиска переполнен: {e}")
+            await update.message.reply_text(t.text['busy'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
+            return MAIN_MENU
         
-        if chat_name and score > 0.1:  # Фильтруем слишком низкие совпадения
-            # Убираем технические детали для пользователя
-            if reason == "точное совпадение":
-                reason_text = "идеально подходит под ваш запрос"
-            elif reason == "совпадение по теме":
-                reason_text = "совпадает с вашими интересами"
-            elif reason == "похожая тематика":
-                reason_text = "похожа на ваш запрос"
-            elif "ключевой термин" in reason:
-                reason_text = "содержит ключевые слова из вашего запроса"
-            else:
-                reason_text = "может быть интересна вам"
-            
+        if not pending_match.done():
+            await update.message.reply_text(t.text['analyzing_menu'], parse_mode='Markdown')
+        
+        try:
+            chat_name, score, reason = await pending_match
+        except MatcherTimeoutError as e:
+            logger.warning(f"⌛ Таймаут поиска: {e}")
             await update.message.reply_text(
-                f"🎯 **Я нашел подходящую группу для вас!**\n\n"
-                f"**Тема:** {chat_name}\n"
-                f"**Почему эта группа:** {reason_text}\n\n"
-                f"**Описание:** {DETAILED_TOPICS[chat_name]['description']}\n\n"
-                f"Хотите присоединиться к группе «{chat_name}»?",
+                t.text['match_timeout'], parse_mode='Markdown', reply_markup=t.keyboard['popular_topics']
+            )
+            return CHOOSE_TOPIC
+        except MatcherBusyError as e:
+            # Пачку не удалось отправить: пул заполнился, пока она собиралась
+            logger.warning(f"⏳ Пул поиска переполнен: {e}")
+            await update.message.reply_text(t.text['busy'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
+            return MAIN_MENU
+        
+        # Тема могла пропасть из каталога после /reload_topics - считаем, что не нашли
+        chat = chat_registry.get(chat_name) if chat_name else None
+        if chat and score > 0.1:  # Фильтруем слишком низкие совпадения
+            await update.message.reply_text(
+                t.format['match_found_menu'](
+                    chat_name=chat_name,
+                    # Убираем технические детали для пользователя
+                    reason=t.reason(reason),
+                    description=chat.description
+                ),
                 parse_mode='Markdown',
-                reply_markup=ReplyKeyboardMarkup([
-                    [KeyboardButton("✅ Присоединиться"), KeyboardButton("❌ Отказаться")],
-                    [KeyboardButton("🔄 Другие варианты"), KeyboardButton("🏠 В меню")]
-                ], resize_keyboard=True)
+                reply_markup=t.keyboard['join_more']
             )
             context.user_data['selected_chat'] = chat_name
             return JOIN_CHAT
         else:
             await update.message.reply_text(
-                "🔍 **К сожалению, я не нашел подходящей группы по вашему запросу.**\n\n"
-                "🎯 **Попробуйте выбрать из популярных тем:**",
-                parse_mode='Markdown',
-                reply_markup=get_popular_topics_keyboard()
+                t.text['not_found'], parse_mode='Markdown', reply_markup=t.keyboard['popular_topics']
             )
             return CHOOSE_TOPIC
 
 async def handle_ask_topic(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработка ввода темы с интеллектуальным поиском"""
     user_topic = update.message.text.strip()
+    t = texts_for(update)
     
-    await update.message.reply_text(
-        "🧠 **Анализирую ваш запрос...**\n\nЭто может занять 10-15 секунд. Я ищу самые релевантные группы для вас.",
-        parse_mode='Markdown'
-    )
+    if await over_rate_limit(update):
+        return ASK_TOPIC
     
-    chat_name, score, reason = find_best_matching_chat(user_topic)
-    
-    if chat_name and score > 0.1:  # Фильтруем слишком низкие совпадения
-        # Убираем технические детали для пользователя
-        if reason == "точное совпадение":
-            reason_text = "идеально подходит под ваш запрос"
-        elif reason == "совпадение по теме":
-            reason_text = "совпадает с вашими интересами"
-        elif reason == "похожая тематика":
-            reason_text = "похожа на ваш запрос"
-        elif "ключевой термин" in reason:
-            reason_text = "содержит ключевые слова из вашего запроса"
-        else:
-            reason_text = "может быть интересна вам"
-        
+    try:
+        pending_match = await submit_match(user_topic)
+    except MatcherBusyError as e:
+        logger.warning(f"⏳ Пул поиска переполнен: {e}")
+        await update.message.reply_text(t.text['busy'], parse_mode='Markdown')
+        return ASK_TOPIC
+    
+    if not pending_match.done():
+        await update.message.reply_text(t.text['analyzing_topic'], parse_mode='Markdown')
+    
+    try:
+        chat_name, score, reason = await pending_match
+    except MatcherTimeoutError as e:
+        logger.warning(f"⌛ Таймаут поиска: {e}")
         await update.message.reply_text(
-            f"🎯 **Отлично! Я нашел идеальную группу для вас!**\n\n"
-            f"**Тема:** {chat_name}\n"
-            f"**Почему эта группа:** {reason_text}\n\n"
-            f"**Описание:** {DETAILED_TOPICS[chat_name]['description']}\n\n"
-            f"Хотите присоединиться к группе «{chat_name}»?",
+            t.text['match_timeout'], parse_mode='Markdown', reply_markup=t.keyboard['popular_topics']
+        )
+        return CHOOSE_TOPIC
+    except MatcherBusyError as e:
+        logger.warning(f"⏳ Пул поиска переполнен: {e}")
+        await update.message.reply_text(t.text['busy'], parse_mode='Markdown')
+        return ASK_TOPIC
+    
+    # Тема могла пропасть из каталога после /reload_topics - считаем, что не нашли
+    chat = chat_registry.get(chat_name) if chat_name else None
+    if chat and score > 0.1:  # Фильтруем слишком низкие совпадения
+        await update.message.reply_text(
+            t.format['match_found_topic'](
+                chat_name=chat_name,
+                # Убираем технические детали для пользователя
+                reason=t.reason(reason),
+                description=chat.description
+            ),
             parse_mode='Markdown',
-            reply_markup=ReplyKeyboardMarkup([
-                [KeyboardButton("✅ Присоединиться"), KeyboardButton("❌ Отказаться")]
-            ], resize_keyboard=True)
+            reply_markup=t.keyboard['join']
         )
         context.user_data['selected_chat'] = chat_name
         context.user_data['user_topic'] = user_topic
         return JOIN_CHAT
     else:
         await update.message.reply_text(
-            "🔍 **К сожалению, я не нашел подходящей группы по вашему запросу.**\n\n"
-            "🎯 **Попробуйте выбрать из популярных тем:**",
-            parse_mode='Markdown',
-            reply_markup=get_popular_topics_keyboard()
+            t.text['not_found'], parse_mode='Markdown', reply_markup=t.keyboard['popular_topics']
         )
         return CHOOSE_TOPIC
 
@@ -638,319 +802,162 @@ async def handle_join_decision(update: Update, context: ContextTypes.DEFAULT_TYP
     """Обработка решения о присоединении"""
     user_decision = update.message.text.strip()
     user_id = update.message.from_user.id
+    t = texts_for(update)
+    action = templates.action(user_decision)
     
-    if user_decision == "❌ Отказаться":
-        await update.message.reply_text(
-            "👋 **Хорошо, вы отказались от присоединения.**\n\n"
-            "💡 **Это абсолютно нормально!** Вы можете найти другую группу или вернуться позже.\n\n"
-            "🎯 **Что дальше?**",
-            parse_mode='Markdown',
-            reply_markup=get_main_menu_keyboard()
-        )
+    if action == 'refuse':
+        await update.message.reply_text(t.text['join_refused'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
         return MAIN_MENU
     
-    if user_decision == "🏠 В меню":
-        await update.message.reply_text(
-            "🏠 **Вы вернулись в главное меню**\n\nВыберите действие:",
-            parse_mode='Markdown',
-            reply_markup=get_main_menu_keyboard()
-        )
+    if action == 'menu':
+        await update.message.reply_text(t.text['back_to_menu'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
         return MAIN_MENU
     
-    if user_decision == "✅ Присоединиться":
+    if action == 'join':
         chat_name = context.user_data.get('selected_chat')
         if not chat_name:
             await update.message.reply_text(
-                "❌ **Ошибка: чат не выбран.** Начните поиск заново с главного меню.",
-                parse_mode='Markdown',
-                reply_markup=get_main_menu_keyboard()
+                t.text['chat_not_selected'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu']
             )
             return MAIN_MENU
         
-        group_id = GROUP_IDS.get(chat_name)
-        if not group_id:
+        chat = chat_registry.get(chat_name)
+        if not chat:
             await update.message.reply_text(
-                f"❌ **Ошибка: группа «{chat_name}» не найдена в базе.** Пожалуйста, сообщите об этой ошибке в поддержку.",
+                t.format['chat_not_found'](chat_name=chat_name),
                 parse_mode='Markdown',
-                reply_markup=get_main_menu_keyboard()
+                reply_markup=t.keyboard['main_menu']
             )
             return MAIN_MENU
         
+        group_id = chat.group_id
+        
+        if await over_rate_limit(update):
+            return JOIN_CHAT
+        
         # Получаем инвайт-ссылку
-        invite_link = get_invite_link_simple(group_id, BOT_TOKEN)
+        invite_link = await get_invite_link(group_id, user_id)
         
         if invite_link.startswith("https://t.me/"):
-            # Добавляем пользователя в чат
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            # Добавляем пользователя в чат (ID чата берем из каталога в памяти)
+            if await db.run(database.add_user_chat, user_id, chat.chat_id):
+                # Повторное вступление счетчик не увеличивает
+                member_counter.increment(chat.chat_id)
             
-            # Получаем chat_id из базы
-            cursor.execute('SELECT chat_id FROM chats WHERE chat_name = ?', (chat_name,))
-            result = cursor.fetchone()
-            chat_db_id = result[0] if result else None
-            
-            if chat_db_id:
-                cursor.execute('''
-                INSERT OR IGNORE INTO user_chats (user_id, chat_id) 
-                VALUES (?, ?)
-                ''', (user_id, chat_db_id))
-                
-                # Увеличиваем счетчик участников
-                cursor.execute('''
-                UPDATE chats SET member_count = member_count + 1 
-                WHERE chat_id = ?
-                ''', (chat_db_id,))
-                
-                conn.commit()
-                success = True
-            else:
-                success = False
-            
-            conn.close()
-            
-            if success:
-                success_text = f"""
-🎉 **Отлично! Вы успешно присоединились к группе «{chat_name}»!**
-
-🔗 **Ваша персональная ссылка:** {invite_link}
-
-🌟 **Что дальше:**
-• Нажмите на ссылку, чтобы войти в чат
-• Представьтесь участникам
-• Начните обсуждение или задайте вопрос
-• Найдите единомышленников для проектов
-
-💡 **Совет:** Активное участие поможет вам быстрее найти друзей и партнеров!
-
-🔄 **Хотите найти еще одну группу по другим интересам?** Нажмите "🔍 Найти группу по интересам" в меню!
-"""
-                await update.message.reply_text(success_text, parse_mode='Markdown', reply_markup=get_main_menu_keyboard())
-                return MAIN_MENU
-            else:
-                await update.message.reply_text(
-                    "❌ **Ошибка при добавлении в базу данных.** Попробуйте позже.",
-                    parse_mode='Markdown',
-                    reply_markup=get_main_menu_keyboard()
-                )
-                return MAIN_MENU
+            success_text = t.format['join_success'](chat_name=chat_name, invite_link=invite_link)
+            await update.message.reply_text(success_text, parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
+            return MAIN_MENU
         else:
-            error_text = f"""
-⚠️ **Не удалось получить ссылку для группы «{chat_name}»**
-
-❌ **Причина:** {invite_link}
-
-🔧 **Что проверить:**
-1. ID группы: `{group_id}`
-2. Бот добавлен в группу как администратор
-3. У бота есть права: `invite users`
-
-🔄 **Выберите другую тему для поиска:**
-"""
-            await update.message.reply_text(error_text, parse_mode='Markdown', reply_markup=get_main_menu_keyboard())
+            error_text = t.format['join_error'](chat_name=chat_name, error=invite_link, group_id=group_id)
+            await update.message.reply_text(error_text, parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
             return MAIN_MENU
     
-    if user_decision == "🔄 Другие варианты":
+    if action in ('more_options', 'more_topics'):
         return await show_popular_topics(update, context)
     
     # Если неизвестная команда
-    await update.message.reply_text(
-        "❓ **Неизвестная команда.** Пожалуйста, используйте кнопки для выбора действия.",
-        parse_mode='Markdown',
-        reply_markup=get_main_menu_keyboard()
-    )
+    await update.message.reply_text(t.text['unknown_decision'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
     return MAIN_MENU
 
 async def show_popular_topics(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показ популярных тем с эмодзи"""
-    response_text = "🎯 **Выберите интересующую вас тему из популярных:**"
-    
-    await update.message.reply_text(response_text, reply_markup=get_popular_topics_keyboard(), parse_mode='Markdown')
+    t = texts_for(update)
+    await update.message.reply_text(t.text['popular_topics'], reply_markup=t.keyboard['popular_topics'], parse_mode='Markdown')
     return CHOOSE_TOPIC
 
 async def handle_popular_topic(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработка выбора популярной темы"""
     user_input = update.message.text.strip()
+    t = texts_for(update)
+    action = templates.action(user_input)
     
-    if user_input == "❌ Отказаться":
-        goodbye_text = """
-👋 **До свидания!** 
-
-💡 **Не забывайте:** Вы всегда можете вернуться, нажав /start в любое время.
-
-🌟 **Ждем вас снова!**
-"""
-        await update.message.reply_text(goodbye_text, parse_mode='Markdown', reply_markup=get_main_menu_keyboard())
+    if action == 'refuse':
+        await update.message.reply_text(t.text['goodbye'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
         return MAIN_MENU
     
-    if user_input == "🔙 Назад":
-        await update.message.reply_text(
-            "🏠 **Вы вернулись в главное меню**\n\nВыберите действие:",
-            parse_mode='Markdown',
-            reply_markup=get_main_menu_keyboard()
-        )
+    if action == 'back':
+        await update.message.reply_text(t.text['back_to_menu'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
         return MAIN_MENU
     
-    # Извлекаем название темы из кнопки с эмодзи
-    topic_name = user_input.split(' ', 1)[-1] if ' ' in user_input else user_input
+    # Название темы по кнопке; введенный вручную текст - без эмодзи в начале
+    topic_name = templates.topic(user_input) or (user_input.split(' ', 1)[-1] if ' ' in user_input else user_input)
     
-    if topic_name in GROUP_IDS:
-        chat_name = topic_name
+    chat = chat_registry.get(topic_name)
+    if chat:
         await update.message.reply_text(
-            f"🎯 **Отличный выбор!**\n\n"
-            f"**Тема:** {chat_name}\n"
-            f"**Описание:** {DETAILED_TOPICS[chat_name]['description']}\n\n"
-            f"👥 **Участники уже обсуждают:**\n"
-            f"• {', '.join(DETAILED_TOPICS[chat_name]['keywords'][:3])}\n\n"
-            f"Хотите присоединиться к группе «{chat_name}»?",
+            t.format['topic_chosen'](
+                chat_name=chat.name,
+                description=chat.description,
+                keywords=', '.join(chat.keywords[:3])
+            ),
             parse_mode='Markdown',
-            reply_markup=ReplyKeyboardMarkup([
-                [KeyboardButton("✅ Присоединиться"), KeyboardButton("❌ Отказаться")],
-                [KeyboardButton("🔄 Другие темы"), KeyboardButton("🏠 В меню")]
-            ], resize_keyboard=True)
+            reply_markup=t.keyboard['join_topic']
         )
-        context.user_data['selected_chat'] = chat_name
+        context.user_data['selected_chat'] = chat.name
         return JOIN_CHAT
     else:
         await update.message.reply_text(
-            f"⚠️ **Группа «{topic_name}» временно недоступна.** Выберите другую тему:",
+            t.format['topic_unavailable'](topic_name=topic_name),
             parse_mode='Markdown',
-            reply_markup=get_popular_topics_keyboard()
+            reply_markup=t.keyboard['popular_topics']
         )
         return CHOOSE_TOPIC
 
 async def groups_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Показ групп пользователя"""
     user_id = update.message.from_user.id
+    t = texts_for(update)
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-    SELECT c.chat_name 
-    FROM chats c
-    JOIN user_chats uc ON c.chat_id = uc.chat_id
-    WHERE uc.user_id = ? AND c.is_active = 1
-    ''', (user_id,))
-    user_chats = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    user_chats = await db.run(database.list_user_chat_names, user_id)
     
     if not user_chats:
-        no_groups_text = """
-❌ **Вы пока не состоите ни в одной группе**
-
-🎯 **Как найти свою первую группу:**
-1. Нажмите "🔍 Найти группу по интересам" в главном меню
-2. Напишите, чем вы увлекаетесь
-3. Выберите подходящий чат из предложенных
-"""
-        await update.message.reply_text(no_groups_text, parse_mode='Markdown', reply_markup=get_main_menu_keyboard())
+        await update.message.reply_text(t.text['no_groups'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
         return MAIN_MENU
     
-    groups_text = """
-📋 **Ваши группы**
-
-🌟 **Вы состоите в следующих чатах:**
-"""
-    
-    for i, chat_name in enumerate(user_chats, 1):
-        groups_text += f"{i}. {chat_name}\n"
-    
-    groups_text += f"\n💬 **Всего групп:** {len(user_chats)}"
-    
-    await update.message.reply_text(groups_text, parse_mode='Markdown', reply_markup=get_main_menu_keyboard())
+    groups_text = t.format['groups'](
+        items="".join(f"{i}. {chat_name}\n" for i, chat_name in enumerate(user_chats, 1)),
+        count=len(user_chats)
+    )
+    await update.message.reply_text(groups_text, parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
     return MAIN_MENU
 
 async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Показ профиля пользователя"""
     user = update.message.from_user
     user_id = user.id
+    t = texts_for(update)
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Получаем данные пользователя
-    cursor.execute('''
-    SELECT username, first_name, language, last_active, 
-           (SELECT COUNT(*) FROM user_chats WHERE user_id = ?) as group_count
-    FROM users 
-    WHERE user_id = ?
-    ''', (user_id, user_id))
-    
-    user_data = cursor.fetchone()
-    conn.close()
+    # Получаем данные пользователя (сначала дописываем его отложенную активность)
+    if user_buffer.is_pending(user_id):
+        await user_buffer.flush()
+    user_data = await db.run(database.get_user_profile, user_id)
     
     if user_data:
         username, first_name, language, last_active, group_count = user_data
-        last_active_formatted = datetime.strptime(last_active, '%Y-%m-%d %H:%M:%S').strftime('%d.%m.%Y %H:%M')
-        
-        profile_text = f"""
-👤 **Ваш профиль**
-
-📝 **Информация:**
-• ID: `{user_id}`
-• Имя: {first_name}
-• Username: @{username if username else 'не указан'}
-• Язык: {language}
-• Активность: {last_active_formatted}
-
-👥 **Статистика:**
-• Групп: {group_count}
-
-⚙️ **Настройки:**
-В разработке...
-"""
+        profile_text = t.format['profile'](
+            user_id=user_id,
+            first_name=first_name,
+            username=username if username else t.text['username_missing'],
+            language=language,
+            last_active=datetime.strptime(last_active, '%Y-%m-%d %H:%M:%S').strftime('%d.%m.%Y %H:%M'),
+            group_count=group_count
+        )
     else:
-        profile_text = """
-👤 **Профиль не найден**
-
-Пожалуйста, начните с команды /start
-"""
+        profile_text = t.text['profile_not_found']
     
-    await update.message.reply_text(profile_text, parse_mode='Markdown', reply_markup=get_main_menu_keyboard())
+    await update.message.reply_text(profile_text, parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
     return MAIN_MENU
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Показ справки"""
-    help_text = """
-📖 **Справка по боту**
-
-🎯 **Как это работает:**
-1. Вы указываете тему, которая вас интересует
-2. Бот **умно ищет** подходящие чаты по ключевым словам
-3. Если находит - предлагает присоединиться
-4. Если нет - уточняет тему или предлагает похожие варианты
-5. Популярные темы всегда доступны в меню
-
-🧠 **Умный поиск:**
-• Бот понимает **синонимы** (деньги → экономика)
-• Анализирует **контекст** (заработок → бизнес)
-• Ищет **похожие темы** при неточных совпадениях
-• Предлагает **релевантные варианты** даже если точного совпадения нет
-
-💡 **Важно:**
-• Бот добавляет вас только в тематические чаты
-• Ссылки для приглашения одноразовые
-• Вы всегда можете отказаться от присоединения
-
-🆘 **Поддержка:**
-Напишите /support для обращения к администратору
-"""
-    await update.message.reply_text(help_text, parse_mode='Markdown', reply_markup=get_main_menu_keyboard())
+    t = texts_for(update)
+    await update.message.reply_text(t.text['help'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
     return MAIN_MENU
 
 async def support_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработка команды поддержки"""
-    support_text = """
-🆘 **Поддержка**
-
-Напишите ваш вопрос или проблему, и я передам сообщение администратору.
-
-⚠️ **Важно:** Это не техническая поддержка Telegram, а поддержка именно этого бота.
-
-✏️ **Введите ваше сообщение ниже:**
-"""
-    await update.message.reply_text(support_text, parse_mode='Markdown', reply_markup=ReplyKeyboardMarkup([
-        [KeyboardButton("🏠 В меню"), KeyboardButton("❌ Отмена")]
-    ], resize_keyboard=True))
+    t = texts_for(update)
+    await update.message.reply_text(t.text['support'], parse_mode='Markdown', reply_markup=t.keyboard['support'])
     return SUPPORT
 
 async def handle_support_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -959,21 +966,15 @@ async def handle_support_message(update: Update, context: ContextTypes.DEFAULT_T
     user_id = update.message.from_user.id
     username = update.message.from_user.username
     first_name = update.message.from_user.first_name
+    t = texts_for(update)
+    action = templates.action(user_message)
     
-    if user_message == "🏠 В меню":
-        await update.message.reply_text(
-            "🏠 **Вы вернулись в главное меню**\n\nВыберите действие:",
-            parse_mode='Markdown',
-            reply_markup=get_main_menu_keyboard()
-        )
+    if action == 'menu':
+        await update.message.reply_text(t.text['back_to_menu'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
         return MAIN_MENU
     
-    elif user_message == "❌ Отмена":
-        await update.message.reply_text(
-            "❌ **Отправка в поддержку отменена.**\n\nВыберите действие:",
-            parse_mode='Markdown',
-            reply_markup=get_main_menu_keyboard()
-        )
+    elif action == 'cancel':
+        await update.message.reply_text(t.text['support_cancelled'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
         return MAIN_MENU
     
     else:
@@ -999,105 +1000,437 @@ Username: @{username if username else 'не указан'}
                 parse_mode='Markdown'
             )
             
-            await update.message.reply_text(
-                "✅ **Ваше сообщение отправлено администратору!**\n\n"
-                "Мы ответим вам в ближайшее время.\n\n"
-                "Спасибо за обращение!",
-                parse_mode='Markdown',
-                reply_markup=get_main_menu_keyboard()
-            )
+            await update.message.reply_text(t.text['support_sent'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
             return MAIN_MENU
-            
+        
         except Exception as e:
             logger.error(f"❌ Ошибка отправки сообщения админу: {e}")
-            await update.message.reply_text(
-                "❌ **Не удалось отправить сообщение.**\n\n"
-                "Попробуйте позже или свяжитесь с админом напрямую.",
-                parse_mode='Markdown',
-                reply_markup=get_main_menu_keyboard()
-            )
+            await update.message.reply_text(t.text['support_failed'], parse_mode='Markdown', reply_markup=t.keyboard['main_menu'])
             return MAIN_MENU
 
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Статистика нагрузки для администратора"""
+    if update.message.from_user.id != ADMIN_ID:
+        return
+    
+    sections = {
+        "📊 Пул поиска": match_executor.stats(),
+        "📦 Пачки поиска": match_batcher.stats(),
+        "🗃️ Кэш поиска": match_cache.stats(),
+        "🔗 Инвайт-ссылки": invite_service.stats(),
+        "📦 Пул ссылок": invite_pool.stats(),
+        "👥 Запись активности": user_buffer.stats(),
+        "🔢 Счетчики участников": member_counter.stats(),
+        "💾 Состояния диалогов": persistence.stats(),
+        "🔤 Нормализация": text_normalizer.stats() if text_normalizer else {'status': 'загружается'},
+        "🗣️ Определение языка": language_detector.stats(),
+    }
+    sections["🚦 Фильтр обновлений"] = update_filter.stats()
+    sections["🧵 Обработка обновлений"] = update_processor.stats()
+    sections["🚧 Ограничение частоты"] = rate_limiter.stats()
+    sections["📝 Логи поиска"] = {'sampled_out': match_log_sampler.dropped}
+    if webhook_server is not None:
+        sections["🌐 Вебхук"] = webhook_server.stats()
+    if shard_listener is not None:
+        sections[f"🧩 Воркер {SHARD_INDEX + 1}/{SHARDS}"] = shard_listener.stats()
+    stats_text = "\n\n".join(
+        title + "\n" + "\n".join(f"{key}: {value}" for key, value in values.items())
+        for title, values in sections.items()
+    )
+    await update.message.reply_text(stats_text)
+
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Задержки стадий поиска, обработчиков, базы и Bot API (для администратора).
+    
+    /metrics - сводка с квантилями, /metrics prom - файл в формате Prometheus
+    """
+    if update.message.from_user.id != ADMIN_ID:
+        return
+    
+    if context.args and context.args[0] == 'prom':
+        await update.message.reply_document(
+            METRICS.render_prometheus().encode('utf-8'),
+            filename='metrics.txt'
+        )
+        return
+    
+    summary = METRICS.summary()
+    if not summary:
+        await update.message.reply_text("📈 Метрик пока нет" if METRICS.enabled else "📈 Метрики отключены (METRICS_ENABLED)")
+        return
+    text = "\n".join(f"{key}: {value}" for key, value in summary.items())
+    # Ограничение Telegram - 4096 символов на сообщение
+    for start in range(0, len(text), 4000):
+        await update.message.reply_text(text[start:start + 4000])
+
+async def reload_topics_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Перечитывание каталога чатов после правок в базе (для администратора)"""
+    if update.message.from_user.id != ADMIN_ID:
+        return
+    
+    if not nlp_ready.is_set():
+        await update.message.reply_text("⏳ NLP модели еще загружаются, повторите позже")
+        return
+    
+    await chat_registry.reload()
+    await asyncio.to_thread(preload_nlp_models)
+    if match_executor.kind == 'process':
+        # Процессы получили модель при fork - пересоздаем пул
+        match_executor.shutdown()
+        match_executor.start()
+    warmed = await asyncio.to_thread(warm_match_cache)
+    
+    await update.message.reply_text(
+        f"✅ Каталог перезагружен: {len(chat_registry)} тем (версия {chat_registry.version}), "
+        f"в кэше поиска пересчитано запросов: {warmed}"
+    )
+
+async def reconcile_counts_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Пересчет счетчиков участников из user_chats (для администратора).
+    
+    В режиме sharded отбрасываются только приращения воркера, принявшего
+    команду. Несохраненные приращения остальных воркеров запишутся поверх
+    пересчитанных значений, и расхождение останется до следующего пересчета.
+    """
+    if update.message.from_user.id != ADMIN_ID:
+        return
+    
+    # Несохраненные приращения уже отражены в user_chats
+    member_counter.discard()
+    fixed = await db.run(database.reconcile_member_counts)
+    await update.message.reply_text(f"✅ Счетчики участников пересчитаны, исправлено чатов: {fixed}")
+
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработка ошибок"""
     logger.error(f"Ошибка при обработке обновления {update}: {context.error}")
     
     try:
         if update and update.message:
-            await update.message.reply_text(
-                "❌ **Произошла ошибка при обработке вашего запроса.**\n\n"
-                "Попробуйте еще раз или используйте команду /start",
-                parse_mode='Markdown'
-            )
+            await update.message.reply_text(texts_for(update).text['error'], parse_mode='Markdown')
     except:
         pass
 
 def cleanup():
     """Очистка при завершении работы"""
     logger.info("🧹 Очистка ресурсов...")
-    # Закрываем соединения с базой данных и т.д.
+    logger.info(f"📊 Пул поиска: {match_executor.stats()}")
+    logger.info(f"📦 Пачки поиска: {match_batcher.stats()}")
+    logger.info(f"🗃️ Кэш поиска: {match_cache.stats()}")
+    match_executor.shutdown()
+    # Дописываем активность, накопленную после остановки приложения
+    user_buffer.flush_sync()
+    member_counter.flush_sync()
+    match_cache.writer.flush_sync()
+    db.close()
+
+async def on_startup(application: Application) -> None:
+    """Запуск фоновых задач после инициализации приложения"""
+    await asyncio.to_thread(invite_pool.load)
+    invite_pool.start()
+    user_buffer.start()
+    member_counter.start()
+    match_cache.writer.start()
+
+async def on_stop(application: Application) -> None:
+    """Остановка фоновых задач"""
+    await invite_pool.stop()
+    await user_buffer.stop()
+    await member_counter.stop()
+    await match_cache.writer.stop()
+
+def timed(callback):
+    """Обработчик с замером времени в bot_handler_seconds"""
+    return METRICS.timed('bot_handler_seconds', callback.__name__, callback)
+
+def build_application(token, update_queue=None, request=None):
+    """Сборка приложения: HTTP-клиент, сервисы ссылок и обработчики.
+    
+    request - свой HTTP-клиент Bot API (нагрузочный тест подставляет фейковый)
+    """
+    global invite_service, invite_pool
+    
+    builder = (
+        Application.builder()
+        .token(token)
+        # Время каждого запроса к Bot API (пул соединений - как по умолчанию в PTB)
+        .request(TimedRequest(request or HTTPXRequest(connection_pool_size=256), METRICS))
+        .persistence(persistence)
+        .concurrent_updates(update_processor)
+        .post_init(on_startup)
+        .post_stop(on_stop)
+    )
+    if update_queue is not None:
+        builder = builder.update_queue(update_queue)
+    application = builder.build()
+    persistence.bind(application)
+    
+    # Ссылки запрашиваем через пул соединений самого бота
+    invite_service = InviteLinkService(
+        application.bot,
+        attempts=INVITE_ATTEMPTS,
+        backoff_base=INVITE_BACKOFF_BASE,
+        backoff_max=INVITE_BACKOFF_MAX,
+        timeout=INVITE_TIMEOUT
+    )
+    invite_pool = InvitePool(
+        invite_service,
+        db,
+        chat_registry.group_ids(),
+        low_water=INVITE_POOL_LOW_WATER,
+        target=INVITE_POOL_TARGET,
+        refill_batch=INVITE_POOL_REFILL_BATCH,
+        refill_interval=INVITE_POOL_REFILL_INTERVAL,
+        link_ttl=INVITE_LINK_TTL,
+        shard=SHARD_INDEX if IS_WORKER else 0
+    )
+    chat_registry.subscribe(lambda registry: invite_pool.update_groups(registry.group_ids()))
+    
+    # Добавляем обработчик ошибок
+    application.add_error_handler(error_handler)
+    
+    # Фильтр в группе -1 срабатывает раньше ConversationHandler
+    application.add_handler(update_filter.handler(), group=-1)
+    
+    # Добавляем обработчики
+    conv_handler = ConversationHandler(
+        entry_points=[CommandHandler('start', timed(start_command), filters=NEW_MESSAGE)],
+        states={
+            MAIN_MENU: [MessageHandler(TEXT_INPUT, timed(handle_main_menu))],
+            ASK_TOPIC: [MessageHandler(TEXT_INPUT, timed(handle_ask_topic))],
+            CHOOSE_TOPIC: [MessageHandler(TEXT_INPUT, timed(handle_popular_topic))],
+            JOIN_CHAT: [MessageHandler(TEXT_INPUT, timed(handle_join_decision))],
+            SUPPORT: [MessageHandler(TEXT_INPUT, timed(handle_support_message))],
+        },
+        fallbacks=[
+            CommandHandler('start', timed(start_command), filters=NEW_MESSAGE),
+            CommandHandler('help', timed(help_command), filters=NEW_MESSAGE),
+            CommandHandler('profile', timed(profile_command), filters=NEW_MESSAGE),
+            CommandHandler('support', timed(support_command), filters=NEW_MESSAGE),
+            CommandHandler('groups', timed(groups_command), filters=NEW_MESSAGE),
+            CommandHandler('stats', timed(stats_command), filters=NEW_MESSAGE),
+            CommandHandler('reload_topics', timed(reload_topics_command), filters=NEW_MESSAGE),
+            CommandHandler('reconcile_counts', timed(reconcile_counts_command), filters=NEW_MESSAGE),
+            CommandHandler('metrics', timed(metrics_command), filters=NEW_MESSAGE),
+            MessageHandler(NEW_MESSAGE & filters.TEXT, timed(handle_main_menu))
+        ],
+        allow_reentry=True,
+        name='main',
+        persistent=True
+    )
+    
+    application.add_handler(conv_handler)
+    application.add_handler(CommandHandler('help', timed(help_command), filters=NEW_MESSAGE))
+    application.add_handler(CommandHandler('groups', timed(groups_command), filters=NEW_MESSAGE))
+    application.add_handler(CommandHandler('support', timed(support_command), filters=NEW_MESSAGE))
+    application.add_handler(CommandHandler('profile', timed(profile_command), filters=NEW_MESSAGE))
+    application.add_handler(CommandHandler('stats', timed(stats_command), filters=NEW_MESSAGE))
+    application.add_handler(CommandHandler('reload_topics', timed(reload_topics_command), filters=NEW_MESSAGE))
+    application.add_handler(CommandHandler('reconcile_counts', timed(reconcile_counts_command), filters=NEW_MESSAGE))
+    application.add_handler(CommandHandler('metrics', timed(metrics_command), filters=NEW_MESSAGE))
+    
+    return application
+
+def stop_signal_event():
+    """Событие, которое выставляется по SIGINT/SIGTERM"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    return stop_event
+
+async def serve(application, server, after_start=None):
+    """Работа приложения со своим источником обновлений вместо long polling"""
+    stop_event = stop_signal_event()
+    
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        await server.start()
+        if after_start is not None:
+            await after_start()
+        
+        try:
+            await stop_event.wait()
+        finally:
+            logger.info(f"📥 Прием обновлений: {server.stats()}")
+            await server.stop()
+            await application.stop()
+            await application.post_stop(application)
+
+async def register_webhook(bot, allowed_updates):
+    """Регистрация адреса вебхука в Telegram (если задан WEBHOOK_URL)"""
+    if not WEBHOOK_URL:
+        return
+    # Несколько процессов регистрируют один и тот же адрес - это идемпотентно
+    await bot.set_webhook(
+        url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=allowed_updates,
+        max_connections=WEBHOOK_MAX_CONNECTIONS
+    )
+    logger.info(f"✅ Вебхук зарегистрирован: {WEBHOOK_URL}")
+
+async def run_webhook(application):
+    """Работа через вебхук: свой HTTP-сервер вместо long polling"""
+    global webhook_server
+    
+    webhook_server = WebhookServer(
+        application,
+        path=WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        host=WEBHOOK_HOST,
+        port=WEBHOOK_PORT,
+        metrics=METRICS,
+        metrics_token=METRICS_TOKEN
+    )
+    await serve(
+        application,
+        webhook_server,
+        lambda: register_webhook(application.bot, derive_allowed_updates(application))
+    )
+
+async def run_worker(application):
+    """Воркер: обновления своих пользователей приходят от маршрутизатора"""
+    global shard_listener
+    
+    shard_listener = ShardListener(
+        application,
+        shard_socket_path(SHARD_SOCKET_DIR, SHARD_INDEX),
+        max_backlog=WEBHOOK_QUEUE_SIZE
+    )
+    await serve(application, shard_listener)
+
+def spawn_worker(index):
+    """Запуск процесса-воркера с номером index"""
+    env = dict(os.environ, BOT_MODE='worker', SHARD_INDEX=str(index), SHARDS=str(SHARDS))
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+
+async def run_sharded(allowed_updates):
+    """Маршрутизатор: принимает вебхук и делит обновления между SHARDS воркерами.
+    
+    Маршрутизатор не загружает NLP и не обрабатывает обновления - только
+    HTTP и Unix-сокеты; базу он открывает лишь для миграций и начальных
+    данных в main() до запуска воркеров. Упавший воркер перезапускается;
+    пока его нет, обновления его пользователей ждут в очереди
+    маршрутизатора, а когда она заполнена, вебхук отвечает 503 и они ждут
+    у Telegram.
+    
+    Telegram получает 200, как только обновление встало в очередь в
+    памяти, поэтому доставка не гарантирована: при падении маршрутизатора
+    теряются обновления из его очередей, при падении воркера - уже
+    отправленные ему, но еще не обработанные.
+    """
+    global webhook_server
+    
+    router = ShardRouter(
+        [shard_socket_path(SHARD_SOCKET_DIR, index) for index in range(SHARDS)],
+        queue_size=SHARD_QUEUE_SIZE
+    )
+    server = webhook_server = ShardedWebhookServer(
+        router,
+        path=WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        host=WEBHOOK_HOST,
+        port=WEBHOOK_PORT
+    )
+    stop_event = stop_signal_event()
+    workers = [spawn_worker(index) for index in range(SHARDS)]
+    logger.info(f"🧩 Запущено воркеров: {SHARDS}")
+    
+    router.start()
+    await server.start()
+    if BOT_TOKEN and WEBHOOK_URL:
+        async with Bot(BOT_TOKEN) as bot:
+            await register_webhook(bot, allowed_updates)
+    
+    try:
+        while not stop_event.is_set():
+            for index, worker in enumerate(workers):
+                if worker.poll() is not None:
+                    logger.error(f"❌ Воркер {index} завершился с кодом {worker.returncode}, перезапуск")
+                    workers[index] = spawn_worker(index)
+            try:
+                await asyncio.wait_for(stop_event.wait(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        logger.info(f"🌐 Вебхук: {server.stats()}")
+        logger.info(f"🧩 Маршрутизация: {router.stats()}")
+        await server.stop()
+        await router.stop()
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            try:
+                await asyncio.to_thread(worker.wait, 30)
+            except subprocess.TimeoutExpired:
+                worker.kill()
 
 def main():
     """Основная функция запуска бота"""
+    # Замер фаз запуска без подключения к Telegram
+    profile_startup = '--profile-startup' in sys.argv
+    
     logger.info("🚀 Запуск Telegram бота с интеллектуальным поиском...")
     
     # Регистрируем очистку при завершении
     atexit.register(cleanup)
     
     # Проверяем наличие токена
-    if not BOT_TOKEN:
+    if not BOT_TOKEN and not profile_startup:
         logger.critical("❌ BOT_TOKEN не найден!")
         logger.critical("Добавьте BOT_TOKEN в переменные окружения Railway")
         sys.exit(1)
     
-    # Инициализация базы данных
+    # Без секрета вебхук принял бы поддельные обновления, в том числе от имени ADMIN_ID
+    if BOT_MODE in ('webhook', 'sharded') and not WEBHOOK_SECRET and not profile_startup:
+        logger.critical("❌ WEBHOOK_SECRET не задан - режим вебхука без него не запускается")
+        sys.exit(1)
+    
+    # Инициализация базы данных. В режиме sharded миграции применяет
+    # маршрутизатор до запуска воркеров, чтобы они не применяли их наперегонки
     init_database()
+    startup.lap("база данных и каталог")
+    
+    if BOT_MODE == 'sharded' and not profile_startup:
+        # Приложение собирается только ради списка типов обновлений
+        allowed_updates = derive_allowed_updates(build_application(BOT_TOKEN))
+        asyncio.run(run_sharded(allowed_updates))
+        return
     
-    # Загрузка NLP моделей
-    preload_nlp_models()
+    if profile_startup or match_executor.kind == 'process':
+        # Процессы пула должны унаследовать модели, поэтому прогрев - до запуска
+        warm_nlp(startup if profile_startup else None)
+    else:
+        # Бот принимает обновления сразу, поиск дождется прогрева
+        threading.Thread(target=warm_nlp, name='nlp-warmup', daemon=True).start()
     
     try:
-        # Создаем приложение
-        application = Application.builder().token(BOT_TOKEN).build()
+        # Создаем приложение (токен не проверяется до первого запроса к API).
+        # В режиме вебхука очередь ограничена: при переполнении Telegram повторит доставку
+        update_queue = asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE) if BOT_MODE in ('webhook', 'worker') else None
+        application = build_application(BOT_TOKEN or '0:profile-startup', update_queue)
+        startup.lap("сборка приложения")
         
-        # Добавляем обработчик ошибок
-        application.add_error_handler(error_handler)
-        
-        # Добавляем обработчики
-        conv_handler = ConversationHandler(
-            entry_points=[CommandHandler('start', start_command)],
-            states={
-                MAIN_MENU: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_main_menu)],
-                ASK_TOPIC: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_ask_topic)],
-                CHOOSE_TOPIC: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_popular_topic)],
-                JOIN_CHAT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_join_decision)],
-                SUPPORT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_support_message)],
-            },
-            fallbacks=[
-                CommandHandler('start', start_command),
-                CommandHandler('help', help_command),
-                CommandHandler('profile', profile_command),
-                CommandHandler('support', support_command),
-                CommandHandler('groups', groups_command),
-                MessageHandler(filters.TEXT, handle_main_menu)
-            ],
-            allow_reentry=True
-        )
-        
-        application.add_handler(conv_handler)
-        application.add_handler(CommandHandler('help', help_command))
-        application.add_handler(CommandHandler('groups', groups_command))
-        application.add_handler(CommandHandler('support', support_command))
-        application.add_handler(CommandHandler('profile', profile_command))
+        if profile_startup:
+            print(startup.report())
+            return
         
+        logger.info(f"📬 Типы обновлений: {derive_allowed_updates(application)}")
         logger.info("✅ Бот успешно инициализирован")
-        logger.info("⚡ Бот запущен и готов к приему сообщений!")
+        logger.info(f"⚡ Бот запущен и готов к приему сообщений через {startup.elapsed():.2f} сек после старта")
         
-        # Запускаем в режиме polling
-        application.run_polling(
-            drop_pending_updates=True,
-            allowed_updates=Update.ALL_TYPES
-        )
+        if BOT_MODE == 'webhook':
+            # Обновления, накопленные за время рестарта, Telegram доставит сам
+            asyncio.run(run_webhook(application))
+        elif IS_WORKER:
+            asyncio.run(run_worker(application))
+        else:
+            # Запускаем в режиме polling
+            application.run_polling(
+                drop_pending_updates=True,
+                allowed_updates=derive_allowed_updates(application)
+            )
         
     except Exception as e:
         logger.critical(f"🔥 КРИТИЧЕСКАЯ ОШИБКА: {e}")
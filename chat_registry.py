@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import database
+
+logger = logging.getLogger(__name__)
+
+
+class ChatInfo(NamedTuple):
+    """Тематический чат из таблицы chats"""
+    chat_id: int
+    name: str
+    group_id: str
+    keywords: Tuple[str, ...]
+    description: str
+    emoji: str
+
+
+class ChatRegistry:
+    """Кэш каталога чатов в памяти процесса.
+
+    Каталог читается из базы один раз при запуске и перечитывается только
+    по команде администратора. Подписчики (модель поиска, пул ссылок)
+    получают уведомление после каждой перезагрузки.
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._by_name: Dict[str, ChatInfo] = {}
+        self._listeners: List[Callable[['ChatRegistry'], None]] = []
+        self.version = 0
+        # Хэш содержимого каталога: одинаков у всех воркеров и между перезапусками
+        self.fingerprint = ''
+
+    def _apply(self, rows) -> None:
+        chats = {}
+        for chat_id, name, group_id, keywords, description, emoji in rows:
+            chats[name] = ChatInfo(
+                chat_id=chat_id,
+                name=name,
+                group_id=group_id,
+                keywords=tuple(json.loads(keywords or '[]')),
+                description=description or '',
+                emoji=emoji or ''
+            )
+        # Замена словаря целиком: читатели видят либо старый, либо новый каталог
+        self._by_name = chats
+        self.fingerprint = self._fingerprint(chats)
+        self.version += 1
+        logger.info(f"📚 Каталог чатов загружен: {len(chats)} тем (версия {self.version})")
+
+        for listener in self._listeners:
+            listener(self)
+
+    @staticmethod
+    def _fingerprint(chats: Dict[str, ChatInfo]) -> str:
+        """Хэш того, что влияет на поиск: названия, ключевые слова, описания"""
+        payload = json.dumps(
+            sorted((chat.name, list(chat.keywords), chat.description) for chat in chats.values()),
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def load(self) -> None:
+        """Синхронная загрузка при запуске"""
+        self._apply(self._db.call(database.load_chats))
+
+    async def reload(self) -> None:
+        """Перезагрузка после правок каталога администратором"""
+        self._apply(await self._db.run(database.load_chats))
+
+    def subscribe(self, listener: Callable[['ChatRegistry'], None]) -> None:
+        """Подписка на перезагрузку каталога"""
+        self._listeners.append(listener)
+
+    def get(self, name: str) -> Optional[ChatInfo]:
+        return self._by_name.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def names(self) -> List[str]:
+        return list(self._by_name)
+
+    def chats(self) -> List[ChatInfo]:
+        return list(self._by_name.values())
+
+    def group_ids(self) -> List[str]:
+        return [chat.group_id for chat in self._by_name.values()]
@@ -13,3 +13,103 @@ ADMIN_ID = int(os.getenv('ADMIN_ID', '6830411048'))
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///bot_database.db')
 NLTK_DATA_DIR = os.getenv('NLTK_DATA_DIR', './nltk_data')
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# Уровни отдельных логгеров: 'httpx=WARNING,bot.match=DEBUG'
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+# 'text' или 'json' (одна JSON-строка на запись)
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+# Ротация файла лога по размеру
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '3'))
+# Логи поиска по запросам: до N записей в секунду, сверх - каждая LOG_SAMPLE_EVERY-я
+LOG_SAMPLE_PER_SECOND = int(os.getenv('LOG_SAMPLE_PER_SECOND', '20'))
+LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', '100'))
+
+# Пул поиска чатов: 'thread' или 'process'
+MATCH_EXECUTOR = os.getenv('MATCH_EXECUTOR', 'thread')
+MATCH_WORKERS = int(os.getenv('MATCH_WORKERS', '2'))
+MATCH_QUEUE_SIZE = int(os.getenv('MATCH_QUEUE_SIZE', '32'))
+MATCH_DEADLINE = float(os.getenv('MATCH_DEADLINE', '10'))
+# Микропакеты: запросы, пришедшие за MATCH_BATCH_WAIT сек, ищутся одной задачей
+MATCH_BATCH_SIZE = int(os.getenv('MATCH_BATCH_SIZE', '16'))
+MATCH_BATCH_WAIT = float(os.getenv('MATCH_BATCH_WAIT', '0.005'))
+
+# Получение инвайт-ссылок
+INVITE_TIMEOUT = float(os.getenv('INVITE_TIMEOUT', '8'))
+INVITE_ATTEMPTS = int(os.getenv('INVITE_ATTEMPTS', '3'))
+INVITE_BACKOFF_BASE = float(os.getenv('INVITE_BACKOFF_BASE', '0.5'))
+INVITE_BACKOFF_MAX = float(os.getenv('INVITE_BACKOFF_MAX', '4'))
+
+# Пул заранее созданных инвайт-ссылок
+INVITE_POOL_LOW_WATER = int(os.getenv('INVITE_POOL_LOW_WATER', '3'))
+INVITE_POOL_TARGET = int(os.getenv('INVITE_POOL_TARGET', '6'))
+INVITE_POOL_REFILL_BATCH = int(os.getenv('INVITE_POOL_REFILL_BATCH', '2'))
+INVITE_POOL_REFILL_INTERVAL = float(os.getenv('INVITE_POOL_REFILL_INTERVAL', '30'))
+INVITE_LINK_TTL = int(os.getenv('INVITE_LINK_TTL', '86400'))
+
+# Настройки SQLite
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))
+
+# Отложенная запись активности пользователей
+USER_FLUSH_INTERVAL = float(os.getenv('USER_FLUSH_INTERVAL', '2'))
+USER_FLUSH_MAX_PENDING = int(os.getenv('USER_FLUSH_MAX_PENDING', '500'))
+
+# Период сброса счетчиков участников в таблицу chats
+MEMBER_COUNT_FLUSH_INTERVAL = float(os.getenv('MEMBER_COUNT_FLUSH_INTERVAL', '10'))
+
+# Кэши нормализации запросов
+NORMALIZE_CACHE_SIZE = int(os.getenv('NORMALIZE_CACHE_SIZE', '4096'))
+STEM_CACHE_SIZE = int(os.getenv('STEM_CACHE_SIZE', '16384'))
+
+# Кэш результатов поиска: LRU в памяти и общая таблица SQLite
+MATCH_CACHE_ENABLED = os.getenv('MATCH_CACHE_ENABLED', 'true').lower() == 'true'
+MATCH_CACHE_SIZE = int(os.getenv('MATCH_CACHE_SIZE', '4096'))
+MATCH_CACHE_MAX_ROWS = int(os.getenv('MATCH_CACHE_MAX_ROWS', '50000'))
+MATCH_CACHE_FLUSH_INTERVAL = float(os.getenv('MATCH_CACHE_FLUSH_INTERVAL', '2'))
+# Сколько частых запросов пересчитывать после смены каталога тем
+MATCH_CACHE_WARM_LIMIT = int(os.getenv('MATCH_CACHE_WARM_LIMIT', '500'))
+
+# Кэш обученной TF-IDF модели (ключ - хэш определения тем)
+MODEL_CACHE_DIR = os.getenv('MODEL_CACHE_DIR', './data/models')
+
+# Состояния диалогов и user_data в SQLite: запись раз в интервал, выгрузка молчащих
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv('PERSISTENCE_FLUSH_INTERVAL', '5'))
+USER_STATE_IDLE_TTL = float(os.getenv('USER_STATE_IDLE_TTL', '1800'))
+USER_STATE_MAX_USERS = int(os.getenv('USER_STATE_MAX_USERS', '10000'))
+
+# Режим работы: 'polling', 'webhook' или 'sharded' (маршрутизатор + SHARDS воркеров;
+# 'worker' - режим процесса-воркера, запускается маршрутизатором)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+# Публичный адрес сервиса; если пуст, вебхук в Telegram не регистрируется
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+# Обязателен в режимах webhook и sharded: без него бот не запустится
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8080')))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+# Параллельная обработка обновлений; порядок внутри одного пользователя сохраняется
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '32'))
+USER_LOCK_STRIPES = int(os.getenv('USER_LOCK_STRIPES', '1024'))
+
+# Несколько воркеров: обновления делятся по user_id, база SQLite общая (WAL)
+SHARDS = int(os.getenv('SHARDS', '2'))
+SHARD_INDEX = int(os.getenv('SHARD_INDEX', '0'))
+SHARD_SOCKET_DIR = os.getenv('SHARD_SOCKET_DIR', './data/shards')
+SHARD_QUEUE_SIZE = int(os.getenv('SHARD_QUEUE_SIZE', '1000'))
+
+# Ограничение частоты дорогих действий (поиск темы, выдача ссылки):
+# token bucket на пользователя и общий на процесс
+RATE_LIMIT_RATE = float(os.getenv('RATE_LIMIT_RATE', '0.5'))
+RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', '5'))
+GLOBAL_RATE_LIMIT = float(os.getenv('GLOBAL_RATE_LIMIT', '50'))
+GLOBAL_RATE_BURST = int(os.getenv('GLOBAL_RATE_BURST', '100'))
+RATE_LIMIT_IDLE_TTL = float(os.getenv('RATE_LIMIT_IDLE_TTL', '600'))
+RATE_LIMIT_NOTICE_INTERVAL = float(os.getenv('RATE_LIMIT_NOTICE_INTERVAL', '10'))
+
+# Гистограммы задержек и счетчики (/metrics, GET /metrics в режиме вебхука)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+# Токен для GET /metrics на порту вебхука (Authorization: Bearer ...); пусто - не отдавать
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
@@ -0,0 +1,498 @@
+import asyncio
+import json
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+
+class Database:
+    """Долгоживущее соединение SQLite, обслуживаемое отдельным потоком.
+
+    Все запросы выполняются последовательно в одном потоке, поэтому
+    соединение не нужно защищать блокировками, а event loop не ждет
+    диск. Запросы - константные строки, и sqlite3 переиспользует их
+    скомпилированные выражения из кэша соединения.
+    """
+
+    def __init__(self, path: str, synchronous: str = 'NORMAL', cache_size_kb: int = 16384,
+                 cached_statements: int = 256):
+        self.path = path
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.cached_statements = cached_statements
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        # Отрицательное значение - размер кэша в килобайтах
+        conn.execute(f'PRAGMA cache_size=-{self.cache_size_kb}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA busy_timeout=5000')
+        logger.info(f"✅ Соединение с базой открыто: {self.path} (WAL, synchronous={self.synchronous})")
+        return conn
+
+    def _invoke(self, fn: Callable[..., Any], args: tuple) -> Any:
+        """Выполнение функции репозитория в потоке базы в одной транзакции"""
+        if self._conn is None:
+            self._conn = self._connect()
+        try:
+            with METRICS.timer('bot_db_query_seconds', getattr(fn, '__qualname__', 'query')):
+                result = fn(self._conn, *args)
+                self._conn.commit()
+            return result
+        except Exception:
+            self._conn.rollback()
+            raise
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Асинхронный вызов функции репозитория из обработчика"""
+        return await asyncio.wrap_future(self._executor.submit(self._invoke, fn, args))
+
+    def _call_sync(self, fn: Callable[..., Any], *args: Any) -> Any:
+        try:
+            future = self._executor.submit(fn, *args)
+        except RuntimeError:
+            # В обработчиках atexit пулы потоков уже не принимают задачи;
+            # поток базы к этому моменту простаивает - выполняем здесь
+            return fn(*args)
+        return future.result()
+
+    def call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Синхронный вызов (инициализация и завершение работы)"""
+        return self._call_sync(self._invoke, fn, args)
+
+    def close(self) -> None:
+        """Закрытие соединения и потока базы"""
+        def _close(conn):
+            self._conn = None
+            conn.close()
+
+        if self._conn is not None:
+            self._call_sync(_close, self._conn)
+        self._executor.shutdown(wait=True)
+
+
+class WriteBehindBuffer:
+    """Основа отложенной записи: сброс пачкой по размеру буфера или по таймеру.
+
+    Наследник хранит накопленные данные в self._pending (dict), а в
+    _rows() превращает их в аргументы для функции репозитория
+    self.write_fn. Если запись не удалась (например, база занята другим
+    воркером), данные возвращаются в буфер через _merge() и уйдут со
+    следующим сбросом. При падении процесса теряется не больше
+    flush_interval секунд данных.
+    """
+
+    write_fn: Callable[..., Any]
+    name = 'буфер'
+
+    def __init__(self, db: Database, max_pending: int = 500, flush_interval: float = 2.0):
+        self._db = db
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._pending: Dict[Any, Any] = {}
+        # Меняется при сбросе буфера без записи: неудачная запись не возвращает отброшенное
+        self._generation = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.added = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed = 0
+
+    def _added(self) -> None:
+        self.added += 1
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+
+    def _rows(self, pending: Dict[Any, Any]) -> Any:
+        return list(pending.items())
+
+    def _merge(self, key: Any, value: Any) -> None:
+        """Возврат несохраненного значения; более новое значение в буфере побеждает"""
+        self._pending.setdefault(key, value)
+
+    def _take(self) -> Tuple[Dict[Any, Any], int]:
+        pending, self._pending = self._pending, {}
+        return pending, self._generation
+
+    def _written(self, pending: Dict[Any, Any]) -> None:
+        self.written += len(pending)
+        self.flushes += 1
+
+    def _restore(self, pending: Dict[Any, Any], generation: int) -> None:
+        self.failed += 1
+        if generation != self._generation:
+            return
+        for key, value in pending.items():
+            self._merge(key, value)
+
+    async def flush(self) -> None:
+        """Запись накопленного одной транзакцией"""
+        pending, generation = self._take()
+        if not pending:
+            return
+        try:
+            await self._db.run(self.write_fn, self._rows(pending))
+        except Exception:
+            self._restore(pending, generation)
+            raise
+        self._written(pending)
+
+    def flush_sync(self) -> None:
+        """Синхронная запись при завершении работы"""
+        pending, generation = self._take()
+        if not pending:
+            return
+        try:
+            self._db.call(self.write_fn, self._rows(pending))
+        except Exception:
+            self._restore(pending, generation)
+            raise
+        self._written(pending)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка отложенной записи ({self.name}): {e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            # В Python 3.11 asyncio.wait_for может проглотить cancel(), если
+            # ожидание завершается одновременно с отменой; флаг завершит цикл
+            self._stopping = True
+            self._wakeup.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики буфера: коэффициент схлопывания = added / written"""
+        return {
+            'pending': len(self._pending),
+            'added': self.added,
+            'written': self.written,
+            'flushes': self.flushes,
+            'failed': self.failed,
+        }
+
+
+class UserUpsertBuffer(WriteBehindBuffer):
+    """Отложенная запись активности пользователей.
+
+    Повторные /start одного пользователя схлопываются: побеждает последняя
+    запись.
+    """
+
+    name = 'активность пользователей'
+
+    def add(self, user_id: int, username: Optional[str], first_name: Optional[str], language: str) -> None:
+        """Постановка пользователя в очередь на запись"""
+        # Формат совпадает с datetime('now') в SQLite (UTC)
+        last_active = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self._pending[user_id] = (user_id, username, first_name, language, last_active)
+        self._added()
+
+    def is_pending(self, user_id: int) -> bool:
+        return user_id in self._pending
+
+    def _rows(self, pending) -> List[Tuple[int, Optional[str], Optional[str], str, str]]:
+        return list(pending.values())
+
+    @staticmethod
+    def write_fn(conn, rows):
+        upsert_users(conn, rows)
+
+
+class MemberCounter(WriteBehindBuffer):
+    """Счетчики участников чатов в памяти, периодически складываемые в chats.
+
+    Вступления не конкурируют за одну строку chats: каждое лишь
+    увеличивает локальный счетчик, а в базу уходит сумма за период.
+    """
+
+    name = 'счетчики участников'
+
+    def increment(self, chat_id: int) -> None:
+        self._pending[chat_id] = self._pending.get(chat_id, 0) + 1
+        self._added()
+
+    def discard(self) -> None:
+        """Сброс несохраненных приращений (перед пересчетом из user_chats).
+
+        Приращения, которые записываются прямо сейчас, при неудаче записи
+        тоже не вернутся в буфер.
+        """
+        self._pending = {}
+        self._generation += 1
+
+    def _merge(self, chat_id: int, delta: int) -> None:
+        # Приращения, накопленные за время неудачной записи, складываются
+        self._pending[chat_id] = self._pending.get(chat_id, 0) + delta
+
+    @staticmethod
+    def write_fn(conn, rows):
+        add_member_counts(conn, rows)
+
+
+# === Пользователи ===
+
+def upsert_users(conn: sqlite3.Connection,
+                 rows: List[Tuple[int, Optional[str], Optional[str], str, str]]) -> None:
+    """Пакетное сохранение пользователей: user_id, username, имя, язык, активность"""
+    conn.executemany('''
+    INSERT OR REPLACE INTO users (user_id, username, first_name, language, last_active)
+    VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+
+
+def get_user_profile(conn: sqlite3.Connection, user_id: int) -> Optional[Tuple[Optional[str], Optional[str], str, str, int]]:
+    """Профиль пользователя: username, имя, язык, активность, число групп"""
+    return conn.execute('''
+    SELECT username, first_name, language, last_active,
+           (SELECT COUNT(*) FROM user_chats WHERE user_id = ?) as group_count
+    FROM users
+    WHERE user_id = ?
+    ''', (user_id, user_id)).fetchone()
+
+
+# === Чаты ===
+
+def seed_chats(conn: sqlite3.Connection, group_ids: Dict[str, str], topics: Dict[str, Dict[str, Any]]) -> None:
+    """Добавление предопределенных тем.
+
+    Существующие строки не перезаписываются, чтобы не потерять правки
+    администратора; заполняются только пустые описание и эмодзи.
+    """
+    conn.executemany('''
+    INSERT OR IGNORE INTO chats (chat_name, telegram_group_id, keywords, description, emoji)
+    VALUES (?, ?, ?, ?, ?)
+    ''', [
+        (topic, group_id, json.dumps(topics[topic]['keywords']), topics[topic]['description'], topics[topic]['emoji'])
+        for topic, group_id in group_ids.items()
+    ])
+    conn.executemany('''
+    UPDATE chats SET description = ?, emoji = ?
+    WHERE chat_name = ? AND description = '' AND emoji = ''
+    ''', [
+        (topics[topic]['description'], topics[topic]['emoji'], topic)
+        for topic in group_ids
+    ])
+
+
+def load_chats(conn: sqlite3.Connection) -> List[Tuple[int, str, str, str, str, str]]:
+    """Активные чаты: chat_id, название, ID группы, ключевые слова (JSON), описание, эмодзи"""
+    return conn.execute('''
+    SELECT chat_id, chat_name, telegram_group_id, keywords, description, emoji
+    FROM chats
+    WHERE is_active = 1
+    ORDER BY chat_id
+    ''').fetchall()
+
+
+# === Участие в чатах ===
+
+def add_user_chat(conn: sqlite3.Connection, user_id: int, chat_id: int) -> bool:
+    """Добавление пользователя в чат; False, если он уже состоит в нем"""
+    cursor = conn.execute('''
+    INSERT OR IGNORE INTO user_chats (user_id, chat_id)
+    VALUES (?, ?)
+    ''', (user_id, chat_id))
+    return cursor.rowcount == 1
+
+
+def add_member_counts(conn: sqlite3.Connection, deltas: List[Tuple[int, int]]) -> None:
+    """Прибавление накопленных приращений: (chat_id, delta)"""
+    conn.executemany('''
+    UPDATE chats SET member_count = member_count + ?
+    WHERE chat_id = ?
+    ''', [(delta, chat_id) for chat_id, delta in deltas])
+
+
+def reconcile_member_counts(conn: sqlite3.Connection) -> int:
+    """Пересчет счетчиков участников из user_chats одним запросом"""
+    return conn.execute('''
+    UPDATE chats SET member_count = (
+        SELECT COUNT(*) FROM user_chats uc WHERE uc.chat_id = chats.chat_id
+    )
+    WHERE member_count != (
+        SELECT COUNT(*) FROM user_chats uc WHERE uc.chat_id = chats.chat_id
+    )
+    ''').rowcount
+
+
+def list_user_chat_names(conn: sqlite3.Connection, user_id: int) -> List[str]:
+    """Названия активных чатов пользователя"""
+    rows = conn.execute('''
+    SELECT c.chat_name
+    FROM chats c
+    JOIN user_chats uc ON c.chat_id = uc.chat_id
+    WHERE uc.user_id = ? AND c.is_active = 1
+    ''', (user_id,)).fetchall()
+    return [row[0] for row in rows]
+
+
+# === Инвайт-ссылки ===
+
+def load_ready_invite_links(conn: sqlite3.Connection, shard: int = 0) -> List[Tuple[str, str, int]]:
+    """Невыданные ссылки воркера: group_id, ссылка, срок действия"""
+    return conn.execute('''
+    SELECT group_id, invite_link, expire_at FROM invite_links
+    WHERE status = 'ready' AND shard = ?
+    ORDER BY expire_at
+    ''', (shard,)).fetchall()
+
+
+def store_invite_link(conn: sqlite3.Connection, invite_link: str, group_id: str,
+                      expire_at: int, created_at: int, shard: int = 0) -> None:
+    """Сохранение новой ссылки пула"""
+    conn.execute('''
+    INSERT OR IGNORE INTO invite_links (invite_link, group_id, expire_at, created_at, shard)
+    VALUES (?, ?, ?, ?, ?)
+    ''', (invite_link, group_id, expire_at, created_at, shard))
+
+
+def mark_invite_issued(conn: sqlite3.Connection, invite_link: str, user_id: int, issued_at: int) -> bool:
+    """Захват готовой ссылки для пользователя; False - ссылка уже выдана или удалена"""
+    return conn.execute('''
+    UPDATE invite_links SET status = 'issued', issued_to = ?, issued_at = ?
+    WHERE invite_link = ? AND status = 'ready'
+    ''', (user_id, issued_at, invite_link)).rowcount == 1
+
+
+def collect_invite_links(conn: sqlite3.Connection, threshold: int,
+                         group_ids: Iterable[str], shard: int = 0) -> Tuple[int, List[Tuple[str, str]]]:
+    """Удаление истекших, выданных и отозванных ссылок воркера.
+
+    Ссылки групп, которых больше нет в конфигурации, помечаются как
+    отозванные и возвращаются вызывающему для отзыва в Telegram. Ссылки
+    других воркеров не трогаются: их каталог мог еще не перезагрузиться.
+    """
+    removed = conn.execute('''
+    DELETE FROM invite_links
+    WHERE (expire_at <= ? OR status IN ('issued', 'revoked')) AND shard = ?
+    ''', (threshold, shard)).rowcount
+
+    group_ids = tuple(group_ids)
+    placeholders = ", ".join("?" for _ in group_ids)
+    stale = conn.execute(f'''
+    SELECT group_id, invite_link FROM invite_links
+    WHERE status = 'ready' AND shard = ? AND group_id NOT IN ({placeholders})
+    ''', (shard, *group_ids)).fetchall()
+    conn.execute(f'''
+    UPDATE invite_links SET status = 'revoked'
+    WHERE shard = ? AND group_id NOT IN ({placeholders})
+    ''', (shard, *group_ids))
+    return removed, stale
+
+
+# === Состояния диалогов ===
+
+def load_conversation_states(conn: sqlite3.Connection, name: str) -> List[Tuple[str, int]]:
+    """Сохраненные состояния диалогов ConversationHandler: ключ (JSON), состояние"""
+    return conn.execute(
+        'SELECT conversation_key, state FROM conversation_states WHERE name = ?', (name,)
+    ).fetchall()
+
+
+def save_persistence(conn: sqlite3.Connection,
+                     conversations: List[Tuple[str, str, Optional[int]]],
+                     users: List[Tuple[int, Optional[str]]]) -> None:
+    """Пакетная запись состояний диалогов и user_data; None - удаление записи"""
+    conn.executemany('''
+    INSERT OR REPLACE INTO conversation_states (name, conversation_key, state, updated_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ''', [row for row in conversations if row[2] is not None])
+    conn.executemany(
+        'DELETE FROM conversation_states WHERE name = ? AND conversation_key = ?',
+        [row[:2] for row in conversations if row[2] is None]
+    )
+    conn.executemany('''
+    INSERT OR REPLACE INTO user_states (user_id, data, updated_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ''', [row for row in users if row[1] is not None])
+    conn.executemany(
+        'DELETE FROM user_states WHERE user_id = ?',
+        [row[:1] for row in users if row[1] is None]
+    )
+
+
+def load_user_state(conn: sqlite3.Connection, user_id: int) -> Optional[str]:
+    """user_data пользователя в JSON или None"""
+    row = conn.execute('SELECT data FROM user_states WHERE user_id = ?', (user_id,)).fetchone()
+    return row[0] if row else None
+
+
+# === Кэш результатов поиска ===
+
+def get_cached_match(conn: sqlite3.Connection, catalog_version: str, query: str) -> Optional[Tuple[str, float, str]]:
+    """Сохраненный результат поиска для запроса: тема, оценка, причина"""
+    return conn.execute(
+        'SELECT chat_name, score, reason FROM match_cache WHERE catalog_version = ? AND query = ?',
+        (catalog_version, query)
+    ).fetchone()
+
+
+def store_cached_matches(conn: sqlite3.Connection, rows: List[Tuple[str, str, str, float, str, int]]) -> None:
+    """Пакетная запись результатов: версия, запрос, тема, оценка, причина, новые попадания"""
+    conn.executemany('''
+    INSERT INTO match_cache (catalog_version, query, chat_name, score, reason, hits, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (catalog_version, query) DO UPDATE SET
+        hits = hits + excluded.hits,
+        updated_at = excluded.updated_at
+    ''', rows)
+
+
+def load_popular_queries(conn: sqlite3.Connection, catalog_version: str, limit: int) -> List[Tuple[str, int]]:
+    """Самые частые запросы прошлых версий каталога, которых нет в текущей"""
+    return conn.execute('''
+    SELECT query, SUM(hits) AS total FROM match_cache
+    WHERE catalog_version != ?
+      AND query NOT IN (SELECT query FROM match_cache WHERE catalog_version = ?)
+    GROUP BY query
+    ORDER BY total DESC
+    LIMIT ?
+    ''', (catalog_version, catalog_version, limit)).fetchall()
+
+
+def prune_match_cache(conn: sqlite3.Connection, catalog_version: str, keep: int) -> int:
+    """Удаление записей прошлых версий и редких запросов сверх keep; число удаленных"""
+    deleted = conn.execute('DELETE FROM match_cache WHERE catalog_version != ?', (catalog_version,)).rowcount
+    deleted += conn.execute('''
+    DELETE FROM match_cache WHERE catalog_version = ? AND query NOT IN (
+        SELECT query FROM match_cache WHERE catalog_version = ? ORDER BY hits DESC LIMIT ?
+    )
+    ''', (catalog_version, catalog_version, keep)).rowcount
+    return deleted
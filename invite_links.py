@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime
+
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+
+class InviteLinkError(Exception):
+    """Не удалось получить инвайт-ссылку"""
+
+
+class InviteLinkService:
+    """Асинхронное получение одноразовых инвайт-ссылок через HTTP-клиент бота"""
+
+    def __init__(self, bot, attempts=3, backoff_base=0.5, backoff_max=4.0, timeout=8.0):
+        self._bot = bot
+        self.attempts = max(1, attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        # Запросы в полете: (group_id, user_id) -> Task
+        self._in_flight = {}
+
+        self.created = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def get_link(self, group_id, user_id=None):
+        """Ссылка для пользователя с объединением повторных запросов.
+
+        Ссылки одноразовые (member_limit=1), поэтому объединяются только
+        одновременные запросы одного пользователя в одну группу (например,
+        двойное нажатие кнопки), а не все запросы в группу.
+        """
+        key = (str(group_id), user_id)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.create_link(group_id))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(task)
+
+    async def create_link(self, group_id, expire_date=None):
+        """Создание ссылки с общим бюджетом времени на все попытки"""
+        try:
+            return await asyncio.wait_for(self._create_with_retries(group_id, expire_date), self.timeout)
+        except asyncio.TimeoutError:
+            self.failures += 1
+            raise InviteLinkError(f"Telegram не ответил за {self.timeout:.0f} сек")
+        except InviteLinkError:
+            self.failures += 1
+            raise
+
+    async def _create_with_retries(self, group_id, expire_date):
+        """Вызов createChatInviteLink с повторами и джиттером"""
+        started_at = time.monotonic()
+
+        for attempt in range(1, self.attempts + 1):
+            remaining = self.timeout - (time.monotonic() - started_at)
+            try:
+                invite = await self._bot.create_chat_invite_link(
+                    chat_id=group_id,
+                    member_limit=1,
+                    expire_date=expire_date,
+                    name=f'Инвайт от бота {datetime.now().strftime("%Y%m%d")}',
+                    read_timeout=max(remaining, 1.0),
+                    connect_timeout=max(remaining, 1.0)
+                )
+                self.created += 1
+                return invite.invite_link
+            except RetryAfter as e:
+                # Flood control: ждем ровно столько, сколько просит Telegram
+                delay = e.retry_after + random.uniform(0, self.backoff_base)
+                reason = f"flood control, повтор через {e.retry_after} сек"
+            except BadRequest as e:
+                # Ошибки запроса (нет прав, неверный ID) повторять бессмысленно
+                raise InviteLinkError(f"Ошибка Telegram: {e.message}")
+            except NetworkError as e:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+                reason = f"сетевая ошибка: {e.message}"
+            except TelegramError as e:
+                raise InviteLinkError(f"Ошибка Telegram: {e.message}")
+
+            remaining = self.timeout - (time.monotonic() - started_at)
+            if attempt == self.attempts or delay >= remaining:
+                raise InviteLinkError(f"Не удалось получить ссылку ({reason})")
+
+            self.retries += 1
+            logger.warning(f"🔁 Повтор запроса ссылки для {group_id} ({attempt}/{self.attempts}): {reason}")
+            await asyncio.sleep(delay)
+
+    async def revoke_link(self, group_id, invite_link):
+        """Отзыв ссылки, которая больше не будет выдана"""
+        try:
+            await asyncio.wait_for(
+                self._bot.revoke_chat_invite_link(chat_id=group_id, invite_link=invite_link),
+                self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise InviteLinkError(f"Telegram не ответил за {self.timeout:.0f} сек")
+        except TelegramError as e:
+            raise InviteLinkError(f"Ошибка Telegram: {e.message}")
+
+    def stats(self):
+        """Счетчики сервиса ссылок"""
+        return {
+            'in_flight': len(self._in_flight),
+            'created': self.created,
+            'coalesced': self.coalesced,
+            'retries': self.retries,
+            'failures': self.failures,
+        }
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from database import (
+    collect_invite_links, load_ready_invite_links, mark_invite_issued, store_invite_link
+)
+from invite_links import InviteLinkError
+
+logger = logging.getLogger(__name__)
+
+
+class InvitePool:
+    """Пул заранее созданных одноразовых ссылок для каждой группы.
+
+    При нескольких воркерах у каждого свой пул: ссылка помечается номером
+    воркера (shard) и не может быть выдана двум пользователям.
+    """
+
+    def __init__(self, service, db, group_ids, low_water=3, target=6,
+                 refill_batch=2, refill_interval=30.0, link_ttl=86400, expiry_margin=600, shard=0):
+        self._service = service
+        self._db = db
+        self.shard = shard
+        self._group_ids = set(group_ids)
+        self.low_water = low_water
+        self.target = max(target, low_water)
+        self.refill_batch = max(1, refill_batch)
+        self.refill_interval = refill_interval
+        self.link_ttl = link_ttl
+        # Ссылку, которая истечет раньше чем через margin секунд, не выдаем
+        self.expiry_margin = expiry_margin
+
+        # group_id -> deque[(invite_link, expire_at)]
+        self._links = {group_id: deque() for group_id in self._group_ids}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self._to_revoke = []
+
+        self.hits = 0
+        self.misses = 0
+        # Ссылки, которые к моменту выдачи уже были помечены в базе
+        self.conflicts = 0
+        self.refilled = 0
+        self.collected = 0
+
+    def update_groups(self, group_ids):
+        """Обновление списка групп после перезагрузки каталога.
+
+        Ссылки удаленных групп остаются в базе и отзываются при следующей
+        сборке мусора.
+        """
+        self._group_ids = set(group_ids)
+        self._links = {
+            group_id: self._links.get(group_id, deque())
+            for group_id in self._group_ids
+        }
+        self._wakeup.set()
+
+    def load(self):
+        """Загрузка невыданных ссылок из базы после рестарта"""
+        self._to_revoke.extend(self.collect_garbage())
+        for links in self._links.values():
+            links.clear()
+
+        rows = self._db.call(load_ready_invite_links, self.shard)
+        for group_id, invite_link, expire_at in rows:
+            if group_id in self._links:
+                self._links[group_id].append((invite_link, expire_at))
+        logger.info(f"🔗 Загружено ссылок из пула: {len(rows)}")
+
+    def collect_garbage(self):
+        """Удаление из базы истекших, выданных и отозванных ссылок.
+
+        Возвращает ссылки групп, которых больше нет в конфигурации, - их
+        нужно отозвать в Telegram.
+        """
+        threshold = int(time.time()) + self.expiry_margin
+        removed, stale = self._db.call(collect_invite_links, threshold, self._group_ids, self.shard)
+        self.collected += removed
+        return stale
+
+    def _drop_expired(self):
+        """Удаление истекающих ссылок из памяти"""
+        threshold = time.time() + self.expiry_margin
+        for links in self._links.values():
+            while links and links[0][1] <= threshold:
+                links.popleft()
+
+    def pop(self, group_id):
+        """Выдача готовой ссылки без обращения к Telegram (None, если пул пуст)"""
+        links = self._links.get(str(group_id))
+        threshold = time.time() + self.expiry_margin
+
+        while links:
+            invite_link, expire_at = links.popleft()
+            if expire_at > threshold:
+                self.hits += 1
+                if len(links) < self.low_water:
+                    self._wakeup.set()
+                return invite_link
+
+        self.misses += 1
+        self._wakeup.set()
+        return None
+
+    async def issue(self, group_id, user_id):
+        """Выдача ссылки из пула (None, если пул пуст).
+
+        Ссылка отдается только после того, как она помечена выданной в
+        базе: иначе при падении процесса до записи она загрузилась бы снова
+        как готовая и досталась второму пользователю. Пометка - условный
+        UPDATE по status = 'ready', поэтому ссылка выдается не больше одного раза.
+        """
+        while True:
+            invite_link = self.pop(group_id)
+            if invite_link is None:
+                return None
+            try:
+                claimed = await self._db.run(mark_invite_issued, invite_link, user_id, int(time.time()))
+            except Exception as e:
+                # Состояние ссылки неизвестно - не выдаем ее, ссылку создаст Telegram API
+                logger.error(f"❌ Не удалось отметить выдачу ссылки {group_id}: {e}")
+                return None
+            if claimed:
+                return invite_link
+            self.conflicts += 1
+
+    async def refill(self):
+        """Дозаполнение групп до целевого размера порциями по refill_batch"""
+        for group_id, links in self._links.items():
+            if len(links) >= self.target:
+                continue
+
+            missing = min(self.target - len(links), self.refill_batch)
+            for _ in range(missing):
+                expire_at = int(time.time()) + self.link_ttl
+                try:
+                    invite_link = await self._service.create_link(group_id, expire_date=expire_at)
+                except InviteLinkError as e:
+                    logger.warning(f"⚠️ Не удалось пополнить пул ссылок {group_id}: {e}")
+                    break
+
+                await self._db.run(
+                    store_invite_link, invite_link, group_id, expire_at, int(time.time()), self.shard
+                )
+                links.append((invite_link, expire_at))
+                self.refilled += 1
+
+    async def _revoke(self, stale):
+        """Отзыв ссылок удаленных групп в Telegram"""
+        for group_id, invite_link in stale:
+            try:
+                await self._service.revoke_link(group_id, invite_link)
+            except InviteLinkError as e:
+                logger.warning(f"⚠️ Не удалось отозвать ссылку {group_id}: {e}")
+
+    async def run(self):
+        """Фоновое пополнение пула и сборка мусора"""
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                threshold = int(time.time()) + self.expiry_margin
+                removed, stale = await self._db.run(collect_invite_links, threshold, self._group_ids, self.shard)
+                self.collected += removed
+                self._to_revoke.extend(stale)
+                self._drop_expired()
+                stale, self._to_revoke = self._to_revoke, []
+                await self._revoke(stale)
+                await self.refill()
+            except Exception as e:
+                logger.error(f"❌ Ошибка фонового пополнения пула ссылок: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            # Отмена может потеряться внутри asyncio.wait_for (Python 3.11),
+            # поэтому цикл завершается еще и по флагу
+            self._stopping = True
+            self._wakeup.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        """Размеры пула и счетчики выдачи"""
+        return {
+            'sizes': {group_id: len(links) for group_id, links in self._links.items()},
+            'hits': self.hits,
+            'misses': self.misses,
+            'conflicts': self.conflicts,
+            'refilled': self.refilled,
+            'collected': self.collected,
+        }
@@ -0,0 +1,57 @@
+from collections import defaultdict
+
+
+class KeywordIndex:
+    """Инвертированный индекс ключевых слов: основа слова -> [(тема, вес)].
+
+    Ключевые слова тем приводятся к основам тем же конвейером, что и
+    запросы, поэтому основы запроса и тем совпадают. Вес ключевого слова -
+    1 / число ключевых основ темы, так что сумма весов совпавших слов равна
+    прежней метрике |пересечение| / |ключевые слова|. Оценка запроса -
+    один проход по его словам, без перебора всех тем.
+    """
+
+    def __init__(self, postings, topic_names):
+        self._postings = postings
+        self._topic_names = topic_names
+
+    @classmethod
+    def build(cls, chats, normalizer):
+        """Построение индекса по каталогу чатов"""
+        postings = defaultdict(list)
+        topic_names = []
+
+        for topic_idx, chat in enumerate(chats):
+            topic_names.append(chat.name)
+            stems = set()
+            for keyword in chat.keywords:
+                language = 'en' if keyword.isascii() else 'ru'
+                stems.update(normalizer.normalize(keyword, language).split())
+            if not stems:
+                continue
+
+            weight = 1.0 / len(stems)
+            for stem in stems:
+                postings[stem].append((topic_idx, weight))
+
+        return cls(dict(postings), topic_names)
+
+    def __len__(self):
+        return len(self._postings)
+
+    def score(self, tokens):
+        """Лучшая тема для основ запроса: (тема, оценка, совпавшие основы) или None"""
+        scores = defaultdict(float)
+        matched = defaultdict(list)
+
+        for token in set(tokens):
+            for topic_idx, weight in self._postings.get(token, ()):
+                scores[topic_idx] += weight
+                matched[topic_idx].append(token)
+
+        if not scores:
+            return None
+
+        # При равенстве оценок побеждает тема, стоящая в каталоге раньше
+        best_idx = min(scores, key=lambda idx: (-scores[idx], idx))
+        return self._topic_names[best_idx], scores[best_idx], sorted(matched[best_idx])
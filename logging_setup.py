@@ -0,0 +1,124 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Формат, выбранный в setup_logging: его же используют дочерние процессы
+_formatter = logging.Formatter(TEXT_FORMAT)
+
+# Библиотеки, которые на INFO пишут строку на каждый HTTP-запрос
+DEFAULT_MODULE_LEVELS = {
+    'httpx': 'WARNING',
+    'httpcore': 'WARNING',
+}
+
+
+def parse_module_levels(spec):
+    """'httpx=WARNING,bot.match=DEBUG' -> {'httpx': 'WARNING', 'bot.match': 'DEBUG'}"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, sep, level = item.partition('=')
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, логгер, сообщение"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Прореживание частых записей ниже WARNING.
+
+    За каждую секунду пропускаются первые per_second записей, дальше -
+    только каждая sample_every-я. Предупреждения и ошибки не трогаются.
+    Фильтр ставится на логгер, поэтому отброшенная запись не форматируется
+    и не попадает в очередь.
+    """
+
+    def __init__(self, per_second=20, sample_every=100):
+        super().__init__()
+        self.per_second = per_second
+        self.sample_every = max(1, sample_every)
+        self._window = 0
+        self._in_window = 0
+        self.dropped = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        window = int(time.monotonic())
+        if window != self._window:
+            self._window = window
+            self._in_window = 0
+        self._in_window += 1
+        if self._in_window <= self.per_second or self._in_window % self.sample_every == 0:
+            return True
+        self.dropped += 1
+        return False
+
+
+def setup_logging(log_path, level='INFO', module_levels=None, max_bytes=10 << 20,
+                  backup_count=3, fmt='text'):
+    """Неблокирующее логирование: обработчики пишут из отдельного потока.
+
+    Корневой логгер только кладет записи в очередь (QueueHandler), а
+    QueueListener пишет их в stdout и в файл с ротацией по размеру.
+    Возвращает запущенный listener; он останавливается при выходе и
+    дописывает очередь.
+    """
+    global _formatter
+    formatter = _formatter = JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_path:
+        handlers.append(RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level.upper())
+
+    for name, module_level in {**DEFAULT_MODULE_LEVELS, **(module_levels or {})}.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # atexit выполняет обработчики в обратном порядке: очистка бота, зарегистрированная
+    # позже, еще успеет записать логи
+    atexit.register(listener.stop)
+    return listener
+
+
+def setup_child_logging():
+    """Инициализатор процессов пула: прямой вывод в stdout вместо очереди.
+
+    Процесс, созданный через fork, наследует QueueHandler, но не поток
+    QueueListener: записи копились бы в его копии очереди и не выводились.
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_formatter)
+    root.addHandler(handler)
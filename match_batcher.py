@@ -0,0 +1,109 @@
+import asyncio
+
+from match_executor import MatcherBusyError
+
+
+class MatchBatcher:
+    """Микропакетный поиск чатов поверх MatchExecutor.
+
+    Запросы, пришедшие в пределах max_wait, собираются в пачку и уходят в
+    пул одной задачей: match_many получает список запросов и возвращает
+    список результатов в том же порядке. Каждый обработчик ждет свой
+    результат через отдельный future. При batch_size=1 пачка уходит сразу,
+    как и раньше.
+    """
+
+    def __init__(self, executor, match_many, batch_size=16, max_wait=0.005):
+        self.executor = executor
+        self.match_many = match_many
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._pending = []
+        self._timer = None
+
+        # Статистика для подбора размера пачки и ожидания
+        self.queries = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.flushed_full = 0
+        self.flushed_timer = 0
+        self.rejected = 0
+
+    def submit(self, query):
+        """Постановка запроса в пачку.
+
+        Как и MatchExecutor.submit, отказывает сразу, если пул переполнен и
+        пачку некуда отправить. Возвращает future с результатом поиска.
+        """
+        if not self._pending and self.executor.saturated:
+            self.rejected += 1
+            raise MatcherBusyError("пул занят, пачку некуда отправить")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, future))
+        self.queries += 1
+
+        if len(self._pending) >= self.batch_size:
+            self.flushed_full += 1
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush_on_timer)
+        return future
+
+    def _flush_on_timer(self):
+        self._timer = None
+        if self._pending:
+            self.flushed_timer += 1
+            self._flush()
+
+    def _flush(self):
+        """Отправка накопленной пачки в пул одной задачей"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        self.batches += 1
+        self.max_batch = max(self.max_batch, len(batch))
+
+        try:
+            task = self.executor.submit(self.match_many, [query for query, _ in batch])
+        except MatcherBusyError as e:
+            self._resolve(batch, error=e)
+            return
+        task.add_done_callback(lambda done: self._on_done(batch, done))
+
+    def _on_done(self, batch, task):
+        if task.cancelled():
+            self._resolve(batch, error=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self._resolve(batch, error=task.exception())
+        else:
+            self._resolve(batch, results=task.result())
+
+    @staticmethod
+    def _resolve(batch, results=None, error=None):
+        """Раздача результатов пачки ожидающим обработчикам"""
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+
+    def stats(self):
+        """Размеры пачек и причины их отправки"""
+        return {
+            'batch_size': self.batch_size,
+            'max_wait_ms': round(self.max_wait * 1000, 2),
+            'pending': len(self._pending),
+            'queries': self.queries,
+            'batches': self.batches,
+            'avg_batch': round(self.queries / self.batches, 2) if self.batches else 0.0,
+            'max_batch': self.max_batch,
+            'flushed_full': self.flushed_full,
+            'flushed_timer': self.flushed_timer,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,195 @@
+import logging
+from collections import OrderedDict
+
+import database
+from database import WriteBehindBuffer
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Меняется вместе с логикой поиска: записи прежней логики перестают читаться
+MATCHER_VERSION = 1
+# Длинные тексты почти не повторяются - их не кэшируем
+MAX_QUERY_LENGTH = 256
+
+
+def normalize_query(text):
+    """Ключ кэша: нижний регистр и схлопнутые пробелы.
+
+    Поиск сам приводит запрос к нижнему регистру, поэтому результат для
+    ключа тот же, что и для исходного текста; в пул уходит сам ключ.
+    """
+    return ' '.join(text.lower().split())
+
+
+def catalog_version(fingerprint):
+    """Версия записей кэша: логика поиска плюс отпечаток каталога тем"""
+    return f'{MATCHER_VERSION}:{fingerprint}'
+
+
+class MatchCacheWriter(WriteBehindBuffer):
+    """Отложенная запись результатов и попаданий в таблицу match_cache.
+
+    Повторы одного запроса за период схлопываются в одну строку с суммой
+    попаданий - по ней прогрев выбирает частые запросы.
+    """
+
+    name = 'кэш поиска'
+
+    def add(self, version, query, result, hits=1):
+        key = (version, query)
+        pending = self._pending.get(key)
+        self._pending[key] = (result, hits + (pending[1] if pending else 0))
+        self._added()
+
+    def _rows(self, pending):
+        return [
+            (version, query, chat_name, score, reason, hits)
+            for (version, query), ((chat_name, score, reason), hits) in pending.items()
+        ]
+
+    def _merge(self, key, value):
+        # Результат - более новый из буфера, попадания складываются
+        pending = self._pending.get(key)
+        self._pending[key] = (pending[0], pending[1] + value[1]) if pending else value
+
+    @staticmethod
+    def write_fn(conn, rows):
+        database.store_cached_matches(conn, rows)
+
+
+class MatchCache:
+    """Кэш результатов поиска: LRU в памяти процесса и общая таблица SQLite.
+
+    Ключ - нормализованный запрос, значение - (тема, оценка, причина).
+    Промах в памяти проверяется в базе: туда пишут все воркеры, и записи
+    переживают перезапуск. Каждая запись помечена версией каталога тем;
+    после правки тем версия меняется, и старые записи разом перестают
+    читаться, а прогрев пересчитывает самые частые из них.
+
+    Пока версия не задана (NLP не прогрет или TF-IDF не загрузился), кэш
+    не читается и не пополняется: результаты базового поиска не
+    сохраняются. Память процесса трогается только из event loop, прогрев
+    пишет сразу в базу.
+    """
+
+    def __init__(self, db, max_size=4096, max_rows=50000, flush_interval=2.0,
+                 skip_reasons=(), enabled=True):
+        self._db = db
+        self.max_size = max_size
+        self.max_rows = max_rows
+        self.skip_reasons = frozenset(skip_reasons)
+        self.enabled = enabled
+        self.version = None
+        # (версия, запрос) -> результат, в порядке последнего обращения
+        self._local = OrderedDict()
+        self.writer = MatchCacheWriter(db, max_pending=1000, flush_interval=flush_interval)
+
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.warmed = 0
+        self.pruned = 0
+
+    def set_version(self, version):
+        """Новая версия каталога: записи прежней больше не подходят"""
+        if version != self.version:
+            self._local = OrderedDict()
+            self.version = version
+            logger.info(f"🗃️ Версия кэша поиска: {version}")
+
+    def _remember(self, key, result):
+        self._local[key] = result
+        if len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    async def get(self, query):
+        """Результат из памяти или из базы; None - искать заново"""
+        version = self.version
+        if not self.enabled or version is None or len(query) > MAX_QUERY_LENGTH:
+            return None
+
+        key = (version, query)
+        result = self._local.get(key)
+        if result is not None:
+            self._local.move_to_end(key)
+            self.local_hits += 1
+            METRICS.inc('bot_match_cache_total', 'local')
+            self.writer.add(version, query, result)
+            return result
+
+        try:
+            row = await self._db.run(database.get_cached_match, version, query)
+        except Exception as e:
+            # Сбой кэша не мешает поиску
+            logger.warning(f"⚠️ Ошибка чтения кэша поиска: {e}")
+            row = None
+        if row is None:
+            self.misses += 1
+            METRICS.inc('bot_match_cache_total', 'miss')
+            return None
+
+        result = tuple(row)
+        self.shared_hits += 1
+        METRICS.inc('bot_match_cache_total', 'shared')
+        if version == self.version:
+            self._remember(key, result)
+        self.writer.add(version, query, result)
+        return result
+
+    def put(self, query, result, version):
+        """Сохранение результата, найденного при версии version"""
+        if (not self.enabled or version is None or version != self.version
+                or len(query) > MAX_QUERY_LENGTH or result[2] in self.skip_reasons):
+            return
+        self._remember((version, query), result)
+        self.writer.add(version, query, result)
+        self.stored += 1
+
+    def warm(self, match_many, limit=500, batch_size=16):
+        """Прогрев текущей версии частыми запросами прошлых версий.
+
+        Синхронный: вызывается из потока прогрева NLP или через to_thread.
+        Результаты пишутся в базу, память процесса заполнится при обращениях.
+        Заодно удаляются записи прошлых версий и редкие запросы сверх
+        max_rows. Возвращает число пересчитанных запросов.
+        """
+        version = self.version
+        if not self.enabled or version is None:
+            return 0
+
+        popular = self._db.call(database.load_popular_queries, version, limit)
+        warmed = 0
+        for start in range(0, len(popular), batch_size):
+            chunk = popular[start:start + batch_size]
+            results = match_many([query for query, _ in chunk])
+            rows = [
+                (version, query, chat_name, score, reason, hits)
+                for (query, hits), (chat_name, score, reason) in zip(chunk, results)
+                if reason not in self.skip_reasons
+            ]
+            self._db.call(database.store_cached_matches, rows)
+            warmed += len(rows)
+
+        pruned = self._db.call(database.prune_match_cache, version, self.max_rows)
+        self.warmed += warmed
+        self.pruned += pruned
+        logger.info(f"🔥 Кэш поиска прогрет: {warmed} запросов, удалено старых записей: {pruned}")
+        return warmed
+
+    def stats(self):
+        """Попадания по уровням и доля запросов, обошедшихся без поиска"""
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            'version': self.version,
+            'size': len(self._local),
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.local_hits + self.shared_hits) / lookups, 3) if lookups else 0.0,
+            'stored': self.stored,
+            'warmed': self.warmed,
+            'pruned': self.pruned,
+            'write_pending': self.writer.stats()['pending'],
+        }
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Маркер задачи, которая простояла в очереди дольше дедлайна
+_EXPIRED = object()
+
+
+class MatcherBusyError(Exception):
+    """Очередь поиска переполнена"""
+
+
+class MatcherTimeoutError(Exception):
+    """Поиск не уложился в дедлайн"""
+
+
+def _timed_call(fn, args, enqueued_at, deadline_at):
+    """Выполнение задачи в воркере с замером времени ожидания в очереди"""
+    started_at = time.monotonic()
+    if started_at > deadline_at:
+        # Пользователь уже получил отказ по таймауту - не тратим CPU
+        return started_at - enqueued_at, _EXPIRED
+    return started_at - enqueued_at, fn(*args)
+
+
+class MatchExecutor:
+    """Пул потоков или процессов для поиска чатов с ограниченной очередью"""
+
+    def __init__(self, workers=2, queue_size=32, deadline=10.0, kind='thread', initializer=None):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.deadline = deadline
+        self.kind = kind
+        self._initializer = initializer
+        self._pool = None
+
+        # Задачи в пуле: выполняются + ждут в очереди, включая брошенные по таймауту
+        self._in_flight = 0
+        # Брошенные по таймауту задачи, которые еще занимают воркер или очередь
+        self._abandoned = 0
+
+        # Статистика для подбора размеров пула
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.abandoned = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def capacity(self):
+        """Максимум задач в работе одновременно"""
+        return self.workers + self.queue_size
+
+    @property
+    def queue_depth(self):
+        """Количество задач, ожидающих свободного воркера"""
+        return max(0, self._in_flight - self.workers)
+
+    @property
+    def saturated(self):
+        return self._in_flight >= self.capacity
+
+    def start(self):
+        """Создание пула (после загрузки моделей, чтобы процессы унаследовали их)"""
+        if self._pool is not None:
+            return
+        if self.kind == 'process':
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=self._initializer)
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix='matcher',
+                initializer=self._initializer
+            )
+        logger.info(f"✅ Пул поиска запущен: {self.kind}, воркеров {self.workers}, очередь {self.queue_size}")
+
+    def shutdown(self):
+        """Остановка пула без ожидания зависших задач"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, fn, *args):
+        """Постановка задачи в очередь.
+
+        Отказ при переполнении происходит сразу, до первого await, поэтому
+        обработчик может ответить пользователю без ожидания. Возвращает
+        asyncio.Task, которую нужно дождаться для получения результата.
+        """
+        if self.saturated:
+            self.rejected += 1
+            raise MatcherBusyError(f"в работе {self._in_flight} из {self.capacity} задач")
+
+        self.start()
+        enqueued_at = time.monotonic()
+        deadline_at = enqueued_at + self.deadline
+        future = self._pool.submit(_timed_call, fn, args, enqueued_at, deadline_at)
+
+        # Место в очереди освобождается, только когда задача реально вышла из пула
+        self._in_flight += 1
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda f: self._release_threadsafe(loop, f))
+        self.submitted += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        return asyncio.ensure_future(self._wait(future))
+
+    def _release_threadsafe(self, loop, future):
+        """Колбэк пула: вызывается из потока воркера или менеджера процессов"""
+        try:
+            loop.call_soon_threadsafe(self._release, future)
+        except RuntimeError:
+            # Event loop уже закрыт - счетчики больше никто не читает
+            pass
+
+    def _release(self, future):
+        self._in_flight -= 1
+        if getattr(future, 'abandoned', False):
+            self._abandoned -= 1
+
+    async def _wait(self, future):
+        """Ожидание результата с учетом дедлайна.
+
+        По таймауту задача, которая уже выполняется, не прерывается: она
+        продолжает занимать воркер и учитывается в ограничении очереди,
+        пока не завершится.
+        """
+        try:
+            wait_time, result = await asyncio.wait_for(asyncio.wrap_future(future), self.deadline)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            if not future.cancel():
+                future.abandoned = True
+                self._abandoned += 1
+                self.abandoned += 1
+            raise MatcherTimeoutError(f"поиск дольше {self.deadline} сек")
+        except Exception:
+            self.failed += 1
+            raise
+
+        if result is _EXPIRED:
+            self.timed_out += 1
+            raise MatcherTimeoutError(f"задача ждала в очереди {wait_time:.2f} сек")
+
+        self.completed += 1
+        self.total_wait += wait_time
+        self.max_wait = max(self.max_wait, wait_time)
+        return result
+
+    def stats(self):
+        """Метрики очереди и времени ожидания"""
+        return {
+            'kind': self.kind,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'in_flight': self._in_flight,
+            'abandoned_running': self._abandoned,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'abandoned': self.abandoned,
+            'failed': self.failed,
+            'avg_wait_ms': round(self.total_wait / self.completed * 1000, 2) if self.completed else 0.0,
+            'max_wait_ms': round(self.max_wait * 1000, 2),
+        }
@@ -0,0 +1,193 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from telegram.request import BaseRequest
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: наблюдение - bisect и три сложения"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # Последняя корзина - все, что больше верхней границы (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Оценка квантиля по верхней границе корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class _Timer:
+    """Контекстный менеджер замера: класс со слотами дешевле генератора contextmanager"""
+
+    __slots__ = ('metrics', 'name', 'label_value', 'started_at')
+
+    def __init__(self, metrics, name, label_value):
+        self.metrics = metrics
+        self.name = name
+        self.label_value = label_value
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, self.label_value, time.perf_counter() - self.started_at)
+
+
+_NULL_TIMER = nullcontext()
+
+
+class Metrics:
+    """Реестр метрик процесса: гистограммы задержек и счетчики по меткам.
+
+    Метрика - семейство с одной меткой (стадия, обработчик, запрос к базе,
+    метод API). Наблюдения приходят из event loop и из потоков пула поиска
+    и базы, поэтому обновление защищено одной блокировкой - это доли
+    микросекунды. При enabled=False timer() и inc() ничего не делают.
+    Метрики процессов пула поиска (MATCH_EXECUTOR=process) сюда не попадают.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # name -> (help, label, {значение метки: Histogram | int})
+        self._histograms = {}
+        self._counters = {}
+
+    def histogram(self, name, help_text, label):
+        self._histograms.setdefault(name, (help_text, label, {}))
+
+    def counter(self, name, help_text, label):
+        self._counters.setdefault(name, (help_text, label, {}))
+
+    def observe(self, name, label_value, seconds):
+        if not self.enabled:
+            return
+        series = self._histograms[name][2]
+        with self._lock:
+            histogram = series.get(label_value)
+            if histogram is None:
+                histogram = series[label_value] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, label_value, amount=1):
+        if not self.enabled:
+            return
+        series = self._counters[name][2]
+        with self._lock:
+            series[label_value] = series.get(label_value, 0) + amount
+
+    def timer(self, name, label_value):
+        """Замер блока кода в гистограмму name{label=label_value}"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, label_value)
+
+    def timed(self, name, label_value, callback):
+        """Обертка корутины-обработчика с замером времени"""
+        async def wrapper(*args, **kwargs):
+            with self.timer(name, label_value):
+                return await callback(*args, **kwargs)
+        wrapper.__name__ = getattr(callback, '__name__', label_value)
+        wrapper.__doc__ = callback.__doc__
+        return wrapper
+
+    def summary(self):
+        """Компактная сводка: число, среднее и квантили в миллисекундах"""
+        result = {}
+        with self._lock:
+            for name, (_, _, series) in sorted(self._histograms.items()):
+                for label_value, h in sorted(series.items()):
+                    result[f'{name}{{{label_value}}}'] = (
+                        f"n={h.count} avg={h.sum / h.count * 1000:.1f} "
+                        f"p50={h.quantile(0.5) * 1000:g} p95={h.quantile(0.95) * 1000:g} "
+                        f"p99={h.quantile(0.99) * 1000:g} мс"
+                    )
+            for name, (_, _, series) in sorted(self._counters.items()):
+                for label_value, value in sorted(series.items()):
+                    result[f'{name}{{{label_value}}}'] = value
+        return result
+
+    def render_prometheus(self):
+        """Текстовый формат Prometheus (exposition format 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, (help_text, label, series) in sorted(self._histograms.items()):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for label_value, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label}="{label_value}",le="{bound:g}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{label}="{label_value}",le="+Inf"}} {h.count}')
+                    lines.append(f'{name}_sum{{{label}="{label_value}"}} {h.sum:.6f}')
+                    lines.append(f'{name}_count{{{label}="{label_value}"}} {h.count}')
+            for name, (help_text, label, series) in sorted(self._counters.items()):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for label_value, value in sorted(series.items()):
+                    lines.append(f'{name}{{{label}="{label_value}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class TimedRequest(BaseRequest):
+    """Обертка HTTP-клиента бота: время каждого запроса к Bot API по методу"""
+
+    def __init__(self, request, metrics):
+        self._request = request
+        self._metrics = metrics
+
+    @property
+    def read_timeout(self):
+        return self._request.read_timeout
+
+    async def initialize(self):
+        await self._request.initialize()
+
+    async def shutdown(self):
+        await self._request.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        with self._metrics.timer('bot_telegram_api_seconds', url.rsplit('/', 1)[-1]):
+            return await self._request.do_request(
+                url, method, request_data=request_data, read_timeout=read_timeout,
+                write_timeout=write_timeout, connect_timeout=connect_timeout, pool_timeout=pool_timeout
+            )
+
+
+# Реестр процесса и метрики бота
+METRICS = Metrics()
+
+METRICS.histogram('bot_match_stage_seconds', 'Время стадии поиска чата', 'stage')
+METRICS.counter('bot_match_winner_total', 'Стадия поиска, давшая результат', 'stage')
+METRICS.counter('bot_match_cache_total', 'Обращения к кэшу поиска по результату', 'result')
+METRICS.histogram('bot_handler_seconds', 'Время обработчика обновления', 'handler')
+METRICS.histogram('bot_db_query_seconds', 'Время функции репозитория SQLite', 'query')
+METRICS.histogram('bot_telegram_api_seconds', 'Время запроса к Bot API', 'method')
+METRICS.counter('bot_invite_links_total', 'Выданные инвайт-ссылки по источнику', 'source')
+METRICS.counter('bot_rate_limit_total', 'Проверки лимита запросов: allowed или причина отказа', 'result')
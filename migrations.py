@@ -0,0 +1,163 @@
+import logging
+import sqlite3
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Упорядоченные миграции схемы: (версия, описание, SQL-выражения).
+# Уже примененные миграции не меняем - только добавляем новые в конец.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Базовые таблицы", [
+        # Таблица пользователей
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            language TEXT DEFAULT 'ru'
+        )
+        ''',
+        # Таблица чатов
+        '''
+        CREATE TABLE IF NOT EXISTS chats (
+            chat_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_name TEXT UNIQUE,
+            telegram_group_id TEXT,
+            member_count INTEGER DEFAULT 0,
+            is_active BOOLEAN DEFAULT TRUE,
+            keywords TEXT DEFAULT '[]'
+        )
+        ''',
+        # Таблица участия пользователей в чатах
+        '''
+        CREATE TABLE IF NOT EXISTS user_chats (
+            user_id INTEGER,
+            chat_id INTEGER,
+            join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id),
+            FOREIGN KEY (chat_id) REFERENCES chats (chat_id),
+            PRIMARY KEY (user_id, chat_id)
+        )
+        ''',
+        # Таблица пула интересов
+        '''
+        CREATE TABLE IF NOT EXISTS interest_pool (
+            user_id INTEGER,
+            topic_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'pending',
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        # Пул заранее созданных инвайт-ссылок
+        '''
+        CREATE TABLE IF NOT EXISTS invite_links (
+            invite_link TEXT PRIMARY KEY,
+            group_id TEXT,
+            created_at INTEGER,
+            expire_at INTEGER,
+            status TEXT DEFAULT 'ready',
+            issued_to INTEGER,
+            issued_at INTEGER
+        )
+        ''',
+    ]),
+    (2, "Индексы для частых запросов", [
+        # Заявки пользователя по статусу
+        'CREATE INDEX IF NOT EXISTS idx_interest_pool_user_status ON interest_pool (user_id, status)',
+        # Выборки активных пользователей за период
+        'CREATE INDEX IF NOT EXISTS idx_users_last_active ON users (last_active)',
+        # Участники чата: PK (user_id, chat_id) не помогает искать по chat_id
+        'CREATE INDEX IF NOT EXISTS idx_user_chats_chat ON user_chats (chat_id)',
+        # Загрузка пула ссылок и сборка мусора по сроку действия
+        'CREATE INDEX IF NOT EXISTS idx_invite_links_status_expire ON invite_links (status, expire_at)',
+    ]),
+    (3, "Описание и эмодзи тем в таблице chats", [
+        "ALTER TABLE chats ADD COLUMN description TEXT DEFAULT ''",
+        "ALTER TABLE chats ADD COLUMN emoji TEXT DEFAULT ''",
+    ]),
+    (4, "Состояния диалогов и user_data между перезапусками", [
+        # Ключ диалога ConversationHandler в JSON: [chat_id, user_id]
+        '''
+        CREATE TABLE IF NOT EXISTS conversation_states (
+            name TEXT NOT NULL,
+            conversation_key TEXT NOT NULL,
+            state INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (name, conversation_key)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_states (
+            user_id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (5, "Владелец ссылки пула при нескольких воркерах", [
+        # Ссылки одноразовые: каждый воркер выдает только созданные им самим
+        "ALTER TABLE invite_links ADD COLUMN shard INTEGER DEFAULT 0",
+        'DROP INDEX IF EXISTS idx_invite_links_status_expire',
+        'CREATE INDEX IF NOT EXISTS idx_invite_links_status_shard_expire ON invite_links (status, shard, expire_at)',
+    ]),
+    (6, "Общий кэш результатов поиска", [
+        # Версия - отпечаток каталога тем: после правки тем старые записи не читаются
+        '''
+        CREATE TABLE IF NOT EXISTS match_cache (
+            catalog_version TEXT NOT NULL,
+            query TEXT NOT NULL,
+            chat_name TEXT NOT NULL,
+            score REAL NOT NULL,
+            reason TEXT NOT NULL,
+            hits INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (catalog_version, query)
+        )
+        ''',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы (0 для новой базы)"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def migrate(conn: sqlite3.Connection, target: int = LATEST_VERSION) -> int:
+    """Применение недостающих миграций по порядку, каждая в своей транзакции"""
+    current = get_schema_version(conn)
+    conn.commit()
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+
+        logger.info(f"🛠️ Миграция схемы {version}: {description}")
+        try:
+            conn.execute('BEGIN')
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"❌ Миграция {version} не применена")
+            raise
+        current = version
+
+    return current
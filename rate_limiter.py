@@ -0,0 +1,105 @@
+import time
+from collections import OrderedDict
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated_at', 'noticed_at')
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated_at = now
+        self.noticed_at = 0.0
+
+
+class RateLimiter:
+    """Token bucket на пользователя плюс общий на процесс.
+
+    Пользователь может сделать burst дорогих действий подряд, дальше -
+    rate в секунду. Общее ведро ограничивает суммарную нагрузку на поиск
+    и Telegram API. На активного пользователя хранится одно ведро из трех
+    чисел; ведра в порядке последнего обращения, поэтому молчащие дольше
+    idle_ttl удаляются с начала за O(1) на вызов. Полное ведро без вреда
+    удаляется: новое создается полным.
+    """
+
+    def __init__(self, rate=0.5, burst=5, global_rate=50.0, global_burst=100,
+                 idle_ttl=600.0, max_users=100000, notice_interval=10.0, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.idle_ttl = idle_ttl
+        self.max_users = max_users
+        # Предупреждение о лимите - не чаще раза в notice_interval секунд
+        self.notice_interval = notice_interval
+        self._clock = clock
+
+        self._buckets = OrderedDict()
+        self._global = _Bucket(global_burst, clock())
+
+        self.allowed = 0
+        self.limited_user = 0
+        self.limited_global = 0
+        self.notices = 0
+        self.evicted = 0
+
+    @staticmethod
+    def _refill(bucket, rate, burst, now):
+        bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated_at) * rate)
+        bucket.updated_at = now
+
+    def _evict(self, now):
+        while self._buckets:
+            user_id, bucket = next(iter(self._buckets.items()))
+            if now - bucket.updated_at < self.idle_ttl and len(self._buckets) <= self.max_users:
+                break
+            del self._buckets[user_id]
+            self.evicted += 1
+
+    def acquire(self, user_id, cost=1.0):
+        """Списание cost токенов; None - разрешено, иначе причина: 'user' или 'global'"""
+        now = self._clock()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = _Bucket(self.burst, now)
+        else:
+            self._buckets.move_to_end(user_id)
+            self._refill(bucket, self.rate, self.burst, now)
+        self._evict(now)
+
+        if bucket.tokens < cost:
+            self.limited_user += 1
+            return 'user'
+
+        self._refill(self._global, self.global_rate, self.global_burst, now)
+        if self._global.tokens < cost:
+            self.limited_global += 1
+            return 'global'
+
+        bucket.tokens -= cost
+        self._global.tokens -= cost
+        self.allowed += 1
+        return None
+
+    def should_notice(self, user_id):
+        """Нужно ли отвечать на отклоненное сообщение (остальные игнорируются)"""
+        bucket = self._buckets.get(user_id)
+        now = self._clock()
+        if bucket is not None and now - bucket.noticed_at < self.notice_interval:
+            return False
+        if bucket is not None:
+            bucket.noticed_at = now
+        self.notices += 1
+        return True
+
+    def stats(self):
+        """Пропущенные и отклоненные действия, число активных ведер"""
+        return {
+            'allowed': self.allowed,
+            'limited_user': self.limited_user,
+            'limited_global': self.limited_global,
+            'notices': self.notices,
+            'active_users': len(self._buckets),
+            'evicted': self.evicted,
+            'global_tokens': round(self._global.tokens, 1),
+        }
@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import os
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from webhook_server import WebhookServer, update_backlog
+
+logger = logging.getLogger(__name__)
+
+# Заголовок кадра: длина тела обновления
+_FRAME_HEADER = 4
+
+
+def shard_of(user_id, shards):
+    """Номер воркера пользователя: постоянен, пока не меняется число воркеров"""
+    return user_id % shards
+
+
+def shard_socket_path(socket_dir, index):
+    return os.path.join(socket_dir, f'worker-{index}.sock')
+
+
+def update_user_id(data):
+    """Пользователь обновления по сырому JSON (0, если его нет).
+
+    Берется отправитель ('from' или 'user'), для постов каналов - чат.
+    Для личных чатов это совпадает с ключом ConversationHandler.
+    """
+    for payload in data.values():
+        if not isinstance(payload, dict):
+            continue
+        user = payload.get('from') or payload.get('user')
+        if isinstance(user, dict) and 'id' in user:
+            return user['id']
+        chat = payload.get('chat') or (payload.get('message') or {}).get('chat')
+        if isinstance(chat, dict) and 'id' in chat:
+            return chat['id']
+    return 0
+
+
+def _update_key(update):
+    if isinstance(update, Update):
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+    return 0
+
+
+class UserOrderedProcessor(BaseUpdateProcessor):
+    """Параллельная обработка разных пользователей, строго по порядку - одного.
+
+    Блокировки полосатые: фиксированный массив asyncio.Lock, пользователь
+    попадает в полосу user_id % stripes. Память не растет с числом
+    пользователей, а совпадение полос лишь иногда сериализует двух соседей.
+    Полоса берется до семафора: обновления одного пользователя ждут своей
+    очереди, не занимая слоты параллельности.
+    """
+
+    def __init__(self, max_concurrent_updates=32, stripes=1024):
+        super().__init__(max_concurrent_updates)
+        self._locks = [asyncio.Lock() for _ in range(stripes)]
+        # Обновления, взятые из очереди и еще не обработанные
+        self.pending = 0
+        self.processed = 0
+        self.waited = 0
+
+    async def process_update(self, update, coroutine):
+        lock = self._locks[_update_key(update) % len(self._locks)]
+        if lock.locked():
+            self.waited += 1
+        self.pending += 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            self.pending -= 1
+            self.processed += 1
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self):
+        """Обработанные, ожидающие и ждавшие своей полосы обновления"""
+        return {
+            'concurrency': self.max_concurrent_updates,
+            'stripes': len(self._locks),
+            'pending': self.pending,
+            'processed': self.processed,
+            'waited_for_user': self.waited,
+        }
+
+
+class ShardRouter:
+    """Раздача обновлений воркерам по user_id через Unix-сокеты.
+
+    На каждый воркер - ограниченная очередь и одно постоянное соединение,
+    поэтому обновления пользователя приходят к воркеру в порядке приема.
+    Пока воркер недоступен (рестарт), его очередь копится; когда она
+    заполнена, route() возвращает False и вебхук отвечает 503 - Telegram
+    повторит доставку. Кадр - 4 байта длины и тело обновления как есть.
+
+    Очереди живут только в памяти: принятые (200), но не отправленные
+    обновления пропадают вместе с процессом маршрутизатора. Подтверждения
+    от воркера нет - кадр, записанный в сокет перед падением воркера,
+    тоже теряется.
+    """
+
+    def __init__(self, socket_paths, queue_size=1000, reconnect_delay=0.5):
+        self.socket_paths = list(socket_paths)
+        self.reconnect_delay = reconnect_delay
+        self._queues = [asyncio.Queue(maxsize=queue_size) for _ in self.socket_paths]
+        self._connected = [False] * len(self.socket_paths)
+        self._tasks = []
+
+        self.routed = [0] * len(self.socket_paths)
+        self.rejected = 0
+        self.reconnects = 0
+
+    def __len__(self):
+        return len(self.socket_paths)
+
+    def route(self, user_id, body):
+        """Постановка тела обновления в очередь воркера пользователя"""
+        shard = shard_of(user_id, len(self._queues))
+        try:
+            self._queues[shard].put_nowait(body)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.routed[shard] += 1
+        return True
+
+    async def _pump(self, index):
+        """Отправка очереди воркеру с переподключением"""
+        path = self.socket_paths[index]
+        queue = self._queues[index]
+        body = None
+        while True:
+            try:
+                _, writer = await asyncio.open_unix_connection(path)
+            except OSError:
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            self._connected[index] = True
+            logger.info(f"🧩 Соединение с воркером {index}: {path}")
+            try:
+                while True:
+                    if body is None:
+                        body = await queue.get()
+                    writer.write(len(body).to_bytes(_FRAME_HEADER, 'big') + body)
+                    await writer.drain()
+                    body = None
+            except ConnectionError as e:
+                # Неотправленное тело остается в body и уйдет после переподключения
+                logger.warning(f"⚠️ Воркер {index} отключился: {e}")
+                self.reconnects += 1
+            finally:
+                self._connected[index] = False
+                writer.close()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._pump(index)) for index in range(len(self.socket_paths))]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self):
+        """Отправленные и отклоненные обновления, очереди воркеров"""
+        return {
+            'workers': len(self.socket_paths),
+            'connected': sum(self._connected),
+            'routed': sum(self.routed),
+            'rejected': self.rejected,
+            'reconnects': self.reconnects,
+            'queues': [queue.qsize() for queue in self._queues],
+        }
+
+
+class ShardedWebhookServer(WebhookServer):
+    """Вебхук процесса-маршрутизатора: обновления уходят воркерам без разбора в Update.
+
+    200 означает постановку в очередь маршрутизатора, а не обработку -
+    см. ShardRouter о потере обновлений при падении процессов.
+    """
+
+    def __init__(self, router, **kwargs):
+        super().__init__(None, **kwargs)
+        self.router = router
+
+    def _deliver(self, body, data):
+        if not self.router.route(update_user_id(data), body):
+            self.queue_full += 1
+            return 503
+        self.accepted += 1
+        return 200
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'accepted': self.accepted,
+            'queue_full': self.queue_full,
+            'forbidden': self.forbidden,
+            'bad_requests': self.bad_requests,
+        }
+
+
+class ShardListener:
+    """Прием обновлений воркером от маршрутизатора через Unix-сокет.
+
+    Пока очередь приложения и обработка заполнены (max_backlog), кадры не
+    читаются: сокет упирается в буфер ядра, очередь маршрутизатора
+    растет, и вебхук начинает отвечать 503.
+
+    Кадр считается принятым, как только попал в update_queue приложения:
+    очередь и обработка в памяти, при падении воркера их содержимое
+    теряется, маршрутизатор его не переотправляет.
+    """
+
+    def __init__(self, application, path, max_backlog=1000, poll_interval=0.01):
+        self.application = application
+        self.path = path
+        self.max_backlog = max_backlog
+        self.poll_interval = poll_interval
+        self._server = None
+
+        self.received = 0
+        self.bad_requests = 0
+        self.throttled = 0
+
+    async def start(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if os.path.exists(self.path):
+            # Сокет от предыдущего запуска воркера
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, self.path)
+        logger.info(f"🧩 Воркер слушает {self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(_FRAME_HEADER)
+                body = await reader.readexactly(int.from_bytes(header, 'big'))
+                try:
+                    update = Update.de_json(json.loads(body), self.application.bot)
+                except (ValueError, TypeError, KeyError, AttributeError) as e:
+                    self.bad_requests += 1
+                    logger.warning(f"⚠️ Некорректное обновление от маршрутизатора: {e}")
+                    continue
+
+                if update_backlog(self.application) >= self.max_backlog:
+                    self.throttled += 1
+                    while update_backlog(self.application) >= self.max_backlog:
+                        await asyncio.sleep(self.poll_interval)
+                await self.application.update_queue.put(update)
+                self.received += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def stats(self):
+        """Принятые обновления и текущая нагрузка воркера"""
+        return {
+            'received': self.received,
+            'bad_requests': self.bad_requests,
+            'throttled': self.throttled,
+            'backlog': update_backlog(self.application),
+            'max_backlog': self.max_backlog,
+        }
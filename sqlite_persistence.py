@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+import time
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+import database
+from sharding import shard_of
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    """Состояния ConversationHandler и user_data в той же базе SQLite.
+
+    PTB сам отслеживает изменения: раз в update_interval он передает
+    только затронутых пользователей и измененные ключи диалогов. Здесь они
+    копятся в памяти и записываются одной транзакцией на раунд.
+
+    user_data не загружается при старте: данные пользователя читаются из
+    базы при первом его обновлении (refresh_user_data). Пользователи,
+    молчащие дольше idle_ttl, выгружаются из памяти через
+    Application.drop_user_data - удаление из базы для них пропускается.
+
+    При нескольких воркерах (shard = (номер, всего)) каждый читает только
+    диалоги своих пользователей; запись в общую базу не пересекается, так
+    как пользователь всегда обслуживается одним воркером.
+    """
+
+    def __init__(self, db, update_interval=5.0, idle_ttl=1800.0, max_users=10000, shard=None):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self._db = db
+        self.idle_ttl = idle_ttl
+        self.max_users = max_users
+        self.shard = shard
+        self._application = None
+
+        # Несохраненные изменения: (диалог, ключ) -> состояние, user_id -> JSON
+        self._pending_conversations = {}
+        self._pending_users = {}
+        self._flush_task = None
+
+        # Пользователи, чьи данные загружены в память: user_id -> (user_data, время)
+        self._resident = {}
+        # Выгруженные, для которых PTB еще вызовет drop_user_data
+        self._evicted = set()
+
+        self.flushes = 0
+        self.written = 0
+        self.loaded = 0
+        self.evictions = 0
+
+    def bind(self, application):
+        """Приложение нужно для выгрузки user_data из памяти"""
+        self._application = application
+
+    # === Загрузка ===
+
+    async def get_user_data(self):
+        # Данные пользователей подгружаются лениво в refresh_user_data
+        return {}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        rows = await self._db.run(database.load_conversation_states, name)
+        conversations = {tuple(json.loads(key)): state for key, state in rows}
+        if self.shard is not None:
+            index, shards = self.shard
+            # Последний элемент ключа - user_id (per_user=True)
+            conversations = {
+                key: state for key, state in conversations.items()
+                if key and shard_of(key[-1], shards) == index
+            }
+        logger.info(f"💾 Восстановлено диалогов '{name}': {len(conversations)}")
+        return conversations
+
+    async def refresh_user_data(self, user_id, user_data):
+        """Перед обработкой обновления: подгрузка user_data вернувшегося пользователя"""
+        resident = self._resident.get(user_id)
+        self._resident[user_id] = (user_data, time.monotonic())
+        if resident is not None:
+            return
+
+        # Несохраненная версия новее записи в базе
+        data = self._pending_users.get(user_id)
+        if data is None:
+            data = await self._db.run(database.load_user_state, user_id)
+        if data:
+            self.loaded += 1
+            for key, value in json.loads(data).items():
+                user_data.setdefault(key, value)
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    # === Изменения ===
+
+    async def update_conversation(self, name, key, new_state):
+        self._pending_conversations[(name, json.dumps(list(key)))] = new_state
+        self._schedule_flush()
+
+    async def update_user_data(self, user_id, data):
+        self._pending_users[user_id] = json.dumps(data, ensure_ascii=False)
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id):
+        if user_id in self._evicted:
+            # Выгрузка из памяти, а не удаление. Если пользователь успел
+            # вернуться, PTB пропустил его изменения в этом раунде - пишем сами
+            self._evicted.discard(user_id)
+            resident = self._resident.get(user_id)
+            if resident is not None:
+                await self.update_user_data(user_id, resident[0])
+            return
+        self._resident.pop(user_id, None)
+        self._pending_users[user_id] = None
+        self._schedule_flush()
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    # === Запись ===
+
+    def _schedule_flush(self):
+        """Одна запись на раунд: PTB вызывает update_* пачкой через gather"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        # Даем отработать остальным update_* текущего раунда
+        await asyncio.sleep(0)
+        try:
+            await self._write()
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи состояний диалогов: {e}")
+        self._evict_idle()
+
+    async def _write(self):
+        conversations = [(name, key, state) for (name, key), state in self._pending_conversations.items()]
+        users = list(self._pending_users.items())
+        if not conversations and not users:
+            return
+        self._pending_conversations = {}
+        self._pending_users = {}
+        try:
+            await self._db.run(database.save_persistence, conversations, users)
+        except Exception:
+            # Возвращаем несохраненное, не затирая более новые изменения
+            for name, key, state in conversations:
+                self._pending_conversations.setdefault((name, key), state)
+            for user_id, data in users:
+                self._pending_users.setdefault(user_id, data)
+            raise
+        self.flushes += 1
+        self.written += len(conversations) + len(users)
+
+    async def flush(self):
+        """Вызывается PTB при остановке после последнего раунда"""
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._write()
+
+    def _evict_idle(self):
+        """Выгрузка из памяти user_data давно молчавших пользователей"""
+        if self._application is None:
+            return
+        now = time.monotonic()
+        # Данные, затронутые в последних раундах, могли еще не дойти до базы
+        min_idle = 2 * (self.update_interval or 0)
+        by_age = sorted(self._resident.items(), key=lambda item: item[1][1])
+        excess = len(by_age) - self.max_users
+
+        for user_id, (_, seen_at) in by_age:
+            idle = now - seen_at
+            if idle < min_idle or (idle < self.idle_ttl and excess <= 0):
+                break
+            if user_id in self._pending_users:
+                continue
+            del self._resident[user_id]
+            self._evicted.add(user_id)
+            self._application.drop_user_data(user_id)
+            self.evictions += 1
+            excess -= 1
+
+    def stats(self):
+        """Записи, подгрузки и выгрузки состояний"""
+        return {
+            'resident_users': len(self._resident),
+            'pending_conversations': len(self._pending_conversations),
+            'pending_users': len(self._pending_users),
+            'flushes': self.flushes,
+            'written': self.written,
+            'loaded': self.loaded,
+            'evictions': self.evictions,
+        }
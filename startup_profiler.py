@@ -0,0 +1,34 @@
+import time
+
+
+class StartupProfiler:
+    """Замер фаз запуска: каждая отметка фиксирует время с предыдущей.
+
+    Для разбивки импорта по модулям: python -X importtime bot.py --profile-startup
+    """
+
+    def __init__(self, started_at=None):
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self._last = self.started_at
+        self.phases = []
+
+    def lap(self, name):
+        """Завершение фазы name: длительность с предыдущей отметки"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def elapsed(self):
+        """Секунды с начала запуска"""
+        return time.perf_counter() - self.started_at
+
+    def report(self):
+        """Таблица фаз запуска"""
+        total = self._last - self.started_at
+        width = max([len(name) for name, _ in self.phases] + [len("итого")])
+        lines = [f"{'фаза':<{width}}  {'мс':>9}  {'доля':>6}"]
+        for name, duration in self.phases:
+            share = duration / total * 100 if total else 0.0
+            lines.append(f"{name:<{width}}  {duration * 1000:>9.1f}  {share:>5.1f}%")
+        lines.append(f"{'итого':<{width}}  {total * 1000:>9.1f}  {100:>5.1f}%")
+        return "\n".join(lines)
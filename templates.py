@@ -0,0 +1,541 @@
+from types import MappingProxyType
+
+from telegram import KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
+
+# Языки интерфейса; остальные пользователи видят язык по умолчанию
+LANGUAGES = ('ru', 'en')
+DEFAULT_LANGUAGE = 'ru'
+
+# Подписи кнопок: действие -> текст. Обработчики сравнивают ввод не с текстом,
+# а с действием, поэтому кнопки любого языка работают в любом состоянии
+BUTTONS = {
+    'ru': {
+        'find': "🔍 Найти группу по интересам",
+        'groups': "📋 Мои группы",
+        'profile': "👤 Профиль",
+        'popular': "🎯 Популярные темы",
+        'help': "❓ Помощь",
+        'support': "🆘 Поддержка",
+        'join': "✅ Присоединиться",
+        'refuse': "❌ Отказаться",
+        'more_options': "🔄 Другие варианты",
+        'more_topics': "🔄 Другие темы",
+        'menu': "🏠 В меню",
+        'back': "🔙 Назад",
+        'cancel': "❌ Отмена",
+    },
+    'en': {
+        'find': "🔍 Find a group by interests",
+        'groups': "📋 My groups",
+        'profile': "👤 Profile",
+        'popular': "🎯 Popular topics",
+        'help': "❓ Help",
+        'support': "🆘 Support",
+        'join': "✅ Join",
+        'refuse': "❌ Decline",
+        'more_options': "🔄 Other options",
+        'more_topics': "🔄 Other topics",
+        'menu': "🏠 Main menu",
+        'back': "🔙 Back",
+        'cancel': "❌ Cancel",
+    },
+}
+
+# Раскладки клавиатур из действий; клавиатура тем собирается из каталога
+LAYOUTS = {
+    'main_menu': [['find'], ['groups', 'profile'], ['popular', 'help'], ['support']],
+    'join': [['join', 'refuse']],
+    'join_more': [['join', 'refuse'], ['more_options', 'menu']],
+    'join_topic': [['join', 'refuse'], ['more_topics', 'menu']],
+    'support': [['menu', 'cancel']],
+}
+# Последняя строка клавиатуры популярных тем
+TOPICS_FOOTER = ['back', 'refuse']
+
+# Тексты сообщений. Строки с {полями} становятся форматтерами, остальные
+# отдаются как есть
+TEXTS = {
+    'ru': {
+        'welcome': """
+🤖 **Привет, {first_name}!**
+
+🌟 **Я - ваш личный гид по миру единомышленников!**
+
+Здесь люди с общими интересами:
+✅ Создают совместные проекты
+✅ Обсуждают идеи и находят решения
+✅ Развиваются вместе и поддерживают друг друга
+✅ Делятся знаниями и опытом
+
+🎯 **Что вас интересует сегодня?** Выберите действие из меню ниже 👇
+""",
+        'goodbye': """
+👋 **До свидания!**
+
+💡 **Не забывайте:** Вы всегда можете вернуться, нажав /start в любое время.
+
+🌟 **Ждем вас снова!**
+""",
+        'ask_topic': (
+            "🎯 **Что вас интересует?**\n\n"
+            "Напишите тему, например:\n"
+            "• 'путешествия по Азии'\n"
+            "• 'программирование на Python'\n"
+            "• 'здоровое питание'\n"
+            "• 'фотография и дизайн'\n\n"
+            "💡 **Или просто напишите ключевое слово:** 'путешествия', 'спорт', 'книги'"
+        ),
+        'unknown_command': "❓ **Неизвестная команда.** Используйте меню для выбора действия.",
+        'unknown_decision': "❓ **Неизвестная команда.** Пожалуйста, используйте кнопки для выбора действия.",
+        'busy': "⏳ **Сейчас очень много запросов.** Попробуйте отправить тему еще раз через несколько секунд.",
+        'match_timeout': "⌛ **Поиск занял слишком много времени.** Попробуйте еще раз или выберите тему из популярных.",
+        'rate_limited': "🐢 **Слишком много запросов подряд.** Подождите несколько секунд и попробуйте снова.",
+        'analyzing_menu': "🔍 **Анализирую вашу тему...**\n\nПожалуйста, подождите немного, я ищу подходящие группы для вас.",
+        'analyzing_topic': "🧠 **Анализирую ваш запрос...**\n\nЭто может занять 10-15 секунд. Я ищу самые релевантные группы для вас.",
+        'match_found_menu': (
+            "🎯 **Я нашел подходящую группу для вас!**\n\n"
+            "**Тема:** {chat_name}\n"
+            "**Почему эта группа:** {reason}\n\n"
+            "**Описание:** {description}\n\n"
+            "Хотите присоединиться к группе «{chat_name}»?"
+        ),
+        'match_found_topic': (
+            "🎯 **Отлично! Я нашел идеальную группу для вас!**\n\n"
+            "**Тема:** {chat_name}\n"
+            "**Почему эта группа:** {reason}\n\n"
+            "**Описание:** {description}\n\n"
+            "Хотите присоединиться к группе «{chat_name}»?"
+        ),
+        'not_found': (
+            "🔍 **К сожалению, я не нашел подходящей группы по вашему запросу.**\n\n"
+            "🎯 **Попробуйте выбрать из популярных тем:**"
+        ),
+        'join_refused': (
+            "👋 **Хорошо, вы отказались от присоединения.**\n\n"
+            "💡 **Это абсолютно нормально!** Вы можете найти другую группу или вернуться позже.\n\n"
+            "🎯 **Что дальше?**"
+        ),
+        'back_to_menu': "🏠 **Вы вернулись в главное меню**\n\nВыберите действие:",
+        'chat_not_selected': "❌ **Ошибка: чат не выбран.** Начните поиск заново с главного меню.",
+        'chat_not_found': (
+            "❌ **Ошибка: группа «{chat_name}» не найдена в базе.** "
+            "Пожалуйста, сообщите об этой ошибке в поддержку."
+        ),
+        'join_success': """
+🎉 **Отлично! Вы успешно присоединились к группе «{chat_name}»!**
+
+🔗 **Ваша персональная ссылка:** {invite_link}
+
+🌟 **Что дальше:**
+• Нажмите на ссылку, чтобы войти в чат
+• Представьтесь участникам
+• Начните обсуждение или задайте вопрос
+• Найдите единомышленников для проектов
+
+💡 **Совет:** Активное участие поможет вам быстрее найти друзей и партнеров!
+
+🔄 **Хотите найти еще одну группу по другим интересам?** Нажмите "🔍 Найти группу по интересам" в меню!
+""",
+        'join_error': """
+⚠️ **Не удалось получить ссылку для группы «{chat_name}»**
+
+❌ **Причина:** {error}
+
+🔧 **Что проверить:**
+1. ID группы: `{group_id}`
+2. Бот добавлен в группу как администратор
+3. У бота есть права: `invite users`
+
+🔄 **Выберите другую тему для поиска:**
+""",
+        'popular_topics': "🎯 **Выберите интересующую вас тему из популярных:**",
+        'topic_chosen': (
+            "🎯 **Отличный выбор!**\n\n"
+            "**Тема:** {chat_name}\n"
+            "**Описание:** {description}\n\n"
+            "👥 **Участники уже обсуждают:**\n"
+            "• {keywords}\n\n"
+            "Хотите присоединиться к группе «{chat_name}»?"
+        ),
+        'topic_unavailable': "⚠️ **Группа «{topic_name}» временно недоступна.** Выберите другую тему:",
+        'no_groups': """
+❌ **Вы пока не состоите ни в одной группе**
+
+🎯 **Как найти свою первую группу:**
+1. Нажмите "🔍 Найти группу по интересам" в главном меню
+2. Напишите, чем вы увлекаетесь
+3. Выберите подходящий чат из предложенных
+""",
+        'groups': """
+📋 **Ваши группы**
+
+🌟 **Вы состоите в следующих чатах:**
+{items}
+💬 **Всего групп:** {count}""",
+        'profile': """
+👤 **Ваш профиль**
+
+📝 **Информация:**
+• ID: `{user_id}`
+• Имя: {first_name}
+• Username: @{username}
+• Язык: {language}
+• Активность: {last_active}
+
+👥 **Статистика:**
+• Групп: {group_count}
+
+⚙️ **Настройки:**
+В разработке...
+""",
+        'profile_not_found': """
+👤 **Профиль не найден**
+
+Пожалуйста, начните с команды /start
+""",
+        'username_missing': "не указан",
+        'help': """
+📖 **Справка по боту**
+
+🎯 **Как это работает:**
+1. Вы указываете тему, которая вас интересует
+2. Бот **умно ищет** подходящие чаты по ключевым словам
+3. Если находит - предлагает присоединиться
+4. Если нет - уточняет тему или предлагает похожие варианты
+5. Популярные темы всегда доступны в меню
+
+🧠 **Умный поиск:**
+• Бот понимает **синонимы** (деньги → экономика)
+• Анализирует **контекст** (заработок → бизнес)
+• Ищет **похожие темы** при неточных совпадениях
+• Предлагает **релевантные варианты** даже если точного совпадения нет
+
+💡 **Важно:**
+• Бот добавляет вас только в тематические чаты
+• Ссылки для приглашения одноразовые
+• Вы всегда можете отказаться от присоединения
+
+🆘 **Поддержка:**
+Напишите /support для обращения к администратору
+""",
+        'support': """
+🆘 **Поддержка**
+
+Напишите ваш вопрос или проблему, и я передам сообщение администратору.
+
+⚠️ **Важно:** Это не техническая поддержка Telegram, а поддержка именно этого бота.
+
+✏️ **Введите ваше сообщение ниже:**
+""",
+        'support_cancelled': "❌ **Отправка в поддержку отменена.**\n\nВыберите действие:",
+        'support_sent': (
+            "✅ **Ваше сообщение отправлено администратору!**\n\n"
+            "Мы ответим вам в ближайшее время.\n\n"
+            "Спасибо за обращение!"
+        ),
+        'support_failed': (
+            "❌ **Не удалось отправить сообщение.**\n\n"
+            "Попробуйте позже или свяжитесь с админом напрямую."
+        ),
+        'error': (
+            "❌ **Произошла ошибка при обработке вашего запроса.**\n\n"
+            "Попробуйте еще раз или используйте команду /start"
+        ),
+    },
+    'en': {
+        'welcome': """
+🤖 **Hi, {first_name}!**
+
+🌟 **I'm your personal guide to a world of like-minded people!**
+
+People with shared interests here:
+✅ Build projects together
+✅ Discuss ideas and find solutions
+✅ Grow together and support each other
+✅ Share knowledge and experience
+
+🎯 **What are you interested in today?** Choose an action from the menu below 👇
+""",
+        'goodbye': """
+👋 **Goodbye!**
+
+💡 **Remember:** you can always come back by pressing /start at any time.
+
+🌟 **See you again!**
+""",
+        'ask_topic': (
+            "🎯 **What are you interested in?**\n\n"
+            "Write a topic, for example:\n"
+            "• 'travelling in Asia'\n"
+            "• 'programming in Python'\n"
+            "• 'healthy eating'\n"
+            "• 'photography and design'\n\n"
+            "💡 **Or just write a keyword:** 'travel', 'sport', 'books'"
+        ),
+        'unknown_command': "❓ **Unknown command.** Please use the menu to choose an action.",
+        'unknown_decision': "❓ **Unknown command.** Please use the buttons to choose an action.",
+        'busy': "⏳ **Too many requests right now.** Please send your topic again in a few seconds.",
+        'match_timeout': "⌛ **The search took too long.** Try again or pick one of the popular topics.",
+        'rate_limited': "🐢 **Too many requests in a row.** Wait a few seconds and try again.",
+        'analyzing_menu': "🔍 **Analyzing your topic...**\n\nPlease wait a moment, I'm looking for suitable groups for you.",
+        'analyzing_topic': "🧠 **Analyzing your request...**\n\nThis may take 10-15 seconds. I'm looking for the most relevant groups for you.",
+        'match_found_menu': (
+            "🎯 **I found a suitable group for you!**\n\n"
+            "**Topic:** {chat_name}\n"
+            "**Why this group:** {reason}\n\n"
+            "**Description:** {description}\n\n"
+            "Would you like to join «{chat_name}»?"
+        ),
+        'match_found_topic': (
+            "🎯 **Great! I found the perfect group for you!**\n\n"
+            "**Topic:** {chat_name}\n"
+            "**Why this group:** {reason}\n\n"
+            "**Description:** {description}\n\n"
+            "Would you like to join «{chat_name}»?"
+        ),
+        'not_found': (
+            "🔍 **Sorry, I couldn't find a suitable group for your request.**\n\n"
+            "🎯 **Try choosing one of the popular topics:**"
+        ),
+        'join_refused': (
+            "👋 **Okay, you declined to join.**\n\n"
+            "💡 **That's perfectly fine!** You can find another group or come back later.\n\n"
+            "🎯 **What's next?**"
+        ),
+        'back_to_menu': "🏠 **You are back in the main menu**\n\nChoose an action:",
+        'chat_not_selected': "❌ **Error: no chat selected.** Please start a new search from the main menu.",
+        'chat_not_found': (
+            "❌ **Error: group «{chat_name}» was not found.** "
+            "Please report this error to support."
+        ),
+        'join_success': """
+🎉 **Great! You have joined «{chat_name}»!**
+
+🔗 **Your personal link:** {invite_link}
+
+🌟 **What's next:**
+• Tap the link to enter the chat
+• Introduce yourself to the members
+• Start a discussion or ask a question
+• Find like-minded people for your projects
+
+💡 **Tip:** being active helps you find friends and partners faster!
+
+🔄 **Want to find another group for other interests?** Tap "🔍 Find a group by interests" in the menu!
+""",
+        'join_error': """
+⚠️ **Could not get a link for «{chat_name}»**
+
+❌ **Reason:** {error}
+
+🔧 **What to check:**
+1. Group ID: `{group_id}`
+2. The bot is an administrator of the group
+3. The bot has the `invite users` permission
+
+🔄 **Choose another topic to search:**
+""",
+        'popular_topics': "🎯 **Choose a topic you like from the popular ones:**",
+        'topic_chosen': (
+            "🎯 **Great choice!**\n\n"
+            "**Topic:** {chat_name}\n"
+            "**Description:** {description}\n\n"
+            "👥 **Members are already discussing:**\n"
+            "• {keywords}\n\n"
+            "Would you like to join «{chat_name}»?"
+        ),
+        'topic_unavailable': "⚠️ **Group «{topic_name}» is temporarily unavailable.** Please choose another topic:",
+        'no_groups': """
+❌ **You haven't joined any groups yet**
+
+🎯 **How to find your first group:**
+1. Tap "🔍 Find a group by interests" in the main menu
+2. Write what you are into
+3. Pick a suitable chat from the suggestions
+""",
+        'groups': """
+📋 **Your groups**
+
+🌟 **You are a member of these chats:**
+{items}
+💬 **Total groups:** {count}""",
+        'profile': """
+👤 **Your profile**
+
+📝 **Information:**
+• ID: `{user_id}`
+• Name: {first_name}
+• Username: @{username}
+• Language: {language}
+• Last active: {last_active}
+
+👥 **Statistics:**
+• Groups: {group_count}
+
+⚙️ **Settings:**
+Coming soon...
+""",
+        'profile_not_found': """
+👤 **Profile not found**
+
+Please start with the /start command
+""",
+        'username_missing': "not set",
+        'help': """
+📖 **Bot help**
+
+🎯 **How it works:**
+1. You tell me a topic you are interested in
+2. The bot **smartly searches** for matching chats by keywords
+3. If it finds one, it offers you to join
+4. If not, it asks for details or suggests similar options
+5. Popular topics are always available in the menu
+
+🧠 **Smart search:**
+• The bot understands **synonyms** (money → economy)
+• Analyzes **context** (earnings → business)
+• Looks for **similar topics** when there is no exact match
+• Suggests **relevant options** even without an exact match
+
+💡 **Important:**
+• The bot only adds you to topic chats
+• Invite links are single-use
+• You can always decline to join
+
+🆘 **Support:**
+Send /support to contact the administrator
+""",
+        'support': """
+🆘 **Support**
+
+Write your question or problem and I will forward it to the administrator.
+
+⚠️ **Note:** this is not Telegram support, but support for this bot only.
+
+✏️ **Type your message below:**
+""",
+        'support_cancelled': "❌ **Support request cancelled.**\n\nChoose an action:",
+        'support_sent': (
+            "✅ **Your message has been sent to the administrator!**\n\n"
+            "We will reply as soon as possible.\n\n"
+            "Thank you for reaching out!"
+        ),
+        'support_failed': (
+            "❌ **Could not send the message.**\n\n"
+            "Please try later or contact the administrator directly."
+        ),
+        'error': (
+            "❌ **An error occurred while processing your request.**\n\n"
+            "Try again or use the /start command"
+        ),
+    },
+}
+
+# Причина из поиска -> пояснение для пользователя
+REASONS = {
+    'ru': {
+        "точное совпадение": "идеально подходит под ваш запрос",
+        "совпадение по теме": "совпадает с вашими интересами",
+        "похожая тематика": "похожа на ваш запрос",
+        "ключевой термин": "содержит ключевые слова из вашего запроса",
+        None: "может быть интересна вам",
+    },
+    'en': {
+        "точное совпадение": "perfectly matches your request",
+        "совпадение по теме": "matches your interests",
+        "похожая тематика": "is similar to your request",
+        "ключевой термин": "contains keywords from your request",
+        None: "might interest you",
+    },
+}
+
+
+def language_of(language_code):
+    """Язык интерфейса по коду пользователя (тот же код хранится в users.language)"""
+    language = (language_code or '')[:2]
+    return language if language in LANGUAGES else DEFAULT_LANGUAGE
+
+
+def _keyboard(rows):
+    return ReplyKeyboardMarkup([[KeyboardButton(label) for label in row] for row in rows], resize_keyboard=True)
+
+
+class TemplateSet:
+    """Тексты и клавиатуры одного языка, собранные заранее.
+
+    text - готовые статические тексты, format - связанные str.format для
+    текстов с полями, keyboard - неизменяемые клавиатуры (объекты
+    telegram замораживаются после создания и переиспользуются между
+    ответами).
+    """
+
+    def __init__(self, language, chats):
+        self.language = language
+        labels = BUTTONS[language]
+
+        texts, formats = {}, {}
+        for name, template in TEXTS[language].items():
+            if '{' in template:
+                formats[name] = template.format
+            else:
+                texts[name] = template
+        self.text = MappingProxyType(texts)
+        self.format = MappingProxyType(formats)
+
+        keyboards = {
+            name: _keyboard([[labels[action] for action in row] for row in layout])
+            for name, layout in LAYOUTS.items()
+        }
+        # Темы по 2 в строке
+        topic_rows = [[f"{chat.emoji} {chat.name}" for chat in chats[i:i + 2]] for i in range(0, len(chats), 2)]
+        keyboards['popular_topics'] = _keyboard(topic_rows + [[labels[action] for action in TOPICS_FOOTER]])
+        keyboards['remove'] = ReplyKeyboardRemove()
+        self.keyboard = MappingProxyType(keyboards)
+
+        self._reasons = REASONS[language]
+
+    def reason(self, reason):
+        """Пояснение причины выбора без технических деталей"""
+        if reason and reason.startswith("ключевой термин"):
+            reason = "ключевой термин"
+        return self._reasons.get(reason, self._reasons[None])
+
+
+class TemplateRegistry:
+    """Готовые ответы бота по языкам.
+
+    Собирается один раз и пересобирается только при смене каталога тем
+    (подписка на ChatRegistry): от каталога зависит клавиатура популярных
+    тем. Набор заменяется целиком, поэтому обработчики видят либо старый,
+    либо новый. Подписи кнопок всех языков сводятся к действиям: action()
+    - O(1) поиск по словарю вместо цепочки сравнений строк.
+    """
+
+    def __init__(self, chats=()):
+        self._sets = {}
+        self._topics = {}
+        self._actions = {
+            label: action for labels in BUTTONS.values() for action, label in labels.items()
+        }
+        self.rebuild(chats)
+
+    def rebuild(self, chats):
+        chats = list(chats)
+        self._sets = {language: TemplateSet(language, chats) for language in LANGUAGES}
+        # Кнопка темы -> название темы
+        self._topics = {f"{chat.emoji} {chat.name}": chat.name for chat in chats}
+
+    def get(self, language_code):
+        """Набор для кода языка пользователя"""
+        return self._sets[language_of(language_code)]
+
+    def for_user(self, user):
+        return self.get(user.language_code if user else None)
+
+    def action(self, text):
+        """Действие кнопки по ее подписи на любом языке; None - не кнопка"""
+        return self._actions.get(text)
+
+    def topic(self, text):
+        """Название темы по подписи кнопки популярной темы; None - не кнопка темы"""
+        return self._topics.get(text)
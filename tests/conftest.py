@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# Модули бота лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+from database import Database  # noqa: E402
+
+
+class FakeClock:
+    """Часы для тестов с лимитами и TTL: время двигается вручную"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Временная база с актуальной схемой"""
+    database = Database(str(tmp_path / 'bot.db'))
+    database.call(migrations.migrate)
+    yield database
+    database.close()
@@ -0,0 +1,46 @@
+import database
+from chat_registry import ChatRegistry
+
+TOPICS = {
+    'Спорт': {'keywords': ['футбол'], 'description': 'Спорт и фитнес', 'emoji': '⚽'},
+    'Музыка': {'keywords': ['гитара'], 'description': 'Музыка', 'emoji': '🎵'},
+}
+
+
+def seeded_registry(db):
+    db.call(database.seed_chats, {'Спорт': '-1001', 'Музыка': '-1002'}, TOPICS)
+    registry = ChatRegistry(db)
+    registry.load()
+    return registry
+
+
+def test_catalog_is_loaded_from_database(db):
+    registry = seeded_registry(db)
+
+    chat = registry.get('Спорт')
+    assert (chat.group_id, chat.keywords, chat.description, chat.emoji) == ('-1001', ('футбол',), 'Спорт и фитнес', '⚽')
+    assert registry.names() == ['Спорт', 'Музыка']
+    assert registry.get('Путешествие и туризм') is None
+
+
+def test_deactivated_topic_disappears_on_reload(db):
+    registry = seeded_registry(db)
+    seen = []
+    registry.subscribe(lambda reloaded: seen.append(reloaded.names()))
+    fingerprint = registry.fingerprint
+
+    db.call(lambda conn: conn.execute("UPDATE chats SET is_active = 0 WHERE chat_name = 'Спорт'"))
+    registry.load()
+
+    assert 'Спорт' not in registry
+    assert registry.get('Спорт') is None
+    assert seen == [['Музыка']]
+    assert registry.fingerprint != fingerprint
+
+
+def test_fingerprint_is_stable_between_processes(db):
+    first = seeded_registry(db)
+    second = ChatRegistry(db)
+    second.load()
+
+    assert first.fingerprint == second.fingerprint
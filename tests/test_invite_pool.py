@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import database
+from invite_pool import InvitePool
+
+
+def store_links(db, group_id, *links, shard=0):
+    expire_at = int(time.time()) + 86400
+    for invite_link in links:
+        db.call(database.store_invite_link, invite_link, group_id, expire_at, int(time.time()), shard)
+
+
+def link_rows(db):
+    return db.call(lambda conn: conn.execute(
+        'SELECT invite_link, status, issued_to FROM invite_links ORDER BY invite_link'
+    ).fetchall())
+
+
+def test_link_is_marked_issued_before_it_is_returned(db):
+    store_links(db, 'g1', 'L1')
+    pool = InvitePool(None, db, ['g1'])
+    pool.load()
+
+    assert asyncio.run(pool.issue('g1', 42)) == 'L1'
+    assert link_rows(db) == [('L1', 'issued', 42)]
+
+    # После рестарта выданная ссылка не возвращается в пул
+    restarted = InvitePool(None, db, ['g1'])
+    restarted.load()
+    assert asyncio.run(restarted.issue('g1', 43)) is None
+
+
+def test_link_claimed_elsewhere_is_skipped(db):
+    store_links(db, 'g1', 'L1', 'L2')
+    pool = InvitePool(None, db, ['g1'])
+    pool.load()
+    db.call(database.mark_invite_issued, 'L1', 7, 0)
+
+    async def scenario():
+        return await pool.issue('g1', 42), await pool.issue('g1', 43)
+
+    assert asyncio.run(scenario()) == ('L2', None)
+    assert pool.conflicts == 1
+    assert link_rows(db) == [('L1', 'issued', 7), ('L2', 'issued', 42)]
+
+
+def test_failed_claim_does_not_hand_out_link(db):
+    store_links(db, 'g1', 'L1')
+    pool = InvitePool(None, db, ['g1'])
+    pool.load()
+    db.call(lambda conn: conn.execute('DROP TABLE invite_links'))
+
+    assert asyncio.run(pool.issue('g1', 42)) is None
+
+
+def test_each_shard_loads_only_its_links(db):
+    store_links(db, 'g1', 'L0', shard=0)
+    store_links(db, 'g1', 'L1', shard=1)
+    pool = InvitePool(None, db, ['g1'], shard=1)
+    pool.load()
+
+    assert asyncio.run(pool.issue('g1', 42)) == 'L1'
+
+
+def test_garbage_collection_stays_within_shard(db):
+    store_links(db, 'g1', 'A-issued', shard=0)
+    store_links(db, 'g2', 'A-ready', shard=0)
+    store_links(db, 'g2', 'B-ready', shard=1)
+    db.call(database.mark_invite_issued, 'A-issued', 7, 0)
+    # Каталог воркера 1 еще не знает о группе g2
+    stale_worker = InvitePool(None, db, ['g1'], shard=1)
+
+    assert stale_worker.collect_garbage() == [('g2', 'B-ready')]
+    assert link_rows(db) == [('A-issued', 'issued', 7), ('A-ready', 'ready', None), ('B-ready', 'revoked', None)]
+
+    worker = InvitePool(None, db, ['g1', 'g2'], shard=0)
+    assert worker.collect_garbage() == []
+    assert link_rows(db) == [('A-ready', 'ready', None), ('B-ready', 'revoked', None)]
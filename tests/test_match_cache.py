@@ -0,0 +1,96 @@
+import asyncio
+
+import database
+from match_cache import MatchCache, catalog_version, normalize_query
+
+RESULT = ('Спорт', 0.8, 'tfidf')
+
+
+def test_normalized_queries_share_a_key():
+    assert normalize_query('  Люблю   ФУТБОЛ\n') == normalize_query('люблю футбол') == 'люблю футбол'
+
+
+def test_local_hit_until_version_changes(db):
+    async def scenario():
+        cache = MatchCache(db)
+        cache.set_version(catalog_version('a'))
+        cache.put('футбол', RESULT, cache.version)
+        hit = await cache.get('футбол')
+
+        cache.set_version(catalog_version('b'))
+        miss = await cache.get('футбол')
+        return hit, miss, cache.stats()
+
+    hit, miss, stats = asyncio.run(scenario())
+    assert hit == RESULT
+    assert miss is None
+    assert (stats['local_hits'], stats['misses'], stats['size']) == (1, 1, 0)
+
+
+def test_result_of_previous_version_is_not_stored(db):
+    async def scenario():
+        cache = MatchCache(db)
+        cache.set_version(catalog_version('a'))
+        version = cache.version
+        # Каталог поменялся, пока шел поиск
+        cache.set_version(catalog_version('b'))
+        cache.put('футбол', RESULT, version)
+        return await cache.get('футбол')
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_shared_rows_are_read_only_for_their_version(db):
+    async def scenario():
+        writer = MatchCache(db)
+        writer.set_version(catalog_version('a'))
+        writer.put('футбол', RESULT, writer.version)
+        await writer.writer.flush()
+
+        reader = MatchCache(db)
+        reader.set_version(catalog_version('a'))
+        shared = await reader.get('футбол')
+        reader.set_version(catalog_version('b'))
+        stale = await reader.get('футбол')
+        return shared, stale, reader.stats()
+
+    shared, stale, stats = asyncio.run(scenario())
+    assert shared == RESULT
+    assert stale is None
+    assert (stats['shared_hits'], stats['misses']) == (1, 1)
+
+
+def test_no_caching_without_version_or_for_skipped_reasons(db):
+    async def scenario():
+        cache = MatchCache(db, skip_reasons=('error',))
+        cache.put('футбол', RESULT, None)
+        before = await cache.get('футбол')
+
+        cache.set_version(catalog_version('a'))
+        cache.put('шахматы', ('Спорт', 0.0, 'error'), cache.version)
+        return before, await cache.get('шахматы')
+
+    assert asyncio.run(scenario()) == (None, None)
+
+
+def test_warm_recomputes_popular_queries_for_new_version(db):
+    old, new = catalog_version('a'), catalog_version('b')
+    db.call(database.store_cached_matches, [
+        (old, 'футбол', 'Спорт', 0.5, 'tfidf', 10),
+        (old, 'гитара', 'Спорт', 0.1, 'tfidf', 1),
+    ])
+
+    cache = MatchCache(db, max_rows=1)
+    cache.set_version(new)
+    calls = []
+
+    def match_many(queries):
+        calls.append(queries)
+        return [('Музыка' if query == 'гитара' else 'Спорт', 0.9, 'tfidf') for query in queries]
+
+    assert cache.warm(match_many) == 2
+    assert calls == [['футбол', 'гитара']]
+    # Записи старой версии удалены, из новой осталась самая частая
+    assert db.call(database.get_cached_match, old, 'футбол') is None
+    assert db.call(database.get_cached_match, new, 'футбол') == ('Спорт', 0.9, 'tfidf')
+    assert db.call(database.get_cached_match, new, 'гитара') is None
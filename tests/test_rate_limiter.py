@@ -0,0 +1,66 @@
+from rate_limiter import RateLimiter
+
+
+def test_burst_then_refill(clock):
+    limiter = RateLimiter(rate=0.5, burst=3, global_rate=100.0, global_burst=100, clock=clock)
+
+    assert [limiter.acquire(1) for _ in range(4)] == [None, None, None, 'user']
+    # 0.5 токена в секунду: через секунду еще пусто, через две - один токен
+    clock.advance(1.0)
+    assert limiter.acquire(1) == 'user'
+    clock.advance(1.0)
+    assert limiter.acquire(1) is None
+    assert limiter.acquire(1) == 'user'
+
+
+def test_refill_is_capped_at_burst(clock):
+    limiter = RateLimiter(rate=1.0, burst=2, global_rate=100.0, global_burst=100, clock=clock)
+    limiter.acquire(1)
+
+    clock.advance(60.0)
+    assert [limiter.acquire(1) for _ in range(3)] == [None, None, 'user']
+
+
+def test_global_bucket_limits_all_users(clock):
+    limiter = RateLimiter(rate=1.0, burst=5, global_rate=1.0, global_burst=2, clock=clock)
+
+    assert [limiter.acquire(user_id) for user_id in (1, 2, 3)] == [None, None, 'global']
+    clock.advance(1.0)
+    assert limiter.acquire(3) is None
+    assert limiter.stats()['limited_global'] == 1
+
+
+def test_idle_buckets_are_evicted(clock):
+    limiter = RateLimiter(rate=0.1, burst=1, idle_ttl=60.0, clock=clock)
+    limiter.acquire(1)
+    clock.advance(30.0)
+    limiter.acquire(2)
+
+    clock.advance(31.0)
+    limiter.acquire(3)
+    # Ведро 1 молчало 61 секунду, ведро 2 - только 31
+    assert list(limiter._buckets) == [2, 3]
+    assert limiter.stats()['evicted'] == 1
+    # Вытесненный пользователь получает новое полное ведро
+    assert limiter.acquire(1) is None
+
+
+def test_max_users_evicts_least_recent(clock):
+    limiter = RateLimiter(max_users=2, clock=clock)
+    for user_id in (1, 2):
+        limiter.acquire(user_id)
+    limiter.acquire(1)
+
+    limiter.acquire(3)
+    assert list(limiter._buckets) == [1, 3]
+
+
+def test_notice_is_rate_limited(clock):
+    limiter = RateLimiter(rate=0.0, burst=1, notice_interval=10.0, clock=clock)
+    limiter.acquire(1)
+    limiter.acquire(1)
+
+    assert limiter.should_notice(1)
+    assert not limiter.should_notice(1)
+    clock.advance(10.0)
+    assert limiter.should_notice(1)
@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+from sharding import ShardListener, ShardRouter, shard_of, shard_socket_path, update_user_id
+
+
+class FakeApplication:
+    """Очередь обновлений без обработки: ShardListener только кладет в нее"""
+
+    def __init__(self):
+        self.update_queue = asyncio.Queue()
+        self.bot = None
+        self.update_processor = None
+
+
+def update_body(update_id, user_id, text='привет'):
+    return json.dumps({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'test'},
+            'text': text,
+        },
+    }, ensure_ascii=False).encode('utf-8')
+
+
+async def received(application, count, timeout=5.0):
+    updates = []
+    for _ in range(count):
+        updates.append(await asyncio.wait_for(application.update_queue.get(), timeout))
+    return updates
+
+
+def test_update_user_id_from_raw_json():
+    assert update_user_id(json.loads(update_body(1, 42))) == 42
+    assert update_user_id({'update_id': 1, 'channel_post': {'chat': {'id': -100}}}) == -100
+    assert update_user_id({'update_id': 1}) == 0
+    assert shard_of(42, 4) == shard_of(46, 4) == 2
+
+
+def test_frames_round_trip_in_order_per_user(tmp_path):
+    async def scenario():
+        paths = [shard_socket_path(str(tmp_path), index) for index in range(2)]
+        applications = [FakeApplication(), FakeApplication()]
+        listeners = [ShardListener(app, path) for app, path in zip(applications, paths)]
+        for listener in listeners:
+            await listener.start()
+        router = ShardRouter(paths, reconnect_delay=0.01)
+        router.start()
+
+        # Тело больше буфера сокета приходит одним кадром
+        bodies = [update_body(1, 10), update_body(2, 11, 'ы' * 100000), update_body(3, 10), update_body(4, 11)]
+        for body in bodies:
+            assert router.route(update_user_id(json.loads(body)), body)
+
+        try:
+            return [await received(app, 2) for app in applications], router.stats()
+        finally:
+            await router.stop()
+            for listener in listeners:
+                await listener.stop()
+
+    (even, odd), stats = asyncio.run(scenario())
+    assert [(u.update_id, u.effective_user.id) for u in even] == [(1, 10), (3, 10)]
+    assert [(u.update_id, u.effective_user.id) for u in odd] == [(2, 11), (4, 11)]
+    assert odd[0].message.text == 'ы' * 100000
+    assert stats['routed'] == 4
+
+
+def test_updates_wait_for_worker_to_start(tmp_path):
+    async def scenario():
+        path = shard_socket_path(str(tmp_path), 0)
+        router = ShardRouter([path], reconnect_delay=0.01)
+        router.start()
+        assert router.route(10, update_body(1, 10))
+        await asyncio.sleep(0.05)
+
+        application = FakeApplication()
+        listener = ShardListener(application, path)
+        await listener.start()
+        try:
+            return await received(application, 1)
+        finally:
+            await router.stop()
+            await listener.stop()
+
+    assert [update.update_id for update in asyncio.run(scenario())] == [1]
+
+
+def test_full_queue_is_rejected():
+    router = ShardRouter(['/nonexistent.sock'], queue_size=1)
+
+    assert router.route(1, b'{}')
+    assert not router.route(1, b'{}')
+    assert router.stats()['rejected'] == 1
+
+
+def test_bad_frame_is_skipped(tmp_path):
+    async def scenario():
+        path = shard_socket_path(str(tmp_path), 0)
+        application = FakeApplication()
+        listener = ShardListener(application, path)
+        await listener.start()
+        router = ShardRouter([path], reconnect_delay=0.01)
+        router.start()
+        router.route(10, b'not json')
+        router.route(10, update_body(2, 10))
+        try:
+            return await received(application, 1), listener.stats()
+        finally:
+            await router.stop()
+            await listener.stop()
+
+    updates, stats = asyncio.run(scenario())
+    assert [update.update_id for update in updates] == [2]
+    assert stats['bad_requests'] == 1
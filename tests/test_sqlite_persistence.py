@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import database
+from sqlite_persistence import SQLitePersistence
+
+
+class FakeApplication:
+    """Только то, что нужно persistence для выгрузки: drop_user_data"""
+
+    def __init__(self):
+        self.dropped = []
+
+    def drop_user_data(self, user_id):
+        self.dropped.append(user_id)
+
+
+def make_persistence(db, **kwargs):
+    persistence = SQLitePersistence(db, update_interval=0.001, **kwargs)
+    application = FakeApplication()
+    persistence.bind(application)
+    return persistence, application
+
+
+def test_evicted_user_data_is_reloaded_from_database(db):
+    async def scenario():
+        persistence, application = make_persistence(db, idle_ttl=0.0)
+        user_data = {}
+        await persistence.refresh_user_data(1, user_data)
+        user_data['language'] = 'en'
+        await persistence.update_user_data(1, user_data)
+        await persistence.flush()
+
+        await asyncio.sleep(0.01)
+        persistence._evict_idle()
+        assert application.dropped == [1]
+        # PTB сообщает о выгрузке как об удалении - запись в базе остается
+        await persistence.drop_user_data(1)
+        await persistence.flush()
+        assert json.loads(db.call(database.load_user_state, 1)) == {'language': 'en'}
+
+        reloaded = {}
+        await persistence.refresh_user_data(1, reloaded)
+        return reloaded, persistence.stats()
+
+    reloaded, stats = asyncio.run(scenario())
+    assert reloaded == {'language': 'en'}
+    assert stats['evictions'] == 1
+    assert stats['loaded'] == 1
+    assert stats['resident_users'] == 1
+
+
+def test_real_drop_deletes_user_data(db):
+    async def scenario():
+        persistence, _ = make_persistence(db)
+        await persistence.refresh_user_data(1, {})
+        await persistence.update_user_data(1, {'language': 'en'})
+        await persistence.flush()
+
+        await persistence.drop_user_data(1)
+        await persistence.flush()
+
+    asyncio.run(scenario())
+    assert db.call(database.load_user_state, 1) is None
+
+
+def test_unsaved_changes_block_eviction(db):
+    async def scenario():
+        persistence, application = make_persistence(db, idle_ttl=0.0)
+        await persistence.refresh_user_data(1, {})
+        persistence._pending_users[1] = json.dumps({'language': 'en'})
+
+        await asyncio.sleep(0.01)
+        persistence._evict_idle()
+        return application.dropped, persistence.stats()
+
+    dropped, stats = asyncio.run(scenario())
+    assert dropped == []
+    assert stats['resident_users'] == 1
+
+
+def test_max_users_evicts_longest_idle(db):
+    async def scenario():
+        persistence, application = make_persistence(db, max_users=2)
+        for user_id in (1, 2, 3):
+            await persistence.refresh_user_data(user_id, {})
+            await asyncio.sleep(0.005)
+        persistence._evict_idle()
+        return application.dropped
+
+    assert asyncio.run(scenario()) == [1]
+
+
+def test_pending_version_wins_over_database(db):
+    async def scenario():
+        persistence, _ = make_persistence(db)
+        persistence._pending_users[1] = json.dumps({'language': 'ru'})
+        db.call(database.save_persistence, [], [(1, json.dumps({'language': 'en'}))])
+
+        user_data = {}
+        await persistence.refresh_user_data(1, user_data)
+        return user_data
+
+    assert asyncio.run(scenario()) == {'language': 'ru'}
+
+
+def test_conversations_are_filtered_by_shard(db):
+    db.call(database.save_persistence, [
+        ('main', json.dumps([10, 10]), 1),
+        ('main', json.dumps([11, 11]), 2),
+    ], [])
+
+    async def scenario():
+        persistence, _ = make_persistence(db, shard=(1, 2))
+        return await persistence.get_conversations('main')
+
+    assert asyncio.run(scenario()) == {(11, 11): 2}
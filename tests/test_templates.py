@@ -0,0 +1,59 @@
+import pytest
+from telegram import User
+
+from chat_registry import ChatInfo
+from templates import BUTTONS, LANGUAGES, TemplateRegistry, language_of
+
+CHATS = [
+    ChatInfo(1, 'Спорт', '-1001', ('футбол',), 'Спорт', '⚽'),
+    ChatInfo(2, 'Музыка', '-1002', ('гитара',), 'Музыка', '🎵'),
+]
+
+
+def test_every_language_has_the_same_actions():
+    actions = set(BUTTONS['ru'])
+    assert all(set(BUTTONS[language]) == actions for language in LANGUAGES)
+
+
+@pytest.mark.parametrize('language', LANGUAGES)
+def test_button_labels_map_to_actions_in_any_language(language):
+    registry = TemplateRegistry(CHATS)
+
+    for action, label in BUTTONS[language].items():
+        assert registry.action(label) == action
+
+
+def test_free_text_is_not_an_action():
+    registry = TemplateRegistry(CHATS)
+
+    assert registry.action('люблю футбол') is None
+    assert registry.action('⚽ Спорт') is None
+    assert registry.topic('⚽ Спорт') == 'Спорт'
+
+
+@pytest.mark.parametrize('language_code, language', [
+    ('en', 'en'), ('en-US', 'en'), ('ru', 'ru'), ('de', 'ru'), (None, 'ru'),
+])
+def test_language_of_user_code(language_code, language):
+    registry = TemplateRegistry(CHATS)
+    user = User(1, 'test', False, language_code=language_code)
+
+    assert language_of(language_code) == language
+    assert registry.for_user(user).language == language
+
+
+def test_keyboards_use_labels_of_their_language():
+    registry = TemplateRegistry(CHATS)
+
+    for language in LANGUAGES:
+        rows = registry.get(language).keyboard['main_menu'].keyboard
+        assert rows[0][0].text == BUTTONS[language]['find']
+
+
+def test_rebuild_replaces_topic_buttons():
+    registry = TemplateRegistry(CHATS)
+    registry.rebuild(CHATS[1:])
+
+    assert registry.topic('⚽ Спорт') is None
+    rows = registry.get('ru').keyboard['popular_topics'].keyboard
+    assert [button.text for button in rows[0]] == ['🎵 Музыка']
@@ -0,0 +1,27 @@
+from topic_ranker import TopicRanker
+
+NAMES = ['Спорт', 'Фитнес', 'Музыка', 'Танцы']
+TEXTS = ['футбол мяч', 'футбол мяч', 'гитара концерт', 'гитара концерт танец']
+
+
+def test_ties_at_top_k_boundary_follow_topic_order():
+    ranker = TopicRanker.fit(NAMES, TEXTS, ngram_range=(1, 1))
+
+    assert [name for name, _ in ranker.top('футбол', k=1)] == ['Спорт']
+    assert [name for name, _ in ranker.top('футбол', k=2)] == ['Спорт', 'Фитнес']
+
+
+def test_results_are_sorted_by_score():
+    ranker = TopicRanker.fit(NAMES, TEXTS, ngram_range=(1, 1))
+
+    ranked = ranker.top('гитара концерт', k=3)
+    assert [name for name, _ in ranked] == ['Музыка', 'Танцы']
+    assert ranked[0][1] > ranked[1][1]
+
+
+def test_batch_matches_single_queries():
+    ranker = TopicRanker.fit(NAMES, TEXTS, ngram_range=(1, 1))
+    queries = ['футбол', 'танец', 'шахматы']
+
+    assert ranker.rank(queries, k=2) == [ranker.top(query, k=2) for query in queries]
+    assert ranker.top('шахматы') == []
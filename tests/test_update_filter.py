@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop
+
+from update_filter import UpdateFilter
+
+
+def text_update(update_id, text='привет'):
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': 1, 'type': 'private'},
+            'from': {'id': 1, 'is_bot': False, 'first_name': 'test'},
+            'text': text,
+        },
+    }, None)
+
+
+def passes(update_filter, update):
+    try:
+        asyncio.run(update_filter.check(update, None))
+    except ApplicationHandlerStop:
+        return False
+    return True
+
+
+def test_repeated_update_id_is_dropped():
+    update_filter = UpdateFilter(dedupe_window=4)
+
+    assert passes(update_filter, text_update(1))
+    assert not passes(update_filter, text_update(1))
+    assert update_filter.stats() == {'passed': 1, 'dropped': 1, 'dropped_duplicate': 1}
+
+
+def test_update_id_is_forgotten_after_window():
+    update_filter = UpdateFilter(dedupe_window=3)
+    for update_id in (1, 2, 3):
+        assert passes(update_filter, text_update(update_id))
+
+    # Четвертый id вытесняет первый, второй и третий еще в окне
+    assert passes(update_filter, text_update(4))
+    assert not passes(update_filter, text_update(3))
+    assert passes(update_filter, text_update(1))
+    assert len(update_filter._recent_ids) == len(update_filter._recent_order) == 3
+
+
+@pytest.mark.parametrize('payload, reason', [
+    ({'edited_message': {'message_id': 1, 'date': 0, 'edit_date': 0,
+                         'chat': {'id': 1, 'type': 'private'}, 'text': 'x'}}, 'dropped_not_message'),
+    ({'message': {'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'},
+                  'sticker': None, 'new_chat_members': []}}, 'dropped_no_text'),
+])
+def test_noise_is_dropped_before_dispatch(payload, reason):
+    update_filter = UpdateFilter()
+
+    assert not passes(update_filter, Update.de_json({'update_id': 1, **payload}, None))
+    assert update_filter.stats()[reason] == 1
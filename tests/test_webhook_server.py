@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+
+from metrics import Metrics
+from webhook_server import WebhookServer
+
+SECRET = 'secret'
+TOKEN = 'metrics-token'
+
+
+class FakeApplication:
+    def __init__(self):
+        self.update_queue = asyncio.Queue(maxsize=10)
+        self.bot = None
+        self.update_processor = None
+
+
+async def request(port, method, path, headers=(), body=b''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    lines = [f'{method} {path} HTTP/1.1', f'Content-Length: {len(body)}', 'Connection: close', *headers]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+def serve(scenario, **kwargs):
+    async def run():
+        application = FakeApplication()
+        metrics = Metrics()
+        metrics.counter('bot_test_total', 'Тестовый счетчик', 'label')
+        server = WebhookServer(
+            application, secret_token=SECRET, host='127.0.0.1', port=0, reuse_port=False,
+            metrics=metrics, **kwargs
+        )
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        try:
+            return await scenario(port), server
+        finally:
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+UPDATE = json.dumps({'update_id': 1}).encode('utf-8')
+
+
+def test_secret_token_is_required():
+    with pytest.raises(ValueError):
+        WebhookServer(FakeApplication(), secret_token='')
+
+
+def test_update_without_valid_secret_is_forbidden():
+    async def scenario(port):
+        return [
+            await request(port, 'POST', '/telegram', body=UPDATE),
+            await request(port, 'POST', '/telegram', ['X-Telegram-Bot-Api-Secret-Token: wrong'], UPDATE),
+            await request(port, 'POST', '/telegram', [f'X-Telegram-Bot-Api-Secret-Token: {SECRET}'], UPDATE),
+        ]
+
+    statuses, server = serve(scenario)
+    assert statuses == [403, 403, 200]
+    assert server.stats()['accepted'] == 1
+
+
+def test_metrics_require_bearer_token():
+    async def scenario(port):
+        return [
+            await request(port, 'GET', '/metrics'),
+            await request(port, 'GET', '/metrics', ['Authorization: Bearer wrong']),
+            await request(port, 'GET', '/metrics', [f'Authorization: Bearer {TOKEN}']),
+        ]
+
+    statuses, server = serve(scenario, metrics_token=TOKEN)
+    assert statuses == [403, 403, 200]
+    assert server.forbidden == 2
+
+
+def test_metrics_are_not_served_without_token():
+    async def scenario(port):
+        return await request(port, 'GET', '/metrics')
+
+    status, _ = serve(scenario)
+    assert status == 404
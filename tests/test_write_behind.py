@@ -0,0 +1,188 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import database
+from database import MemberCounter, UserUpsertBuffer
+from match_cache import MatchCacheWriter
+
+TOPICS = {
+    'Спорт': {'keywords': ['футбол'], 'description': 'Спорт', 'emoji': '⚽'},
+    'Музыка': {'keywords': ['гитара'], 'description': 'Музыка', 'emoji': '🎵'},
+}
+
+
+@pytest.fixture
+def chat_ids(db):
+    db.call(database.seed_chats, {'Спорт': '-1001', 'Музыка': '-1002'}, TOPICS)
+    return {name: chat_id for chat_id, name, *_ in db.call(database.load_chats)}
+
+
+def member_counts(db):
+    return dict(db.call(lambda conn: conn.execute('SELECT chat_name, member_count FROM chats').fetchall()))
+
+
+def test_increments_collapse_into_one_row_per_chat(db, chat_ids):
+    async def scenario():
+        counter = MemberCounter(db)
+        for _ in range(3):
+            counter.increment(chat_ids['Спорт'])
+        counter.increment(chat_ids['Музыка'])
+        assert member_counts(db) == {'Спорт': 0, 'Музыка': 0}
+
+        await counter.flush()
+        return counter.stats()
+
+    stats = asyncio.run(scenario())
+    assert member_counts(db) == {'Спорт': 3, 'Музыка': 1}
+    assert stats == {'pending': 0, 'added': 4, 'written': 2, 'flushes': 1, 'failed': 0}
+
+
+def test_flush_adds_to_stored_counts(db, chat_ids):
+    counter = MemberCounter(db)
+    counter.increment(chat_ids['Спорт'])
+    counter.flush_sync()
+    counter.increment(chat_ids['Спорт'])
+    counter.flush_sync()
+
+    assert member_counts(db)['Спорт'] == 2
+
+
+def test_discard_drops_pending_deltas_before_reconcile(db, chat_ids):
+    # Вступление уже записано в user_chats, приращение еще в памяти
+    db.call(database.add_user_chat, 1, chat_ids['Спорт'])
+    counter = MemberCounter(db)
+    counter.increment(chat_ids['Спорт'])
+
+    counter.discard()
+    assert db.call(database.reconcile_member_counts) == 1
+    counter.flush_sync()
+
+    assert member_counts(db)['Спорт'] == 1
+    assert counter.stats()['written'] == 0
+
+
+def test_full_buffer_wakes_background_flush(db, chat_ids):
+    async def scenario():
+        counter = MemberCounter(db, max_pending=2, flush_interval=60.0)
+        counter.start()
+        counter.increment(chat_ids['Спорт'])
+        counter.increment(chat_ids['Музыка'])
+        for _ in range(100):
+            if counter.stats()['flushes']:
+                break
+            await asyncio.sleep(0.01)
+        await counter.stop()
+        return counter.stats()
+
+    assert asyncio.run(scenario())['flushes'] == 1
+    assert member_counts(db) == {'Спорт': 1, 'Музыка': 1}
+
+
+def test_stop_writes_what_is_left(db, chat_ids):
+    async def scenario():
+        counter = MemberCounter(db, flush_interval=60.0)
+        counter.start()
+        counter.increment(chat_ids['Музыка'])
+        await counter.stop()
+
+    asyncio.run(scenario())
+    assert member_counts(db)['Музыка'] == 1
+
+
+def test_user_upserts_keep_latest_row(db):
+    buffer = UserUpsertBuffer(db)
+    buffer.add(1, 'old', 'Имя', 'ru')
+    buffer.add(1, 'new', 'Имя', 'en')
+    assert buffer.is_pending(1)
+
+    buffer.flush_sync()
+    assert not buffer.is_pending(1)
+    assert db.call(database.get_user_profile, 1)[:3] == ('new', 'Имя', 'en')
+    assert buffer.stats()['written'] == 1
+
+
+@pytest.fixture
+def busy_once(monkeypatch):
+    """Первая запись в базу падает, как при SQLITE_BUSY от другого воркера"""
+    def install(name, before_failure=None):
+        original = getattr(database, name)
+        calls = []
+
+        def write(conn, rows):
+            calls.append(rows)
+            if len(calls) == 1:
+                if before_failure is not None:
+                    before_failure()
+                raise sqlite3.OperationalError('database is locked')
+            return original(conn, rows)
+
+        monkeypatch.setattr(database, name, write)
+        return calls
+
+    return install
+
+
+def test_failed_write_keeps_deltas_for_next_flush(db, chat_ids, busy_once):
+    busy_once('add_member_counts')
+    counter = MemberCounter(db)
+    counter.increment(chat_ids['Спорт'])
+    counter.increment(chat_ids['Спорт'])
+
+    with pytest.raises(sqlite3.OperationalError):
+        asyncio.run(counter.flush())
+    assert counter.stats() == {'pending': 1, 'added': 2, 'written': 0, 'flushes': 0, 'failed': 1}
+
+    # Приращение, пришедшее после неудачи, складывается с возвращенными
+    counter.increment(chat_ids['Спорт'])
+    counter.flush_sync()
+    assert member_counts(db)['Спорт'] == 3
+    assert counter.stats()['written'] == 1
+
+
+def test_failed_sync_write_is_retried(db, chat_ids, busy_once):
+    busy_once('add_member_counts')
+    counter = MemberCounter(db)
+    counter.increment(chat_ids['Музыка'])
+
+    with pytest.raises(sqlite3.OperationalError):
+        counter.flush_sync()
+    counter.flush_sync()
+    assert member_counts(db)['Музыка'] == 1
+
+
+def test_discard_during_failed_write_is_not_undone(db, chat_ids, busy_once):
+    counter = MemberCounter(db)
+    busy_once('add_member_counts', before_failure=counter.discard)
+    counter.increment(chat_ids['Спорт'])
+
+    with pytest.raises(sqlite3.OperationalError):
+        counter.flush_sync()
+    assert counter.stats()['pending'] == 0
+
+
+def test_newer_user_row_wins_over_failed_one(db, busy_once):
+    busy_once('upsert_users')
+    buffer = UserUpsertBuffer(db)
+    buffer.add(1, 'old', 'Имя', 'ru')
+
+    with pytest.raises(sqlite3.OperationalError):
+        buffer.flush_sync()
+    buffer.add(1, 'new', 'Имя', 'en')
+    buffer.flush_sync()
+
+    assert db.call(database.get_user_profile, 1)[:3] == ('new', 'Имя', 'en')
+
+
+def test_failed_cache_write_keeps_hits(db, busy_once):
+    calls = busy_once('store_cached_matches')
+    writer = MatchCacheWriter(db)
+    writer.add('v1', 'футбол', ('Спорт', 0.5, 'tfidf'), hits=2)
+
+    with pytest.raises(sqlite3.OperationalError):
+        writer.flush_sync()
+    writer.add('v1', 'футбол', ('Спорт', 0.5, 'tfidf'))
+    writer.flush_sync()
+
+    assert calls[-1] == [('v1', 'футбол', 'Спорт', 0.5, 'tfidf', 3)]
@@ -0,0 +1,134 @@
+import re
+from functools import lru_cache
+
+# Регулярные выражения компилируются один раз при импорте
+_DIGITS_RE = re.compile(r'\d+')
+# После удаления цифр токен - непрерывная последовательность букв и "_";
+# для коротких запросов этого достаточно, Punkt здесь избыточен
+_WORD_RE = re.compile(r'\w+')
+_CYRILLIC_RE = re.compile(r'[а-яё]')
+_LATIN_RE = re.compile(r'[a-z]')
+# Языки на кириллице, которые langdetect путает с русским на коротких текстах
+_CYRILLIC_LANGUAGES = {'ru', 'uk', 'bg', 'mk', 'be', 'sr', 'kk'}
+
+
+def language_key(language):
+    """Ключ языка для стоп-слов и стеммера: все, кроме русского, - английский"""
+    return 'ru' if language and language.startswith('ru') else 'en'
+
+
+def tokenize(text):
+    """Легковесная токенизация: нижний регистр, без цифр и пунктуации"""
+    return _WORD_RE.findall(_DIGITS_RE.sub('', text.lower()))
+
+
+class LanguageDetector:
+    """Определение языка запроса (ru/en) по доле кириллицы и латиницы.
+
+    langdetect вызывается только для смешанных запросов, с фиксированным
+    seed, поэтому результат воспроизводим. Ответы кэшируются.
+    """
+
+    def __init__(self, default='ru', threshold=0.7, min_letters=4, cache_size=4096):
+        self.default = default
+        self.threshold = threshold
+        self.min_letters = min_letters
+        self._detect_cached = lru_cache(maxsize=cache_size)(self._detect)
+        self._detect_fn = None
+        self.fallbacks = 0
+
+    def warm(self):
+        """Загрузка профилей langdetect заранее, а не на первом запросе"""
+        if self._detect_fn is None:
+            from langdetect import DetectorFactory, detect
+            DetectorFactory.seed = 0
+            detect("warm up")
+            self._detect_fn = detect
+
+    def _fallback(self, text):
+        self.fallbacks += 1
+        try:
+            self.warm()
+            return 'ru' if self._detect_fn(text) in _CYRILLIC_LANGUAGES else 'en'
+        except Exception:
+            return self.default
+
+    def _detect(self, text):
+        text = text.lower()
+        cyrillic = len(_CYRILLIC_RE.findall(text))
+        latin = len(_LATIN_RE.findall(text))
+        letters = cyrillic + latin
+        if letters == 0:
+            return self.default
+
+        share = cyrillic / letters
+        if share >= self.threshold:
+            return 'ru'
+        if share <= 1 - self.threshold:
+            return 'en'
+        # Смешанный запрос: короткому не доверяем даже langdetect
+        if letters < self.min_letters:
+            return self.default
+        return self._fallback(text)
+
+    def detect(self, text):
+        """Язык запроса: 'ru' или 'en'"""
+        return self._detect_cached(text)
+
+    def stats(self):
+        info = self._detect_cached.cache_info()
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'fallbacks': self.fallbacks,
+        }
+
+
+class TextNormalizer:
+    """Нормализация запросов: токенизация, стоп-слова, стемминг с кэшами.
+
+    Запросы пользователей сильно повторяются, поэтому кэшируются и целые
+    нормализованные запросы (по тексту и языку), и основы отдельных слов.
+    """
+
+    def __init__(self, stop_words, stemmers, cache_size=4096, stem_cache_size=16384):
+        self._stop_words = stop_words
+        self._stemmers = stemmers
+        self._normalize_cached = lru_cache(maxsize=cache_size)(self._normalize)
+        self._stem_cached = lru_cache(maxsize=stem_cache_size)(self._stem)
+
+    def _stem(self, token, lang):
+        return self._stemmers[lang].stem(token)
+
+    def _normalize(self, text, lang):
+        stop_words = self._stop_words[lang]
+        return " ".join(
+            self._stem_cached(token, lang)
+            for token in tokenize(text)
+            if token not in stop_words and len(token) > 2
+        )
+
+    def normalize(self, text, language='ru'):
+        """Нормализованный запрос: основы значимых слов через пробел"""
+        return self._normalize_cached(text, language_key(language))
+
+    def stem(self, token, language='ru'):
+        """Основа отдельного слова"""
+        return self._stem_cached(token.lower(), language_key(language))
+
+    def clear(self):
+        self._normalize_cached.cache_clear()
+        self._stem_cached.cache_clear()
+
+    def stats(self):
+        """Попадания в кэши запросов и основ"""
+        queries = self._normalize_cached.cache_info()
+        stems = self._stem_cached.cache_info()
+        return {
+            'query_hits': queries.hits,
+            'query_misses': queries.misses,
+            'query_size': queries.currsize,
+            'stem_hits': stems.hits,
+            'stem_misses': stems.misses,
+            'stem_size': stems.currsize,
+        }
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+import sklearn
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+# Версия формата артефакта: меняется, если меняется состав файлов
+ARTIFACT_FORMAT = 1
+_ARRAYS = ('idf', 'data', 'indices', 'indptr')
+
+
+def topics_fingerprint(topic_names, topic_texts, max_features, ngram_range):
+    """Хэш определения тем и параметров обучения - ключ артефакта модели"""
+    payload = json.dumps({
+        'format': ARTIFACT_FORMAT,
+        'sklearn': sklearn.__version__,
+        'names': list(topic_names),
+        'texts': list(topic_texts),
+        'max_features': max_features,
+        'ngram_range': list(ngram_range),
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def prune_artifacts(cache_dir, keep=3):
+    """Удаление старых артефактов: остаются keep самых свежих"""
+    paths = [
+        os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+        if not name.startswith('.') and os.path.isdir(os.path.join(cache_dir, name))
+    ]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class TopicRanker:
+    """Ранжирование тем по TF-IDF на разреженных матрицах.
+
+    Векторы тем L2-нормализуются один раз и хранятся транспонированной
+    CSC-матрицей, поэтому косинусное сходство - это одно разреженное
+    произведение запросов на матрицу тем. Топ-k выбирается только среди
+    ненулевых оценок строки (их не больше числа тем).
+    """
+
+    def __init__(self, vectorizer, topic_matrix, topic_names, topics_t=None):
+        self.vectorizer = vectorizer
+        self.topic_names = list(topic_names)
+        if topics_t is None:
+            topic_matrix = normalize(topic_matrix.tocsr(), norm='l2', copy=False)
+            # (признаки x темы): Q @ M^T без транспонирования на каждом запросе
+            topics_t = topic_matrix.T.tocsc()
+        self._topics_t = topics_t
+        # CSR-представление тем без копирования массивов
+        self.topic_matrix = topics_t.T
+
+    @classmethod
+    def fit(cls, topic_names, topic_texts, max_features=1000, ngram_range=(1, 2)):
+        """Обучение векторизатора на уже нормализованных текстах тем"""
+        vectorizer = TfidfVectorizer(max_features=max_features, ngram_range=ngram_range)
+        topic_matrix = vectorizer.fit_transform(topic_texts)
+        return cls(vectorizer, topic_matrix, topic_names)
+
+    @classmethod
+    def load_or_fit(cls, cache_dir, topic_names, topic_texts, max_features=1000, ngram_range=(1, 2)):
+        """Загрузка артефакта модели из кэша; обучение и сохранение, если темы изменились"""
+        key = topics_fingerprint(topic_names, topic_texts, max_features, ngram_range)
+        path = os.path.join(cache_dir, key)
+        if os.path.isdir(path):
+            try:
+                ranker = cls.load(path)
+                logger.info(f"📦 TF-IDF модель загружена из кэша: {path}")
+                return ranker
+            except Exception as e:
+                logger.warning(f"⚠️ Артефакт модели поврежден, обучаем заново: {e}")
+
+        ranker = cls.fit(topic_names, topic_texts, max_features, ngram_range)
+        try:
+            ranker.save(path)
+            logger.info(f"💾 TF-IDF модель сохранена: {path}")
+            prune_artifacts(cache_dir)
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось сохранить артефакт модели: {e}")
+        return ranker
+
+    def save(self, path):
+        """Сохранение словаря, idf и матрицы тем: JSON + .npy для memory-map.
+
+        Артефакт пишется во временный каталог и переименовывается целиком,
+        поэтому воркеры, стартующие одновременно, не видят его недописанным.
+        """
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+        try:
+            vocabulary = sorted(self.vectorizer.vocabulary_, key=self.vectorizer.vocabulary_.get)
+            meta = {
+                'format': ARTIFACT_FORMAT,
+                'topic_names': self.topic_names,
+                'vocabulary': vocabulary,
+                'ngram_range': list(self.vectorizer.ngram_range),
+                'shape': list(self._topics_t.shape),
+            }
+            with open(os.path.join(tmp_path, 'model.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+            arrays = {
+                'idf': self.vectorizer.idf_,
+                'data': self._topics_t.data,
+                'indices': self._topics_t.indices,
+                'indptr': self._topics_t.indptr,
+            }
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_path, f'{name}.npy'), array)
+
+            os.rename(tmp_path, path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            # Другой воркер успел сохранить тот же артефакт
+            if not os.path.isdir(path):
+                raise
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Загрузка артефакта; матрица тем отображается в память только для чтения"""
+        with open(os.path.join(path, 'model.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['format'] != ARTIFACT_FORMAT:
+            raise ValueError(f"формат артефакта {meta['format']}, ожидается {ARTIFACT_FORMAT}")
+
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r' if mmap else None)
+            for name in _ARRAYS
+        }
+
+        vocabulary = {term: i for i, term in enumerate(meta['vocabulary'])}
+        vectorizer = TfidfVectorizer(ngram_range=tuple(meta['ngram_range']), vocabulary=vocabulary)
+        vectorizer.idf_ = np.asarray(arrays['idf'])
+        topics_t = sp.csc_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']),
+            shape=tuple(meta['shape']),
+            copy=False
+        )
+        return cls(vectorizer, None, meta['topic_names'], topics_t=topics_t)
+
+    @property
+    def n_topics(self):
+        return len(self.topic_names)
+
+    @property
+    def n_features(self):
+        return self.topic_matrix.shape[1]
+
+    def score_matrix(self, query_matrix):
+        """Разреженная матрица сходства (запросы x темы)"""
+        return (query_matrix @ self._topics_t).tocsr()
+
+    def rank_vectors(self, query_matrix, k=1):
+        """Топ-k тем для каждой строки матрицы запросов: [[(тема, оценка), ...], ...]"""
+        scores = self.score_matrix(query_matrix)
+        results = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            data = scores.data[start:end]
+            indices = scores.indices[start:end]
+
+            # По убыванию оценки, при равенстве - по порядку тем; то же правило
+            # решает, какие из равных тем попадут на границу топ-k
+            top = np.lexsort((indices, -data))[:k]
+            results.append([(self.topic_names[indices[i]], float(data[i])) for i in top])
+        return results
+
+    def rank(self, processed_queries, k=1):
+        """Топ-k тем для пачки нормализованных запросов за одно умножение"""
+        return self.rank_vectors(self.vectorizer.transform(processed_queries), k)
+
+    def top(self, processed_query, k=1):
+        """Топ-k тем для одного запроса"""
+        return self.rank([processed_query], k)[0]
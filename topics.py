@@ -0,0 +1,70 @@
+# Исходный каталог тем: загружается в таблицу chats при первом запуске,
+# дальше источник истины - база (см. chat_registry.py)
+
+# Темы с подробными описаниями и ключевыми словами
+DETAILED_TOPICS = {
+    "Образование и Саморазвитие": {
+        "keywords": ["учеба", "саморазвитие", "книги", "курсы", "образование", "знание", "развитие", "психология", "мышление", "обучение", "университет", "школа", "знания", "самосовершенствование", "мотивация", "цели", "успех"],
+        "description": "Группа для тех, кто стремится к постоянному развитию, изучению нового и личностному росту.",
+        "emoji": "📚"
+    },
+    "Наука и литература": {
+        "keywords": ["наука", "литература", "книги", "авторы", "научные", "исследования", "научная", "фантастика", "классика", "поэзия", "проза", "литературные", "критика", "научпоп", "физика", "химия", "биология", "история"],
+        "description": "Обсуждение научных открытий, литературных произведений и авторов, научной фантастики и классики.",
+        "emoji": "🔬"
+    },
+    "Программирование": {
+        "keywords": ["программирование", "код", "разработка", "python", "javascript", "веб", "мобильные", "приложения", "алгоритмы", "бэкенд", "фронтенд", "дата", "аналитика", "машинное", "обучение", "искусственный", "интеллект", "нейронные", "сети"],
+        "description": "Группа для разработчиков, где обсуждаются языки программирования, фреймворки и технологии.",
+        "emoji": "💻"
+    },
+    "Экономика и Бизнес": {
+        "keywords": ["экономика", "бизнес", "финансы", "инвестиции", "стартап", "предпринимательство", "рынок", "деньги", "заработок", "доход", "прибыль", "капитал", "бизнесмен", "предприниматель", "трейдинг", "акции", "валюта", "криптовалюта", "форекс", "недвижимость"],
+        "description": "Обсуждение экономических новостей, бизнес-идей, инвестиций и финансовых стратегий.",
+        "emoji": "💰"
+    },
+    "Здоровье и медицина": {
+        "keywords": ["здоровье", "медицина", "фитнес", "питание", "спорт", "йога", "лечение", "профилактика", "психическое", "здоровье", "диета", "витамины", "лекарства", "болезни", "врачи", "психология", "стресс", "сон", "релаксация", "оздоровление"],
+        "description": "Группа о здоровье, фитнесе, правильном питании и медицинских аспектах.",
+        "emoji": "💪"
+    },
+    "Искусство и музыка": {
+        "keywords": ["искусство", "музыка", "творчество", "живопись", "рисование", "композиторы", "исполнители", "творческие", "художники", "графика", "скульpture", "архитектура", "классическая", "рок", "джаз", "поп", "эстрада", "инструменты", "гитара", "фортепиано"],
+        "description": "Обсуждение искусства, музыки, творческих проектов и культурных событий.",
+        "emoji": "🎨"
+    },
+    "Кулинария и рецепты": {
+        "keywords": ["кулинария", "рецепты", "готовка", "еда", "блюда", "ингредиенты", "вкусно", "домашняя", "кухни", "выпечка", "кондитерское", "десерты", "салаты", "супы", "вторые", "блюда", "напитки", "кофе", "чай", "вино"],
+        "description": "Группа для любителей готовить и обмениваться рецептами разных кухонь мира.",
+        "emoji": "🍳"
+    },
+    "Путешествие и туризм": {
+        "keywords": ["путешествие", "туризм", "страны", "город", "отдых", "отпуск", "достопримечательности", "экскурсии", "походы", "автомобильные", "туристические", "маршруты", "гостиницы", "отели", "авиабилеты", "визы", "пляж", "море", "горы", "природа", "экзотика", "бюджетные", "дорогие", "туристы"],
+        "description": "Обсуждение путешествий, туристических маршрутов, стран и мест для отдыха.",
+        "emoji": "✈️"
+    },
+    "Спорт": {
+        "keywords": ["спорт", "фитнес", "тренеровка", "чемпионат", "матчи", "здоровье", "физическая", "активность", "командный", "футбол", "баскетбол", "волейбол", "теннис", "плавание", "бег", "велосипед", "единоборства", "бокс", "бои", "тренажерный", "зал", "диета", "питание"],
+        "description": "Группа о спорте, физической активности и здоровом образе жизни.",
+        "emoji": "⚽"
+    },
+    "Иное": {
+        "keywords": ["разное", "другое", "всякое", "разное", "общее", "разные", "темы", "обсуждения", "общение", "флуд", "разговоры", "мемы", "юмор", "анекдоты", "интересное", "важное", "актуальное", "новости"],
+        "description": "Группа для общения на разные темы, которые не вошли в другие категории.",
+        "emoji": "🔄"
+    }
+}
+
+# ID реальных Telegram групп
+GROUP_IDS = {
+    "Образование и Саморазвитие": "-1003433439121",
+    "Наука и литература": "-1002820402117", 
+    "Программирование": "-1003477061325",
+    "Экономика и Бизнес": "-1003382139382",
+    "Здоровье и медицина": "-1003305866632",
+    "Искусство и музыка": "-1003378596165",
+    "Кулинария и рецепты": "-1003210673239",
+    "Путешествие и туризм": "-1003340734939",
+    "Спорт": "-1003300649893",
+    "Иное": "-1003307595772"
+}
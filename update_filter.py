@@ -0,0 +1,126 @@
+import logging
+from collections import Counter, deque
+
+from telegram import Update
+from telegram.ext import (
+    ApplicationHandlerStop, CallbackQueryHandler, ChatMemberHandler, CommandHandler,
+    ConversationHandler, InlineQueryHandler, MessageHandler, TypeHandler
+)
+
+logger = logging.getLogger(__name__)
+
+# Поля Update, которые проверяются фильтрами MessageHandler и CommandHandler
+_MESSAGE_TYPES = (
+    Update.MESSAGE, Update.EDITED_MESSAGE, Update.CHANNEL_POST, Update.EDITED_CHANNEL_POST,
+)
+# Обработчики, тип обновления которых известен без проверки фильтров
+_FIXED_TYPES = {
+    CallbackQueryHandler: (Update.CALLBACK_QUERY,),
+    InlineQueryHandler: (Update.INLINE_QUERY,),
+    ChatMemberHandler: (Update.MY_CHAT_MEMBER, Update.CHAT_MEMBER),
+}
+
+
+def _probe_updates(update_type):
+    """Пробные обновления типа update_type: обычный текст и команда"""
+    message = {
+        'message_id': 1,
+        'date': 0,
+        'chat': {'id': 1, 'type': 'private'},
+        'from': {'id': 1, 'is_bot': False, 'first_name': 'probe'},
+    }
+    text = dict(message, text='probe')
+    command = dict(message, text='/probe', entities=[{'type': 'bot_command', 'offset': 0, 'length': 6}])
+    return [Update.de_json({'update_id': 0, update_type: payload}, None) for payload in (text, command)]
+
+
+def _iter_handlers(handlers):
+    for handler in handlers:
+        if isinstance(handler, ConversationHandler):
+            yield from _iter_handlers(handler.entry_points)
+            for state_handlers in handler.states.values():
+                yield from _iter_handlers(state_handlers)
+            yield from _iter_handlers(handler.fallbacks)
+        else:
+            yield handler
+
+
+def derive_allowed_updates(application):
+    """Типы обновлений, на которые подписан хотя бы один обработчик приложения.
+
+    Для MessageHandler и CommandHandler фильтры проверяются на пробных
+    сообщениях каждого типа. Для незнакомого обработчика возвращается
+    Update.ALL_TYPES, чтобы не потерять нужные ему обновления.
+    """
+    handlers = [handler for group in application.handlers.values() for handler in group]
+    allowed = set()
+    for handler in _iter_handlers(handlers):
+        if isinstance(handler, TypeHandler):
+            # Служебные обработчики (например, UpdateFilter) сами ничего не подписывают
+            continue
+        if isinstance(handler, (MessageHandler, CommandHandler)):
+            for update_type in _MESSAGE_TYPES:
+                if any(handler.filters.check_update(probe) for probe in _probe_updates(update_type)):
+                    allowed.add(update_type)
+            continue
+        fixed = next((types for cls, types in _FIXED_TYPES.items() if isinstance(handler, cls)), None)
+        if fixed is None:
+            logger.warning(f"⚠️ Неизвестный обработчик {type(handler).__name__}, подписка на все обновления")
+            return list(Update.ALL_TYPES)
+        allowed.update(fixed)
+    return sorted(str(update_type) for update_type in allowed)
+
+
+class UpdateFilter:
+    """Дешевый фильтр перед диспетчеризацией (группа -1).
+
+    Отбрасывает повторы update_id (повторная доставка вебхука), обновления
+    без нового сообщения и сообщения без текста (медиа и служебные: вход
+    в группу, закрепление и т.п.) до того, как они дойдут до
+    ConversationHandler.
+    """
+
+    def __init__(self, dedupe_window=2048):
+        self.dedupe_window = dedupe_window
+        self._recent_ids = set()
+        self._recent_order = deque()
+        self.passed = 0
+        self.dropped = Counter()
+
+    def _seen(self, update_id):
+        if update_id in self._recent_ids:
+            return True
+        self._recent_ids.add(update_id)
+        self._recent_order.append(update_id)
+        if len(self._recent_order) > self.dedupe_window:
+            self._recent_ids.discard(self._recent_order.popleft())
+        return False
+
+    def _drop_reason(self, update):
+        if self._seen(update.update_id):
+            return 'duplicate'
+        if update.message is None:
+            return 'not_message'
+        if update.message.text is None:
+            return 'no_text'
+        return None
+
+    async def check(self, update, context):
+        reason = self._drop_reason(update)
+        if reason is None:
+            self.passed += 1
+            return
+        self.dropped[reason] += 1
+        raise ApplicationHandlerStop
+
+    def handler(self):
+        """TypeHandler для группы -1: выполняется раньше остальных обработчиков"""
+        return TypeHandler(Update, self.check)
+
+    def stats(self):
+        """Пропущенные и отброшенные обновления по причинам"""
+        return {
+            'passed': self.passed,
+            'dropped': sum(self.dropped.values()),
+            **{f'dropped_{reason}': count for reason, count in sorted(self.dropped.items())},
+        }
@@ -0,0 +1,201 @@
+import asyncio
+import hmac
+import json
+import logging
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    503: 'Service Unavailable',
+}
+
+
+def update_backlog(application):
+    """Обновления в очереди приложения плюс уже взятые в параллельную обработку"""
+    return application.update_queue.qsize() + getattr(application.update_processor, 'pending', 0)
+
+
+class WebhookServer:
+    """Минимальный HTTP/1.1-сервер на asyncio для приема обновлений Telegram.
+
+    Обновление разбирается и кладется в ограниченную update_queue
+    приложения без ожидания. Если очередь заполнена, Telegram получает
+    503 и сам повторит доставку позже - обновления не теряются и не копятся
+    в памяти.
+
+    Порт слушает один процесс: состояния диалогов, user_data, лимиты и
+    кэш поиска живут в его памяти, и при раздаче соединений ядром между
+    несколькими процессами обновления одного пользователя расходились бы
+    по разным копиям. Несколько процессов - только через режим sharded.
+
+    Секрет обязателен: без него любой, кто достучится до порта, мог бы
+    прислать поддельное обновление от имени администратора. GET /metrics
+    отдается только с заголовком Authorization: Bearer <metrics_token>.
+    """
+
+    def __init__(self, application, path='/telegram', secret_token=None, host='0.0.0.0', port=8080,
+                 reuse_port=False, max_body=1 << 20, read_timeout=30.0, metrics=None, metrics_token=None):
+        if not secret_token:
+            raise ValueError("вебхук без секретного токена принимает поддельные обновления")
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.reuse_port = reuse_port
+        self.max_body = max_body
+        self.read_timeout = read_timeout
+        # Реестр метрик для GET /metrics (формат Prometheus); без токена не отдается
+        self.metrics = metrics if metrics_token else None
+        self.metrics_token = metrics_token
+        self._server = None
+
+        # Статистика приема
+        self.received = 0
+        self.accepted = 0
+        self.queue_full = 0
+        self.forbidden = 0
+        self.bad_requests = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle_connection,
+            self.host,
+            self.port,
+            reuse_port=self.reuse_port
+        )
+        logger.info(f"🌐 Вебхук слушает {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _read_request(self, reader):
+        """Строка запроса, заголовки и тело; None - соединение закрыто"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', '0'))
+        if length > self.max_body:
+            return method, target, headers, None
+        body = await reader.readexactly(length) if length else b''
+        return method, target, headers, body
+
+    async def _handle_connection(self, reader, writer):
+        """Обработка соединения с поддержкой keep-alive"""
+        try:
+            while True:
+                request = await asyncio.wait_for(self._read_request(reader), self.read_timeout)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                path = target.split('?', 1)[0]
+                payload = b''
+                if self.metrics is not None and method == 'GET' and path == '/metrics':
+                    if hmac.compare_digest(headers.get('authorization', ''), f'Bearer {self.metrics_token}'):
+                        status, payload = 200, self.metrics.render_prometheus().encode('utf-8')
+                    else:
+                        self.forbidden += 1
+                        status = 403
+                else:
+                    status = self._dispatch(method, path, headers, body)
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and body is not None
+                content_type = "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n" if payload else ""
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"{content_type}"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _dispatch(self, method, path, headers, body):
+        """HTTP-статус ответа на запрос"""
+        if path == '/healthz':
+            return 200
+        if path != self.path:
+            return 404
+        if method != 'POST':
+            return 405
+        if body is None:
+            return 413
+
+        self.received += 1
+        if not hmac.compare_digest(
+            headers.get('x-telegram-bot-api-secret-token', ''), self.secret_token
+        ):
+            self.forbidden += 1
+            return 403
+
+        try:
+            data = json.loads(body)
+            if not isinstance(data, dict):
+                raise ValueError('обновление - не JSON-объект')
+        except ValueError as e:
+            self.bad_requests += 1
+            logger.warning(f"⚠️ Некорректное обновление в вебхуке: {e}")
+            return 400
+        return self._deliver(body, data)
+
+    def _deliver(self, body, data):
+        """Передача разобранного обновления приложению; HTTP-статус ответа"""
+        try:
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            self.bad_requests += 1
+            logger.warning(f"⚠️ Некорректное обновление в вебхуке: {e}")
+            return 400
+
+        queue = self.application.update_queue
+        try:
+            if queue.maxsize and update_backlog(self.application) >= queue.maxsize:
+                raise asyncio.QueueFull
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Telegram повторит доставку - это и есть обратное давление
+            self.queue_full += 1
+            return 503
+
+        self.accepted += 1
+        return 200
+
+    def stats(self):
+        """Счетчики приема обновлений"""
+        queue = self.application.update_queue
+        return {
+            'received': self.received,
+            'accepted': self.accepted,
+            'queue_full': self.queue_full,
+            'forbidden': self.forbidden,
+            'bad_requests': self.bad_requests,
+            'queue_depth': queue.qsize(),
+            'backlog': update_backlog(self.application),
+            'queue_size': queue.maxsize,
+        }